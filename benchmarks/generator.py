@@ -0,0 +1,146 @@
+"""
+Seeded synthetic data: candidates and job openings built through AddCandidates/AddJobOpenings.
+Skills are drawn from a Zipf-like distribution over the vocabulary (a few skills are very common, most are rare),
+so selection works with realistic posting lengths. The same seed gives the same data.
+Run: python -m benchmarks.generator --candidates 100000 --job-openings 10000 --out data
+Rows are written as NDJSON (the format of POST /candidates:bulk and /job-openings:bulk),
+with --url they are sent to a running application instead.
+"""
+import argparse
+import asyncio
+import itertools
+import random
+from pathlib import Path
+from typing import Iterator, List
+
+from core.schemas import AddCandidates, AddJobOpenings
+from core.schemas.utils import THIS_YEAR
+from benchmarks.client import HTTPClient
+
+
+COMMON_SKILLS = [
+    "Python", "SQL", "Git", "Docker", "Linux", "JavaScript", "PostgreSQL", "REST", "HTML", "CSS", "Java", "TypeScript",
+    "React", "Redis", "Kubernetes", "FastAPI", "Django", "Flask", "AWS", "C++", "Go", "C#", ".NET", "Node.js",
+    "MongoDB", "Kafka", "RabbitMQ", "GraphQL", "Celery", "Nginx", "Pandas", "NumPy", "Machine learning", "Spark",
+    "Airflow", "Terraform", "Ansible", "CI/CD", "Vue", "Angular", "Kotlin", "Swift", "Rust", "PHP", "Scala",
+    "Elasticsearch", "ClickHouse", "MySQL", "Figma", "Jira",
+]
+CITIES = ["Moscow", "Minsk", "Kazan", "Almaty", "Tbilisi", "Yerevan", "Belgrade", "Warsaw", "Berlin", "Remote"]
+POSITIONS = ["Developer", "Backend developer", "Frontend developer", "Data engineer", "Data scientist",
+             "DevOps engineer", "QA engineer", "Team lead", "Analyst", "Designer"]
+NAMES = ["Ilya", "Anna", "Ivan", "Maria", "Pavel", "Olga", "Sergey", "Elena", "Dmitry", "Daria", "Nikita", "Sofia"]
+SURNAMES = ["Safronov", "Ivanova", "Petrov", "Smirnova", "Kuznetsov", "Popova", "Volkov", "Sokolova", "Lebedev"]
+# fields which are computed by the schemas from the other fields
+GENERATED_FIELDS = {"skills_quantity": True, "skills": {"__all__": {"indexing_skill_name", "score"}}}
+
+
+class SkillDistribution:
+    """
+    Vocabulary of skill names (common names first, then the long tail) with weights 1 / rank ** exponent.
+    """
+
+    def __init__(self, vocabulary_size: int, exponent: float):
+        tail = [f"Skill {number}" for number in range(1, vocabulary_size - len(COMMON_SKILLS) + 1)]
+        self.names = (COMMON_SKILLS + tail)[:vocabulary_size]
+        self.cumulative = list(itertools.accumulate(1 / rank ** exponent for rank in range(1, len(self.names) + 1)))
+
+    def sample(self, rng: random.Random, quantity: int) -> List[str]:
+        """
+        Distinct skill names (a record has every skill once).
+        """
+        quantity = min(quantity, len(self.names))
+        names = {}
+        while len(names) < quantity:
+            names.update(dict.fromkeys(rng.choices(self.names, cum_weights=self.cumulative, k=quantity - len(names))))
+        return list(names)
+
+
+def skills_quantity(rng: random.Random, mean: float, maximum: int) -> int:
+    """
+    Geometric number of skills from 1 to maximum with the given mean.
+    """
+    quantity = 1
+    while quantity < maximum and rng.random() < 1 - 1 / mean:
+        quantity += 1
+    return quantity
+
+
+def generate_candidates(count: int, seed: int, skills: SkillDistribution) -> Iterator[AddCandidates]:
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield AddCandidates(
+            first_name=rng.choice(NAMES), second_name=rng.choice(SURNAMES), age=rng.randint(18, 65),
+            status=rng.randint(0, 4), city=rng.choice(CITIES), desired_position=rng.choice(POSITIONS),
+            education_degree=rng.randint(0, 8), working_experience="x" * rng.randint(0, 300),
+            about_oneself="y" * rng.randint(0, 300), published=rng.random() < 0.9,
+            skills=[
+                {"skill_name": name, "level": rng.choices((0, 1, 2), weights=(5, 3, 2))[0],
+                 "years_of_experience": rng.randint(1, 15), "last_used_year": rng.randint(THIS_YEAR - 8, THIS_YEAR)}
+                for name in skills.sample(rng, skills_quantity(rng, mean=6, maximum=20))
+            ]
+        )
+
+
+def generate_job_openings(count: int, seed: int, skills: SkillDistribution) -> Iterator[AddJobOpenings]:
+    rng = random.Random(seed + 1)
+    for number in range(count):
+        yield AddJobOpenings(
+            title=f"{rng.choice(POSITIONS)} {number}", description="z" * rng.randint(0, 500),
+            address=rng.choice(CITIES), salary=rng.randrange(500, 10000, 100),
+            skills=[
+                {"skill_name": name, "level": rng.choices((0, 1, 2), weights=(5, 3, 2))[0],
+                 "years_of_experience": rng.randint(1, 6)}
+                for name in skills.sample(rng, skills_quantity(rng, mean=3, maximum=10))
+            ]
+        )
+
+
+def ndjson_chunks(models: Iterator, chunk_size: int) -> Iterator[bytes]:
+    for chunk in iter(lambda: list(itertools.islice(models, chunk_size)), []):
+        yield b"".join(model.model_dump_json(exclude=GENERATED_FIELDS).encode() + b"\n" for model in chunk)
+
+
+async def upload(url: str, path: str, chunks: Iterator[bytes]):
+    """
+    Send chunks to the bulk import endpoint one request per chunk.
+    """
+    inserted = errors = 0
+    async with HTTPClient(url) as client:
+        for chunk in chunks:
+            status, body = await client.request("POST", path, body=chunk,
+                                                headers={"Content-Type": "application/x-ndjson"})
+            report = client.json(body) if status == 200 else {"inserted": 0, "errors": [body]}
+            inserted, errors = inserted + report["inserted"], errors + len(report["errors"])
+            print(f"{path}: {inserted} inserted, {errors} errors", end="\r")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidates", type=int, default=10_000)
+    parser.add_argument("--job-openings", type=int, default=1_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--vocabulary", type=int, default=2_000, help="number of distinct skills")
+    parser.add_argument("--exponent", type=float, default=1.1, help="exponent of the Zipf distribution of skills")
+    parser.add_argument("--chunk-size", type=int, default=5_000, help="records in one bulk request or write")
+    parser.add_argument("--out", default="data", help="directory for NDJSON files")
+    parser.add_argument("--url", help="base url of the application, rows are sent to its bulk endpoints")
+    args = parser.parse_args()
+
+    skills = SkillDistribution(args.vocabulary, args.exponent)
+    datasets = (
+        ("candidates", generate_candidates(args.candidates, args.seed, skills)),
+        ("job-openings", generate_job_openings(args.job_openings, args.seed, skills)),
+    )
+    for name, models in datasets:
+        chunks = ndjson_chunks(models, args.chunk_size)
+        if args.url:
+            asyncio.run(upload(args.url, f"/{name}:bulk", chunks))
+            continue
+        Path(args.out).mkdir(parents=True, exist_ok=True)
+        with open(Path(args.out) / f"{name.replace('-', '_')}.ndjson", "wb") as file:
+            file.writelines(chunks)
+
+
+if __name__ == "__main__":
+    main()
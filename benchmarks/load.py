@@ -0,0 +1,288 @@
+"""
+Load test of a running application: every scenario is driven by a fixed number of concurrent clients
+for a fixed time, latency percentiles and throughput of every endpoint are written to a JSON file.
+Ids are drawn from the ids of candidates and job openings which exist before the run (they are read from the API),
+CRUD scenarios create their own records and delete them.
+Run: python -m benchmarks.load --url http://localhost:8000 --concurrency 32 --duration 30 --out results.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import subprocess
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from benchmarks.client import HTTPClient
+from benchmarks.generator import GENERATED_FIELDS, SkillDistribution, generate_candidates, generate_job_openings
+
+
+class Recorder:
+    """
+    Latencies and statuses of requests by endpoint.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.reset()
+
+    def reset(self):
+        """
+        Forget recorded requests (they were made during the warmup).
+        """
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.enabled = True
+
+    async def request(self, client: HTTPClient, endpoint: str, method: str, path: str, body=None):
+        started = time.perf_counter()
+        try:
+            status, response = await client.request(method, path, body=body)
+        except (OSError, asyncio.IncompleteReadError):
+            status, response = 0, b""
+        if self.enabled:
+            self.latencies[endpoint].append(time.perf_counter() - started)
+            self.statuses[endpoint][status] += 1
+        return status, response
+
+    def report(self, duration: float) -> Dict[str, dict]:
+        report = {}
+        for endpoint, latencies in self.latencies.items():
+            milliseconds = sorted(latency * 1000 for latency in latencies)
+            percentiles = statistics.quantiles(milliseconds, n=100, method="inclusive") if len(milliseconds) > 1 \
+                else milliseconds * 99
+            statuses = self.statuses[endpoint]
+            report[endpoint] = {
+                "requests": len(milliseconds),
+                "errors": sum(count for status, count in statuses.items() if not 200 <= status < 400),
+                "throughput": round(len(milliseconds) / duration, 2),
+                "latency_ms": {
+                    "p50": round(percentiles[49], 3), "p95": round(percentiles[94], 3),
+                    "p99": round(percentiles[98], 3), "max": round(milliseconds[-1], 3),
+                    "mean": round(statistics.fmean(milliseconds), 3),
+                },
+                "statuses": {str(status): count for status, count in sorted(statuses.items())},
+            }
+        return report
+
+
+class Scenarios:
+    """
+    One iteration of every scenario: a request (or a chain of requests) of one client.
+    """
+
+    def __init__(self, args: argparse.Namespace, recorder: Recorder, candidate_ids: List[int], job_ids: List[int]):
+        self.args = args
+        self.recorder = recorder
+        self.candidate_ids = candidate_ids
+        self.job_ids = job_ids
+        skills = SkillDistribution(args.vocabulary, args.exponent)
+        # new records for CRUD scenarios, the seed differs from the seed of the loaded data
+        self.new_candidates = generate_candidates(10 ** 9, args.seed + 1000, skills)
+        self.new_job_openings = generate_job_openings(10 ** 9, args.seed + 1000, skills)
+
+    def candidate_id(self, rng: random.Random) -> int:
+        return rng.choice(self.candidate_ids)
+
+    def job_id(self, rng: random.Random) -> int:
+        return rng.choice(self.job_ids)
+
+    async def list_candidates(self, client: HTTPClient, rng: random.Random, state: dict):
+        page = rng.randrange(max(len(self.candidate_ids) // self.args.limit, 1))
+        await self.recorder.request(client, "GET /candidates", "GET",
+                                    f"/candidates?limit={self.args.limit}&page={page}")
+
+    async def list_job_openings(self, client: HTTPClient, rng: random.Random, state: dict):
+        page = rng.randrange(max(len(self.job_ids) // self.args.limit, 1))
+        await self.recorder.request(client, "GET /job-openings", "GET",
+                                    f"/job-openings?limit={self.args.limit}&page={page}")
+
+    async def cursor_candidates(self, client: HTTPClient, rng: random.Random, state: dict):
+        path = f"/candidates?limit={self.args.limit}&after={state.get('after', '')}"
+        status, body = await self.recorder.request(client, "GET /candidates?after", "GET", path)
+        state["after"] = (client.json(body).get("next_cursor") or "") if status == 200 else ""
+
+    async def get_candidate(self, client: HTTPClient, rng: random.Random, state: dict):
+        await self.recorder.request(client, "GET /candidates/{id}", "GET", f"/candidates/{self.candidate_id(rng)}")
+
+    async def get_job_opening(self, client: HTTPClient, rng: random.Random, state: dict):
+        await self.recorder.request(client, "GET /job-openings/{id}", "GET", f"/job-openings/{self.job_id(rng)}")
+
+    async def candidate_skills(self, client: HTTPClient, rng: random.Random, state: dict):
+        await self.recorder.request(client, "GET /candidates/{id}/skills", "GET",
+                                    f"/candidates/{self.candidate_id(rng)}/skills")
+
+    async def job_opening_skills(self, client: HTTPClient, rng: random.Random, state: dict):
+        await self.recorder.request(client, "GET /job-openings/{id}/skills", "GET",
+                                    f"/job-openings/{self.job_id(rng)}/skills")
+
+    async def select_candidates(self, client: HTTPClient, rng: random.Random, state: dict):
+        await self.recorder.request(client, "GET /job-openings/{id}/selection", "GET",
+                                    f"/job-openings/{self.job_id(rng)}/selection?limit=20&sorting_from=upper")
+
+    async def select_job_openings(self, client: HTTPClient, rng: random.Random, state: dict):
+        await self.recorder.request(client, "GET /candidates/{id}/selection", "GET",
+                                    f"/candidates/{self.candidate_id(rng)}/selection?limit=20&sorting_from=upper")
+
+    async def select_partial(self, client: HTTPClient, rng: random.Random, state: dict):
+        await self.recorder.request(client, "GET /job-openings/{id}/selection?mode=partial", "GET",
+                                    f"/job-openings/{self.job_id(rng)}/selection?limit=20&mode=partial")
+
+    async def select_batch(self, client: HTTPClient, rng: random.Random, state: dict):
+        await self.recorder.request(client, "POST /selection:batch", "POST", "/selection:batch",
+                                    body={"job_ids": [self.job_id(rng) for _ in range(10)], "top": 20})
+
+    async def crud_candidate(self, client: HTTPClient, rng: random.Random, state: dict):
+        candidate = next(self.new_candidates).model_dump(mode="json", exclude=GENERATED_FIELDS)
+        status, body = await self.recorder.request(client, "POST /candidates", "POST", "/candidates", body=candidate)
+        if status != 201:
+            return
+        created = client.json(body)
+        path = f"/candidates/{created['id']}"
+        await self.recorder.request(client, "GET /candidates/{id}", "GET", path)
+        await self.recorder.request(client, "PATCH /candidates/{id}", "PATCH", path, body={"age": rng.randint(18, 65)})
+        skills = created["skills"]
+        if skills:
+            await self.recorder.request(client, "PUT /candidates/skills/{id}", "PUT",
+                                        f"/candidates/skills/{skills[0]['id']}",
+                                        body={**candidate["skills"][0], "level": rng.randint(0, 2)})
+            await self.recorder.request(client, "PATCH /candidates/{id}/skills", "PATCH", f"{path}/skills", body={
+                "update": [{"id": skill["id"], "years_of_experience": rng.randint(1, 15)} for skill in skills[1:]],
+                "delete": [skills[0]["id"]],
+            })
+        await self.recorder.request(client, "DELETE /candidates/{id}", "DELETE", path)
+
+    async def crud_job_opening(self, client: HTTPClient, rng: random.Random, state: dict):
+        job_opening = next(self.new_job_openings).model_dump(mode="json", exclude=GENERATED_FIELDS)
+        status, body = await self.recorder.request(client, "POST /job-openings", "POST", "/job-openings",
+                                                   body=job_opening)
+        if status != 201:
+            return
+        created = client.json(body)
+        path = f"/job-openings/{created['id']}"
+        await self.recorder.request(client, "GET /job-openings/{id}", "GET", path)
+        await self.recorder.request(client, "PATCH /job-openings/{id}", "PATCH", path,
+                                    body={"salary": rng.randrange(500, 10000, 100)})
+        skills = created["skills"]
+        if skills:
+            await self.recorder.request(client, "PATCH /job-openings/{id}/skills", "PATCH", f"{path}/skills", body={
+                "update": [{"id": skill["id"], "level": rng.randint(0, 2)} for skill in skills[1:]],
+                "delete": [skills[0]["id"]],
+            })
+        await self.recorder.request(client, "DELETE /job-openings/{id}", "DELETE", path)
+
+    def all(self) -> Dict[str, Callable[[HTTPClient, random.Random, dict], Awaitable]]:
+        return {
+            name: getattr(self, name) for name in (
+                "list_candidates", "list_job_openings", "cursor_candidates", "get_candidate", "get_job_opening",
+                "candidate_skills", "job_opening_skills", "select_candidates", "select_job_openings",
+                "select_partial", "select_batch", "crud_candidate", "crud_job_opening",
+            )
+        }
+
+
+async def drive(url: str, scenario: Callable, concurrency: int, duration: float, seed: int):
+    """
+    Run the scenario by concurrent clients (one connection each) until the time is over.
+    """
+    deadline = time.perf_counter() + duration
+
+    async def client_loop(number: int):
+        rng, state = random.Random(seed * 1000 + number), {}
+        async with HTTPClient(url) as client:
+            while time.perf_counter() < deadline:
+                await scenario(client, rng, state)
+
+    await asyncio.gather(*(client_loop(number) for number in range(concurrency)))
+
+
+async def existing_ids(url: str, path: str, chunk: int = 1000) -> List[int]:
+    """
+    Ids of all records of the list endpoint (read by cursor pages).
+    :param url: url of the application.
+    :param path: /candidates or /job-openings.
+    :param chunk: records in one page.
+    :return: List[int]
+    """
+    ids, after = [], ""
+    async with HTTPClient(url) as client:
+        while True:
+            status, body = await client.request("GET", f"{path}?limit={chunk}&after={after}")
+            if status != 200:
+                raise RuntimeError(f"GET {path} answered {status}: {body[:200]!r}")
+            page = client.json(body)
+            ids.extend(record["id"] for record in page["items"])
+            if not page["next_cursor"]:
+                return ids
+            after = page["next_cursor"]
+
+
+async def load_ids(url: str) -> Tuple[List[int], List[int]]:
+    candidate_ids, job_ids = await asyncio.gather(existing_ids(url, "/candidates"), existing_ids(url, "/job-openings"))
+    if not candidate_ids or not job_ids:
+        raise RuntimeError("the database has no candidates or job openings, load them by benchmarks.generator")
+    return candidate_ids, job_ids
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace) -> dict:
+    recorder = Recorder()
+    candidate_ids, job_ids = await load_ids(args.url)
+    scenarios = Scenarios(args, recorder, candidate_ids, job_ids)
+    selected = scenarios.all()
+    if args.scenarios:
+        selected = {name: selected[name] for name in args.scenarios.split(",")}
+
+    results = {}
+    for name, scenario in selected.items():
+        recorder.enabled = False
+        await drive(args.url, scenario, args.concurrency, args.warmup, args.seed)
+        recorder.reset()
+        await drive(args.url, scenario, args.concurrency, args.duration, args.seed)
+        results[name] = recorder.report(args.duration)
+        print(name, json.dumps({endpoint: stats["latency_ms"] | {"rps": stats["throughput"]}
+                                for endpoint, stats in results[name].items()}))
+
+    return {
+        "commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "url": args.url,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "seed": args.seed,
+        "candidates": len(candidate_ids),
+        "job_openings": len(job_ids),
+        "scenarios": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of every scenario")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds before measurement of every scenario")
+    parser.add_argument("--scenarios", help="comma-separated names, by default all of them")
+    parser.add_argument("--limit", type=int, default=100, help="page size of list endpoints")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--vocabulary", type=int, default=2_000)
+    parser.add_argument("--exponent", type=float, default=1.1)
+    parser.add_argument("--out", default="benchmark.json", help="JSON file with the results")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    with open(args.out, "w") as file:
+        json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
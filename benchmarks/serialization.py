@@ -0,0 +1,89 @@
+"""
+Micro-benchmark of serialization of a page of records.
+The old path: ORM objects are validated against response_model (from attributes, nested skills included)
+and encoded by the standard json module, as FastAPI does. The new path: rows with the columns of the response
+schema (as get_rows_db reads them) are encoded by pydantic-core without construction of models and validation.
+Run: python -m benchmarks.serialization --records 100 --skills 5
+"""
+import argparse
+import json
+import random
+import timeit
+from datetime import datetime
+from typing import List, Type
+
+from pydantic import BaseModel
+
+from core.db.database import CandidatesDB, CandidatesSkillsDB, JobOpeningsDB, RequiredSkillsDB
+from core.schemas import GetCandidates, GetJobOpenings
+from core.serialization import json_response, response_fields, type_adapter
+
+
+def candidate_rows(records: int, skills: int) -> List[dict]:
+    return [
+        {"id": record_id, "first_name": f"name{record_id}", "second_name": f"surname{record_id}",
+         "age": random.randint(16, 100), "status": random.randint(0, 4), "city": "Moscow",
+         "desired_position": "python developer", "education_degree": random.randint(0, 8),
+         "working_experience": "x" * 200, "about_oneself": "y" * 200, "published": True,
+         "time_create": datetime.now(),
+         "skills": [{"id": record_id * skills + number, "foreign_key": record_id, "skill_name": f"skill{number}",
+                     "skill_id": number, "level": random.randint(0, 2), "years_of_experience": random.randint(1, 10),
+                     "last_used_year": 2024, "score": random.randint(1, 1000)} for number in range(skills)]}
+        for record_id in range(1, records + 1)
+    ]
+
+
+def job_opening_rows(records: int, skills: int) -> List[dict]:
+    return [
+        {"id": record_id, "title": f"job opening {record_id}", "description": "z" * 500, "address": "Moscow",
+         "salary": random.randint(1000, 10000), "skills_quantity": skills, "time_create": datetime.now(),
+         "skills": [{"id": record_id * skills + number, "foreign_key": record_id, "skill_name": f"skill{number}",
+                     "skill_id": number, "level": random.randint(0, 2), "years_of_experience": random.randint(1, 10),
+                     "score": random.randint(1, 1000)} for number in range(skills)]}
+        for record_id in range(1, records + 1)
+    ]
+
+
+def orm_objects(rows: List[dict], orm_table_class: Type, foreign_orm_table_class: Type) -> list:
+    return [orm_table_class(**dict(row, skills=[foreign_orm_table_class(**skill) for skill in row["skills"]]))
+            for row in rows]
+
+
+def response_rows(schema: Type[BaseModel], rows: List[dict]) -> List[dict]:
+    fields, skill_fields = response_fields(schema)
+    return [{name: [{field: skill[field] for field in skill_fields} for skill in row["skills"]] if name == "skills"
+             else row[name] for name in fields} for row in rows]
+
+
+def old_path(schema: Type[BaseModel], objects: list) -> bytes:
+    adapter = type_adapter(List[schema])
+    content = adapter.dump_python(adapter.validate_python(objects, from_attributes=True), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def new_path(rows: List[dict]) -> bytes:
+    return json_response(rows).body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=100, help="records in the page")
+    parser.add_argument("--skills", type=int, default=5, help="skills of every record")
+    parser.add_argument("--repeat", type=int, default=200, help="serializations of the page")
+    args = parser.parse_args()
+
+    for schema, rows, orm_table_class, foreign_orm_table_class in (
+            (GetCandidates, candidate_rows(args.records, args.skills), CandidatesDB, CandidatesSkillsDB),
+            (GetJobOpenings, job_opening_rows(args.records, args.skills), JobOpeningsDB, RequiredSkillsDB)):
+        objects = orm_objects(rows, orm_table_class, foreign_orm_table_class)
+        rows = response_rows(schema, rows)
+        if old_path(schema, objects) != new_path(rows):
+            raise SystemExit(f"{schema.__name__}: the paths return different documents")
+        old = timeit.timeit(lambda: old_path(schema, objects), number=args.repeat) / args.repeat
+        new = timeit.timeit(lambda: new_path(rows), number=args.repeat) / args.repeat
+        print(f"{schema.__name__}: {args.records} records x {args.skills} skills, "
+              f"old {old * 1000:.3f} ms, new {new * 1000:.3f} ms, x{old / new:.1f}")
+
+
+if __name__ == "__main__":
+    main()
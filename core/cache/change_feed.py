@@ -0,0 +1,149 @@
+import asyncio
+import json
+import logging
+from typing import Dict, List, Set, Tuple
+from uuid import uuid4
+
+from core.cache.redis_conf import redis
+
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "in-process-changes"
+
+
+class Replicated:
+    """
+    Structure which lives in the memory of every worker (the skill index, skill suggestions).
+    Mutators call self.change(name, *args) with JSON-serializable arguments, the change is applied by the method
+    apply_<name> in this worker and, through ChangeFeed, in the other ones. The structure is used only while
+    ready is True, build() loads it from database.
+    """
+    replica_name: str = ""
+    feed: "ChangeFeed | None" = None
+    ready: bool = False
+
+    async def build(self):
+        raise NotImplementedError
+
+    @property
+    def tracked(self) -> bool:
+        """
+        Changes aren't lost: the structure is built or it is kept up to date by the feed.
+        """
+        return self.feed is not None or self.ready
+
+    def change(self, name: str, *args):
+        if self.feed is not None:
+            self.feed.change(self, name, list(args))
+        elif self.ready:
+            getattr(self, f"apply_{name}")(*args)
+
+
+class ChangeFeed:
+    """
+    Changes of replicated structures of workers published to the Redis channel: the worker which made a change
+    applies it at once and publishes it, the other workers apply it when it is received.
+    Messages may be lost while a worker isn't subscribed, so its structures aren't used then (ready is False,
+    selection falls back to database) and they are rebuilt after every (re)subscription; changes received
+    during the rebuild of a structure are applied after it.
+    """
+
+    def __init__(self, client, channel: str = CHANNEL):
+        self.redis = client
+        self.channel = channel
+        self.origin = uuid4().hex
+        self.replicas: Dict[str, Replicated] = {}
+        self.rebuilding: Set[str] = set()
+        self.pending: Dict[str, List[Tuple[str, list]]] = {}
+        self.outbox: asyncio.Queue | None = None
+        self.started = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def register(self, *replicas: Replicated):
+        for replica in replicas:
+            self.replicas[replica.replica_name] = replica
+            replica.feed = self
+
+    def change(self, replica: Replicated, name: str, args: list):
+        self.apply(replica.replica_name, name, args)
+        if self.outbox is not None:
+            self.outbox.put_nowait(json.dumps([self.origin, replica.replica_name, name, args]))
+
+    def apply(self, replica_name: str, name: str, args: list):
+        replica = self.replicas.get(replica_name)
+        if replica is None:
+            return
+        if replica_name in self.rebuilding:
+            self.pending[replica_name].append((name, args))
+        elif replica.ready:
+            getattr(replica, f"apply_{name}")(*args)
+
+    async def rebuild(self):
+        """
+        Load every structure from database, then apply the changes which came during its loading.
+        """
+        self.rebuilding = set(self.replicas)
+        self.pending = {replica_name: [] for replica_name in self.replicas}
+        for replica_name, replica in self.replicas.items():
+            await replica.build()
+            for name, args in self.pending.pop(replica_name):
+                getattr(replica, f"apply_{name}")(*args)
+            self.rebuilding.discard(replica_name)
+
+    async def receive(self, pubsub):
+        async for message in pubsub.listen():
+            if message["type"] != "message":
+                continue
+            origin, replica_name, name, args = json.loads(message["data"])
+            if origin != self.origin:
+                self.apply(replica_name, name, args)
+
+    async def listen(self):
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    receiving = asyncio.create_task(self.receive(pubsub))
+                    try:
+                        await self.rebuild()
+                        self.started.set()
+                        await receiving
+                    finally:
+                        receiving.cancel()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("In-process structures (skill index, suggestions) are off until the channel of changes "
+                               "is restored and they are rebuilt:", exc_info=True)
+            finally:
+                self.rebuilding, self.pending = set(), {}
+                for replica in self.replicas.values():
+                    replica.ready = False
+            self.started.set()
+            await asyncio.sleep(1)
+
+    async def send(self):
+        while True:
+            message = await self.outbox.get()
+            try:
+                await self.redis.publish(self.channel, message)
+            except Exception:
+                logger.warning("Change isn't published, other workers miss it until their rebuild:", exc_info=True)
+
+    async def start(self):
+        """
+        Subscribe to the channel and wait for the first build of the structures (or the first failure).
+        """
+        self.outbox = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self.listen()), asyncio.create_task(self.send())]
+        await self.started.wait()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks, self.outbox = [], None
+
+
+change_feed = ChangeFeed(redis)
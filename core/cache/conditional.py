@@ -0,0 +1,114 @@
+import logging
+from contextvars import ContextVar
+from functools import wraps
+from inspect import isawaitable
+from typing import Any, Optional, Type
+
+from fastapi_cache import FastAPICache
+from fastapi_cache.coder import Coder
+from fastapi_cache.decorator import cache as fastapi_cache
+from starlette.requests import Request
+from starlette.responses import Response
+
+from core.http_cache import etag_matches, strong_etag
+
+
+logger = logging.getLogger(__name__)
+
+# parameters which fastapi_cache.decorator.cache adds to the endpoint
+REQUEST_PARAMETER = "__fastapi_cache_request"
+RESPONSE_PARAMETER = "__fastapi_cache_response"
+
+# payload of the response of the current request which was read from the cache or encoded for it
+_payload: ContextVar[bytes | None] = ContextVar("cached_payload", default=None)
+
+
+class PayloadCoder(Coder):
+    """
+    Coder of the endpoint (base, the default coder of FastAPICache if it is None) which remembers the payload.
+    """
+    base: Optional[Type[Coder]] = None
+
+    @classmethod
+    def coder(cls) -> Type[Coder]:
+        return cls.base or FastAPICache.get_coder()
+
+    @classmethod
+    def encode(cls, value: Any) -> bytes:
+        payload = cls.coder().encode(value)
+        _payload.set(payload)
+        return payload
+
+    @classmethod
+    def decode(cls, value: bytes) -> Any:
+        return cls.coder().decode(value)
+
+    @classmethod
+    def decode_as_type(cls, value: bytes, *, type_: Any) -> Any:
+        _payload.set(value)
+        return cls.coder().decode_as_type(value, type_=type_)
+
+
+def cache(expire: Optional[int] = None, namespace: str = "", coder: Optional[Type[Coder]] = None):
+    """
+    fastapi_cache.decorator.cache with strong ETags instead of its weak ones (they are built by hash(), which
+    differs between workers, so ConditionalResponseMiddleware replaced them and they never matched).
+    The ETag of a response is the digest of its cached payload (the same in every worker, the middleware keeps it),
+    GET with If-None-Match which matches the cached payload is answered by 304 without calling the endpoint.
+    :param expire: lifetime of the cached response in seconds.
+    :param namespace: namespace of the cache keys.
+    :param coder: coder of the cached payload.
+    """
+    def wrapper(func):
+        payload_coder = type("PayloadCoder", (PayloadCoder,), {"base": coder})
+        cached_func = fastapi_cache(expire, coder=payload_coder, namespace=namespace)(func)
+
+        @wraps(cached_func)
+        async def inner(*args, **kwargs):
+            request: Request | None = kwargs.get(REQUEST_PARAMETER)
+            response: Response | None = kwargs.get(RESPONSE_PARAMETER)
+            if_none_match = request.headers.get("if-none-match") if request is not None else None
+            if if_none_match is not None and request.method == "GET" and \
+                    request.headers.get("Cache-Control") not in ("no-cache", "no-store"):
+                not_modified = await not_modified_response(func, namespace, request, response, args, kwargs,
+                                                           if_none_match)
+                if not_modified is not None:
+                    return not_modified
+            _payload.set(None)
+            result = await cached_func(*args, **kwargs)
+            payload = _payload.get()
+            # RawJSONResponse is sent as is with its own ETag (the digest of the same payload)
+            if response is not None and payload is not None and not isinstance(result, Response):
+                response.headers["etag"] = strong_etag(payload)
+            return result
+
+        return inner
+
+    return wrapper
+
+
+async def not_modified_response(func, namespace: str, request: Request, response: Response | None, args: tuple,
+                                kwargs: dict, if_none_match: str) -> Response | None:
+    """
+    304 response if the cached payload of the request matches If-None-Match, None if it doesn't or isn't cached.
+    """
+    key = FastAPICache.get_key_builder()(
+        func, f"{FastAPICache.get_prefix()}:{namespace}", request=request, response=response, args=args,
+        kwargs={name: value for name, value in kwargs.items() if name not in (REQUEST_PARAMETER, RESPONSE_PARAMETER)}
+    )
+    if isawaitable(key):
+        key = await key
+    try:
+        ttl, value = await FastAPICache.get_backend().get_with_ttl(key)
+    except Exception:
+        logger.warning(f"Error retrieving cache key '{key}' from backend:", exc_info=True)
+        return None
+    if value is None:
+        return None
+    etag = strong_etag(value)
+    if not etag_matches(if_none_match, etag):
+        return None
+    headers = {"etag": etag, FastAPICache.get_cache_status_header(): "HIT"}
+    if ttl > 0:
+        headers["cache-control"] = f"max-age={ttl}"
+    return Response(status_code=304, headers=headers)
@@ -0,0 +1,288 @@
+import logging
+import math
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Type
+
+from fastapi_cache import FastAPICache, default_key_builder
+from fastapi_cache.backends.redis import RedisBackend
+from starlette.requests import Request
+from starlette.responses import Response
+
+from core.cache.redis_conf import redis
+from core.config import CACHE_ADMISSION_SIZE, CACHE_EXPIRE, DB_READ_YOUR_WRITES_WINDOW
+from core.db.database import CandidatesDB, CandidatesSkillsDB, JobOpeningsDB, RequiredSkillsDB
+from core.db.replicas import pin_primary
+from core.db.request_db import get_skill_names_db
+
+
+logger = logging.getLogger(__name__)
+
+# (cache key, tags) of the response which is being computed in the current request, tags are None
+# if the response mustn't be cached
+_pending_tags: ContextVar[Tuple[str, Set[str] | None] | None] = ContextVar("pending_cache_tags", default=None)
+# (cache key, invalidation epoch) read together with the cached value, before the response is computed
+_read_epoch: ContextVar[Tuple[str, int] | None] = ContextVar("cache_read_epoch", default=None)
+
+# parameters of endpoints which make the cached response depend on a candidate or a job opening
+ID_PARAMETERS_TAGS = {
+    "candidate_id": "candidate",
+    "job_id": "job",
+    "job_openings_id": "job",
+}
+
+# KEYS: the epoch counter, the window of reads from the primary, sets of the tags, epochs of the tags;
+# ARGV: number of tags, lifetime of epochs of tags, length of the window in milliseconds
+_invalidate_script = redis.register_script("""
+local count = tonumber(ARGV[1])
+local epoch = redis.call('INCR', KEYS[1])
+redis.call('SET', KEYS[2], epoch, 'PX', ARGV[3])
+local deleted = {}
+for i = 1, count do
+    local tag = KEYS[2 + i]
+    for _, key in ipairs(redis.call('SMEMBERS', tag)) do
+        redis.call('DEL', key)
+        table.insert(deleted, key)
+    end
+    redis.call('DEL', tag)
+    redis.call('SET', KEYS[2 + count + i], epoch, 'EX', ARGV[2])
+end
+return deleted
+""")
+
+# KEYS: the cache key, sets of the tags, epochs of the tags; ARGV: value, expire, epoch of the read, number of tags
+_set_script = redis.register_script("""
+local count = tonumber(ARGV[4])
+for i = 1, count do
+    local invalidated = redis.call('GET', KEYS[1 + count + i])
+    if invalidated and tonumber(invalidated) > tonumber(ARGV[3]) then
+        return 0
+    end
+end
+local expire = tonumber(ARGV[2])
+if expire > 0 then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', expire)
+else
+    redis.call('SET', KEYS[1], ARGV[1])
+end
+for i = 1, count do
+    redis.call('SADD', KEYS[1 + i], KEYS[1])
+    if expire > 0 then
+        redis.call('EXPIRE', KEYS[1 + i], expire)
+    end
+end
+return 1
+""")
+
+
+def tag_key(tag: str) -> str:
+    return f"{FastAPICache.get_prefix()}:tag:{tag}"
+
+
+def tag_epoch_key(tag: str) -> str:
+    return f"{FastAPICache.get_prefix()}:tag-epoch:{tag}"
+
+
+def epoch_key() -> str:
+    return f"{FastAPICache.get_prefix()}:epoch"
+
+
+def primary_window_key() -> str:
+    return f"{FastAPICache.get_prefix()}:read-primary"
+
+
+def tagged_key_builder(func: Callable[..., Any], namespace: str = "", *, request: Optional[Request] = None,
+                       response: Optional[Response] = None, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> str:
+    """
+    Default key of fastapi_cache, besides it remembers the tags of the key: the namespace and the candidate
+    or the job opening from the path parameters. Tags are saved together with the cached value.
+    """
+    cache_key = default_key_builder(func, namespace, request=request, response=response, args=args, kwargs=kwargs)
+    tags = {namespace.removeprefix(f"{FastAPICache.get_prefix()}:")}
+    for parameter, tag in ID_PARAMETERS_TAGS.items():
+        if parameter in kwargs:
+            tags.add(f"{tag}:{kwargs[parameter]}")
+    _pending_tags.set((cache_key, tags))
+    return cache_key
+
+
+def add_cache_tags(*tags: str):
+    """
+    Attach tags to the response which is being cached in the current request (nothing happens if it isn't cached).
+    :param tags: tags, the cached response is deleted when any of them is invalidated.
+    """
+    pending = _pending_tags.get()
+    if pending is not None and pending[1] is not None:
+        pending[1].update(tags)
+
+
+class Doorkeeper:
+    """
+    Bounded set of recently requested keys: a key is admitted to the cache when it is requested again,
+    so one-off requests (e.g. rare combinations of filters) don't create cache entries.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.seen: OrderedDict[str, None] = OrderedDict()
+
+    def admit(self, key: str) -> bool:
+        if key in self.seen:
+            self.seen.move_to_end(key)
+            return True
+        self.seen[key] = None
+        if len(self.seen) > self.maxsize:
+            self.seen.popitem(last=False)
+        return False
+
+
+doorkeeper = Doorkeeper(CACHE_ADMISSION_SIZE)
+
+
+def skip_caching():
+    """
+    The response which is being computed in the current request isn't saved to the cache.
+    """
+    pending = _pending_tags.get()
+    if pending is not None:
+        _pending_tags.set((pending[0], None))
+
+
+def cache_if_repeated():
+    """
+    The response which is being computed in the current request is saved to the cache only if the same request
+    was made recently.
+    """
+    pending = _pending_tags.get()
+    if pending is not None and not doorkeeper.admit(pending[0]):
+        skip_caching()
+
+
+def cache_admitted(key: str) -> bool:
+    pending = _pending_tags.get()
+    return pending is None or pending[0] != key or pending[1] is not None
+
+
+class TaggedRedisBackend(RedisBackend):
+    """
+    Redis backend which adds every cached key to the sets of its tags.
+    Every invalidation increments the epoch counter and stamps the invalidated tags with it. The epoch is read
+    together with the cached value, before the response is computed, and the response isn't saved if any of its
+    tags was invalidated after that: it may be computed from the data before the write.
+    For DB_READ_YOUR_WRITES_WINDOW after any invalidation responses are computed from the primary, so a lagging
+    replica doesn't put the data before the write back to the cache.
+    """
+
+    async def get_with_ttl(self, key: str) -> Tuple[int, Optional[bytes]]:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            ttl, value, epoch, recent_write = await (
+                pipe.ttl(key).get(key).get(epoch_key()).exists(primary_window_key()).execute()
+            )
+        _read_epoch.set((key, int(epoch or 0)))
+        if value is None and recent_write:
+            pin_primary()
+        return ttl, value
+
+    async def set(self, key: str, value: bytes, expire: Optional[int] = None) -> bool:
+        """
+        :return: the value is saved (False if it isn't admitted or it is stale).
+        """
+        read = _read_epoch.get()
+        if not cache_admitted(key) or read is None or read[0] != key:
+            return False
+        pending = _pending_tags.get()
+        tags = sorted(pending[1]) if pending is not None and pending[0] == key else []
+        stored = await _set_script(
+            keys=[key, *(tag_key(tag) for tag in tags), *(tag_epoch_key(tag) for tag in tags)],
+            args=[value, expire or 0, read[1], len(tags)], client=self.redis
+        )
+        return bool(stored)
+
+    async def forget(self, keys: List[str]):
+        """
+        Called after the keys were deleted by invalidation, backends with local copies drop them here.
+        :param keys: deleted cache keys.
+        """
+
+
+async def invalidate_cache(*tags: str):
+    """
+    Delete all cached responses with any of the tags.
+    Errors of the cache service are only logged: data in the database is already changed.
+    :param tags: tags to invalidate.
+    """
+    if not tags:
+        return
+    tags = set(tags)
+    try:
+        # epochs of tags outlive responses which are being computed (they take much less than CACHE_EXPIRE)
+        keys = await _invalidate_script(
+            keys=[epoch_key(), primary_window_key(), *(tag_key(tag) for tag in tags),
+                  *(tag_epoch_key(tag) for tag in tags)],
+            args=[len(tags), CACHE_EXPIRE, max(math.ceil(DB_READ_YOUR_WRITES_WINDOW * 1000), 1)]
+        )
+        if keys:
+            await FastAPICache.get_backend().forget([key.decode() for key in keys])
+    except Exception:
+        logger.warning(f"Error invalidating cache tags {tags}:", exc_info=True)
+
+
+def candidate_tags(candidate_id: int | None = None, skill_names: Iterable[str] = ()) -> list:
+    """
+    Tags of cached responses which depend on the candidate and its skills.
+    :param candidate_id: id of changed candidate (None for new candidate).
+    :param skill_names: indexing names of added or changed skills.
+    :return: list
+    """
+    tags = ["all_candidates_with_pagination", "candidates_search"]
+    if candidate_id is not None:
+        tags.append(f"candidate:{candidate_id}")
+    tags.extend(f"candidates_skill:{name}" for name in skill_names)
+    return tags
+
+
+def job_opening_tags(job_id: int | None = None, skill_names: Iterable[str] = ()) -> list:
+    """
+    Tags of cached responses which depend on the job opening and its required skills.
+    :param job_id: id of changed job opening (None for new job opening).
+    :param skill_names: indexing names of added or changed required skills.
+    :return: list
+    """
+    tags = ["all_job_openings_with_pagination", "job_openings_search"]
+    if job_id is not None:
+        tags.append(f"job:{job_id}")
+    tags.extend(f"required_skill:{name}" for name in skill_names)
+    return tags
+
+
+async def removed_requirements_tags(job_id: int, skill_names: Iterable[str] = ()) -> list:
+    """
+    Tags of the job opening whose required skills were removed: it may match new candidates, each of them has
+    every remaining required skill, so tags of the remaining names reach their cached selections (see tag_selection).
+    :param job_id: id of changed job opening.
+    :param skill_names: indexing names of other changed required skills.
+    :return: list
+    """
+    remaining = await get_skill_names_db(orm_table_class=RequiredSkillsDB, foreign_key=job_id)
+    return job_opening_tags(job_id=job_id, skill_names=[*skill_names, *remaining])
+
+
+async def tag_selection(record_id: int, orm_table_for_search: Type[CandidatesDB | JobOpeningsDB],
+                        found_ids: Iterable[int]):
+    """
+    Attach reverse dependencies to the cached selection page: every found record and skill names of the record
+    for which the selection is made (a change of a skill with such name may add a new record to the page).
+    :param record_id: id of record for which the selection was made.
+    :param orm_table_for_search: the table with the found records.
+    :param found_ids: ids of found records.
+    """
+    if _pending_tags.get() is None:
+        return
+    if orm_table_for_search is CandidatesDB:
+        names = await get_skill_names_db(orm_table_class=RequiredSkillsDB, foreign_key=record_id)
+        add_cache_tags(*(f"candidate:{found_id}" for found_id in found_ids),
+                       *(f"candidates_skill:{name}" for name in names))
+    else:
+        names = await get_skill_names_db(orm_table_class=CandidatesSkillsDB, foreign_key=record_id)
+        add_cache_tags(*(f"job:{found_id}" for found_id in found_ids),
+                       *(f"required_skill:{name}" for name in names))
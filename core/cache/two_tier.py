@@ -0,0 +1,168 @@
+import asyncio
+import json
+import logging
+import math
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from fastapi_cache import FastAPICache
+
+from core.cache.invalidation import TaggedRedisBackend
+from core.config import CACHE_LOCAL_SIZE, CACHE_LOCAL_EXPIRE
+
+
+logger = logging.getLogger(__name__)
+
+TIERS = ("local", "redis")
+OUTCOMES = ("hits", "misses", "bytes")
+
+
+class LRUCache:
+    """
+    Size-bounded mapping with expiration time of every entry, the least recently used entry is evicted first.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.entries: OrderedDict[str, Tuple[float, bytes]] = OrderedDict()
+
+    def get(self, key: str) -> Tuple[int, bytes] | None:
+        """
+        :return: (seconds to expiration, value) or None if there is no such entry.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        ttl = expires_at - time.monotonic()
+        if ttl <= 0:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return math.ceil(ttl), value
+
+    def set(self, key: str, value: bytes, ttl: int):
+        self.entries[key] = (time.monotonic() + ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def delete(self, keys: List[str]):
+        for key in keys:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+
+
+def namespace_of(key: str) -> str:
+    """
+    Namespace of the endpoint from the cache key '{prefix}:{namespace}:{hash}'.
+    """
+    return key.removeprefix(f"{FastAPICache.get_prefix()}:").rpartition(":")[0]
+
+
+class TwoTierBackend(TaggedRedisBackend):
+    """
+    In-process LRU cache in front of the tagged Redis backend.
+    Keys deleted by invalidation are published to the channel '{prefix}:invalidate', every worker listens to it
+    and drops them from its local cache. While the worker isn't subscribed, the local cache isn't used.
+    """
+
+    def __init__(self, redis, maxsize: int = CACHE_LOCAL_SIZE, expire: int = CACHE_LOCAL_EXPIRE):
+        super().__init__(redis)
+        self.local = LRUCache(maxsize)
+        self.expire = expire
+        self.counters: Counter = Counter()
+        self.subscribed = False
+        self._listener: asyncio.Task | None = None
+
+    @property
+    def channel(self) -> str:
+        return f"{FastAPICache.get_prefix()}:invalidate"
+
+    def _count(self, key: str, tier: str, value: bytes | None):
+        namespace = namespace_of(key)
+        if value is None:
+            self.counters[namespace, tier, "misses"] += 1
+        else:
+            self.counters[namespace, tier, "hits"] += 1
+            self.counters[namespace, tier, "bytes"] += len(value)
+
+    async def get_with_ttl(self, key: str) -> Tuple[int, Optional[bytes]]:
+        if self.subscribed:
+            cached = self.local.get(key)
+            self._count(key, "local", cached[1] if cached is not None else None)
+            if cached is not None:
+                return cached
+        ttl, value = await super().get_with_ttl(key)
+        self._count(key, "redis", value)
+        if value is not None and self.subscribed:
+            self.local.set(key, value, min(ttl, self.expire) if ttl > 0 else self.expire)
+        return ttl, value
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return (await self.get_with_ttl(key))[1]
+
+    async def set(self, key: str, value: bytes, expire: Optional[int] = None) -> bool:
+        stored = await super().set(key, value, expire)
+        if stored and self.subscribed:
+            self.local.set(key, value, min(expire, self.expire) if expire else self.expire)
+        return stored
+
+    async def clear(self, namespace: Optional[str] = None, key: Optional[str] = None) -> int:
+        count = await super().clear(namespace=namespace, key=key)
+        await self.redis.publish(self.channel, json.dumps([key] if key else None))
+        return count
+
+    async def forget(self, keys: List[str]):
+        self.local.delete(keys)
+        await self.redis.publish(self.channel, json.dumps(keys))
+
+    async def listen(self):
+        """
+        Drop keys published by other workers from the local cache (null message clears it).
+        The subscription is restored after errors, the local cache is cleared because messages could be missed.
+        """
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    self.local.clear()
+                    self.subscribed = True
+                    async for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+                        keys = json.loads(message["data"])
+                        if keys is None:
+                            self.local.clear()
+                        else:
+                            self.local.delete(keys)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Cache invalidation channel is lost, the local cache is off until reconnection:",
+                               exc_info=True)
+            finally:
+                self.subscribed = False
+                self.local.clear()
+            await asyncio.sleep(1)
+
+    def start(self):
+        self._listener = asyncio.create_task(self.listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Dict[str, Dict[str, int]]]:
+        """
+        Hits, misses and bytes served by every tier: {"total": {tier: {...}}, namespace: {tier: {...}}}.
+        """
+        stats = {"total": {tier: dict.fromkeys(OUTCOMES, 0) for tier in TIERS}}
+        for (namespace, tier, outcome), count in list(self.counters.items()):
+            stats.setdefault(namespace, {name: dict.fromkeys(OUTCOMES, 0) for name in TIERS})[tier][outcome] += count
+            stats["total"][tier][outcome] += count
+        return stats
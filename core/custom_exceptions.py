@@ -16,3 +16,7 @@ def non_existent_object(http_status: int = 404, message: str = "There are no obj
 
 def non_existing_foreign_key(http_status: int = 400, message: str = "There are no candidates with such id"):
     raise_exception(status=http_status, info=message)
+
+
+def duplicate_skill(http_status: int = 400, message: str = "The record already has a skill with this name"):
+    raise_exception(status=http_status, info=message)
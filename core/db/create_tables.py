@@ -1,9 +1,20 @@
-from sqlalchemy import inspect
+import logging
 
-from core.db.database import engine, CandidatesDB, JobOpeningsDB, RequiredSkillsDB, CandidatesSkillsDB, Base
-from core.db.request_db import add_model_db
+from sqlalchemy import inspect, text, update, select, func, UniqueConstraint
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.schema import AddConstraint
+
+from core.config import REMOVE_DUPLICATE_SKILLS
+from core.db.database import engine, CandidatesDB, JobOpeningsDB, RequiredSkillsDB, CandidatesSkillsDB, Base, \
+    CandidateJobMatchesDB, SkillsDB, session
+from core.db.matches import refresh_matches, refresh_record_matches
+from core.db.request_db import add_models_db
+from core.db.skills_snapshot import OWNERS, snapshot_subquery, refresh_skills_snapshot
 from core.schemas import AddCandidates, AddJobOpenings, AddRequiredSkills, AddCandidateSkills
 
+
+logger = logging.getLogger(__name__)
+
 candidates = [
     AddCandidates(
         first_name="Ilya", second_name="Safronov", age=28, status=2, city="Minsk", desired_position="Developer",
@@ -224,18 +235,170 @@ job_openings = [
     ]
 
 
+async def move_skill_names_to_dictionary(conn: AsyncConnection):
+    """
+    Replace the column indexing_skill_name of skills tables with skill_id from the new table skills.
+    :param conn: connection with opened transaction.
+    """
+    await conn.run_sync(SkillsDB.__table__.create)
+    await conn.execute(text(
+        f"INSERT INTO {SkillsDB.__tablename__} (name) "
+        f"SELECT indexing_skill_name FROM {CandidatesSkillsDB.__tablename__} "
+        f"UNION SELECT indexing_skill_name FROM {RequiredSkillsDB.__tablename__}"
+    ))
+    for orm_table_class in (CandidatesSkillsDB, RequiredSkillsDB):
+        name = orm_table_class.__tablename__
+        await conn.execute(text(
+            f"ALTER TABLE {name} ADD COLUMN skill_id integer REFERENCES {SkillsDB.__tablename__} (id)"
+        ))
+        await conn.execute(text(
+            f"UPDATE {name} SET skill_id = {SkillsDB.__tablename__}.id FROM {SkillsDB.__tablename__} "
+            f"WHERE {SkillsDB.__tablename__}.name = {name}.indexing_skill_name"
+        ))
+        await conn.execute(text(f"ALTER TABLE {name} ALTER COLUMN skill_id SET NOT NULL"))
+        await conn.execute(text(f"ALTER TABLE {name} DROP COLUMN indexing_skill_name"))
+        for index in orm_table_class.__table__.indexes:
+            if 'skill_id' in index.columns:
+                await conn.run_sync(index.create)
+
+
+async def add_search_vectors(conn: AsyncConnection):
+    """
+    Add generated columns of the full-text search to tables created before them (their GIN indexes
+    are created by create_missing_indexes).
+    :param conn: connection with opened transaction.
+    """
+    for orm_table_class in (CandidatesDB, JobOpeningsDB):
+        name = orm_table_class.__tablename__
+        vector = orm_table_class.__table__.c.search_vector
+        await conn.execute(text(
+            f"ALTER TABLE {name} ADD COLUMN {vector.name} tsvector GENERATED ALWAYS AS ({vector.computed.sqltext}) "
+            f"STORED"
+        ))
+
+
+async def add_skills_snapshots(conn: AsyncConnection):
+    """
+    Add the column skills_snapshot to tables created before it and fill it from the skills tables.
+    :param conn: connection with opened transaction.
+    """
+    for skills_class, orm_table_class in OWNERS.items():
+        owner = orm_table_class.__table__
+        await conn.execute(text(f"ALTER TABLE {owner.name} ADD COLUMN {owner.c.skills_snapshot.name} jsonb"))
+        await conn.execute(update(owner).values(skills_snapshot=snapshot_subquery(skills_class)))
+
+
+async def remove_duplicate_skills(conn: AsyncConnection, skills_class) -> int:
+    """
+    Keep the latest of repeated skills of the same record, every deleted skill is logged with its owner.
+    skills_quantity, matches and skills_snapshot of the changed records are recomputed.
+    :param conn: connection with opened transaction.
+    :param skills_class: table with skills from database.
+    :return: number of deleted skills.
+    """
+    name = skills_class.__tablename__
+    response = await conn.execute(text(
+        f"DELETE FROM {name} AS old USING {name} AS new WHERE old.foreign_key = new.foreign_key "
+        f"AND old.skill_id = new.skill_id AND old.id < new.id RETURNING old.id, old.foreign_key, old.skill_id"
+    ))
+    deleted = response.all()
+    for skill in deleted:
+        logger.warning("Repeated skill is deleted from %s: id %s, foreign_key %s, skill_id %s",
+                       name, skill.id, skill.foreign_key, skill.skill_id)
+    record_ids = sorted({skill.foreign_key for skill in deleted})
+    if record_ids:
+        if OWNERS[skills_class] is JobOpeningsDB:
+            jobs, required = JobOpeningsDB.__table__, RequiredSkillsDB.__table__
+            quantity = select(func.count()).where(required.c.foreign_key == jobs.c.id).scalar_subquery()
+            await conn.execute(update(jobs).where(jobs.c.id.in_(record_ids)).values(skills_quantity=quantity))
+        await refresh_record_matches(conn, orm_table_class=skills_class, record_ids=record_ids)
+        await refresh_skills_snapshot(conn, orm_table_class=skills_class, record_ids=record_ids, lock=False)
+    logger.warning("%s repeated skills are deleted from %s", len(deleted), name)
+    return len(deleted)
+
+
+async def add_unique_skills(conn: AsyncConnection):
+    """
+    Migration to skills unique per record: the deferrable unique constraint of foreign_key and skill_id of the skills
+    tables (it replaces the unique index of the same name, which was checked after every row).
+    If records have repeated skills, they are logged and the start is stopped, with REMOVE_DUPLICATE_SKILLS
+    they are removed first (see remove_duplicate_skills).
+    :param conn: connection with opened transaction.
+    """
+    for skills_class in OWNERS:
+        name = skills_class.__tablename__
+        (unique,) = (i for i in skills_class.__table__.constraints if isinstance(i, UniqueConstraint))
+        constraints = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_unique_constraints(name))
+        if unique.name in (i['name'] for i in constraints):
+            continue
+        await conn.execute(text(f"DROP INDEX IF EXISTS {unique.name}"))
+        response = await conn.execute(text(
+            f"SELECT foreign_key, skill_id, array_agg(id ORDER BY id) AS ids FROM {name} "
+            f"GROUP BY foreign_key, skill_id HAVING count(*) > 1"
+        ))
+        repeated = response.all()
+        if repeated and not REMOVE_DUPLICATE_SKILLS:
+            for skill in repeated:
+                logger.error("Repeated skill in %s: foreign_key %s, skill_id %s, ids %s",
+                             name, skill.foreign_key, skill.skill_id, skill.ids)
+            raise RuntimeError(
+                f"{len(repeated)} skills are repeated in records of {name}, so its unique constraint isn't created. "
+                f"Remove them or restart with REMOVE_DUPLICATE_SKILLS=true to keep the latest of every repeated skill"
+            )
+        if repeated:
+            await remove_duplicate_skills(conn, skills_class)
+        await conn.execute(AddConstraint(unique))
+
+
+def create_missing_indexes(sync_conn):
+    """
+    Create indexes of the models which were added after their tables.
+    :param sync_conn: connection with opened transaction.
+    """
+    inspector = inspect(sync_conn)
+    for table_ in Base.metadata.sorted_tables:
+        existing = {index['name'] for index in inspector.get_indexes(table_.name)}
+        for index in table_.indexes:
+            if index.name not in existing:
+                index.create(sync_conn)
+
+
 async def create_if_the_database_is_empty():
     """
-    Create all tables.
+    Create all tables. Databases created before the table skills get it with the column skill_id in skills tables.
+    If only the table candidate_job_matches is missing, create it and fill from existing skills.
+    Tables created before the full-text search get its columns, tables created before skills_snapshot get it filled
+    from the skills, skills tables get their unique constraint (see add_unique_skills), missing indexes are created
+    (the extension pg_trgm is required by the index of skill names).
     """
-    async with engine.connect() as conn:
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         tables = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names())
 
     if not (CandidatesDB.__tablename__ in tables and CandidatesSkillsDB.__tablename__ in tables and
             JobOpeningsDB.__tablename__ in tables and RequiredSkillsDB.__tablename__ in tables):
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
-        for i in candidates:
-            await add_model_db(model=i, orm_table_class=CandidatesDB, foreign_orm_table_class=CandidatesSkillsDB)
-        for x in job_openings:
-            await add_model_db(model=x, orm_table_class=JobOpeningsDB, foreign_orm_table_class=RequiredSkillsDB)
+        await add_models_db(models=candidates, orm_table_class=CandidatesDB, foreign_orm_table_class=CandidatesSkillsDB)
+        await add_models_db(models=job_openings, orm_table_class=JobOpeningsDB,
+                            foreign_orm_table_class=RequiredSkillsDB)
+        return
+
+    if SkillsDB.__tablename__ not in tables:
+        async with engine.begin() as conn:
+            await move_skill_names_to_dictionary(conn)
+    async with engine.begin() as conn:
+        columns = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_columns(CandidatesDB.__tablename__))
+        if 'search_vector' not in (i['name'] for i in columns):
+            await add_search_vectors(conn)
+        if 'skills_snapshot' not in (i['name'] for i in columns):
+            await add_skills_snapshots(conn)
+    if CandidateJobMatchesDB.__tablename__ not in tables:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with session() as ses:
+            await refresh_matches(ses)
+            await ses.commit()
+    async with engine.begin() as conn:
+        await add_unique_skills(conn)
+        await conn.run_sync(create_missing_indexes)
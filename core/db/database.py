@@ -1,22 +1,70 @@
 from datetime import datetime
 from typing import List
-from core.config import DB_USER, DB_HOST, DB_NAME, DB_PASS, DB_PORT
+from core.config import DB_USER, DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_POOL_SIZE, DB_MAX_OVERFLOW, \
+    DB_STATEMENT_CACHE_SIZE, TEXT_SEARCH_CONFIG
 
-from sqlalchemy import text, String, ForeignKey
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy import text, String, ForeignKey, Index, Computed, UniqueConstraint, make_url
+from sqlalchemy.dialects.postgresql import TSVECTOR, JSONB
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
-engine = create_async_engine(f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}", echo=False)
+def make_engine(url: str) -> AsyncEngine:
+    """
+    Engine with the pool settings of the application (for the primary and for replicas).
+    :param url: postgresql:// or postgresql+asyncpg:// url.
+    :return: AsyncEngine
+    """
+    return create_async_engine(
+        make_url(url).set(drivername="postgresql+asyncpg"), echo=False,
+        pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+        connect_args={"prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+    )
+
+
+engine = make_engine(f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
 session = async_sessionmaker(engine, expire_on_commit=False)
+# connections of the same pool for single statements which don't need BEGIN/COMMIT round-trips
+autocommit_engine = engine.execution_options(isolation_level="AUTOCOMMIT")
 
 
 class Base(DeclarativeBase):
     id: Mapped[int] = mapped_column(primary_key=True)
 
 
+def search_document_column(*weighted_columns: str):
+    """
+    Generated column with the document of the full-text search, it isn't loaded with ORM objects.
+    :param weighted_columns: names of text columns, the first one has the highest weight (A, B, C, D).
+    :return: mapped column
+    """
+    document = " || ".join(
+        f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce({name}, '')), '{weight}')"
+        for name, weight in zip(weighted_columns, "ABCD")
+    )
+    return mapped_column(TSVECTOR, Computed(document, persisted=True), deferred=True)
+
+
+def skills_snapshot_column():
+    """
+    Copy of the skills of the record (JSON array of their rows ordered by id), it is kept in the same transaction
+    with the skills and read instead of them. Null - there is no copy, the skills are read from their table.
+    It isn't loaded with ORM objects by default.
+    :return: mapped column
+    """
+    return mapped_column(JSONB, nullable=True, deferred=True, info={'skills_snapshot': True})
+
+
 class CandidatesDB(Base):
     __tablename__ = 'candidates'
+    __table_args__ = (
+        Index('ix_candidates_search_vector', 'search_vector', postgresql_using='gin'),
+        # filters of the list of candidates, the trailing id serves the order of pages
+        Index('ix_candidates_city_status_id', 'city', 'status', 'id'),
+        Index('ix_candidates_desired_position_status_id', 'desired_position', 'status', 'id'),
+        Index('ix_candidates_published_status_education_degree_id', 'status', 'education_degree', 'id',
+              postgresql_where=text('published')),
+    )
 
     first_name = mapped_column(String(20), nullable=False)
     second_name = mapped_column(String(20), nullable=False)
@@ -29,16 +77,34 @@ class CandidatesDB(Base):
     about_oneself = mapped_column(String(1000))
     published: Mapped[bool] = mapped_column(default=True)
     time_create: Mapped[datetime] = mapped_column(server_default=text("TIMEZONE('utc', now()) "))
+    search_vector = search_document_column('desired_position', 'working_experience', 'about_oneself')
+    skills_snapshot = skills_snapshot_column()
 
     skills: Mapped[List["CandidatesSkillsDB"]] = relationship()
 
 
+class SkillsDB(Base):
+    __tablename__ = 'skills'
+    __table_args__ = (
+        # fuzzy suggestions of skill names (the extension pg_trgm)
+        Index('ix_skills_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
+
+    name = mapped_column(String(30), unique=True, nullable=False)
+
+
 class CandidatesSkillsDB(Base):
     __tablename__ = 'candidates_skills'
+    __table_args__ = (
+        # a record has every skill once, the matching engines rely on it; the constraint is checked at the end
+        # of the statement (deferrable), so one UPDATE can swap skills of a record
+        UniqueConstraint('foreign_key', 'skill_id', name='uq_candidates_skills_foreign_key_skill_id',
+                         deferrable=True, initially='IMMEDIATE'),
+    )
 
     foreign_key: Mapped[int] = mapped_column(ForeignKey("candidates.id", ondelete="CASCADE"), index=True)
     skill_name = mapped_column(String(30), nullable=False)
-    indexing_skill_name = mapped_column(String(30), index=True, nullable=False)
+    skill_id: Mapped[int] = mapped_column(ForeignKey("skills.id"), index=True)
     level: Mapped[int]
     years_of_experience: Mapped[int]
     last_used_year: Mapped[int]
@@ -47,12 +113,19 @@ class CandidatesSkillsDB(Base):
 
 class JobOpeningsDB(Base):
     __tablename__ = 'job_openings'
+    __table_args__ = (
+        Index('ix_job_openings_search_vector', 'search_vector', postgresql_using='gin'),
+        # filters of the list of job openings
+        Index('ix_job_openings_address_salary', 'address', 'salary'),
+    )
 
     title = mapped_column(String(40), index=True, nullable=False)
     description = mapped_column(String(1000))
     address = mapped_column(String(100), index=True, nullable=False)
     salary: Mapped[int] = mapped_column(index=True)
     time_create: Mapped[datetime] = mapped_column(server_default=text("TIMEZONE('utc', now()) "))
+    search_vector = search_document_column('title', 'description')
+    skills_snapshot = skills_snapshot_column()
 
     skills: Mapped[List["RequiredSkillsDB"]] = relationship()
     skills_quantity: Mapped[int]
@@ -60,10 +133,27 @@ class JobOpeningsDB(Base):
 
 class RequiredSkillsDB(Base):
     __tablename__ = 'required_skills'
+    __table_args__ = (
+        UniqueConstraint('foreign_key', 'skill_id', name='uq_required_skills_foreign_key_skill_id',
+                         deferrable=True, initially='IMMEDIATE'),
+    )
 
     foreign_key: Mapped[int] = mapped_column(ForeignKey("job_openings.id", ondelete="CASCADE"), index=True)
     skill_name = mapped_column(String(30), nullable=False)
-    indexing_skill_name = mapped_column(String(30), index=True, nullable=False)
+    skill_id: Mapped[int] = mapped_column(ForeignKey("skills.id"), index=True)
     level: Mapped[int]
     years_of_experience: Mapped[int]
     score: Mapped[int]
+
+
+class CandidateJobMatchesDB(Base):
+    __tablename__ = 'candidate_job_matches'
+    __table_args__ = (
+        Index('ix_candidate_job_matches_job_id_score', 'job_id', 'candidate_score', 'candidate_id'),
+        Index('ix_candidate_job_matches_candidate_id_score', 'candidate_id', 'job_score', 'job_id'),
+    )
+
+    candidate_id: Mapped[int] = mapped_column(ForeignKey("candidates.id", ondelete="CASCADE"))
+    job_id: Mapped[int] = mapped_column(ForeignKey("job_openings.id", ondelete="CASCADE"))
+    candidate_score: Mapped[int]
+    job_score: Mapped[int]
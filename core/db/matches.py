@@ -0,0 +1,81 @@
+from typing import List, Type
+
+from sqlalchemy import select, delete, insert, func, FromClause
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.db.database import CandidatesDB, CandidatesSkillsDB, RequiredSkillsDB, JobOpeningsDB, CandidateJobMatchesDB, \
+    Base
+
+
+def matches_query(candidate_ids: List[int] | None = None, job_ids: List[int] | None = None,
+                  candidate_skills: FromClause = CandidatesSkillsDB.__table__,
+                  required_skills: FromClause = RequiredSkillsDB.__table__,
+                  job_openings: FromClause = JobOpeningsDB.__table__):
+    """
+    Pairs (candidate, job opening) where the candidate has every required skill of the job opening.
+    candidate_score - sum of scores of matched candidate skills (sorting of candidates for a job opening),
+    job_score - sum of scores of matched required skills (sorting of job openings for a candidate).
+    :param candidate_ids: compute matches only for these candidates.
+    :param job_ids: compute matches only for these job openings.
+    :param candidate_skills: rows of candidates_skills (the table or rows returned by an INSERT in a CTE).
+    :param required_skills: rows of required_skills (the table or rows returned by an INSERT in a CTE).
+    :param job_openings: rows of job_openings with id and skills_quantity.
+    :return: Select
+    """
+    query = (
+        select(
+            candidate_skills.c.foreign_key.label('candidate_id'), required_skills.c.foreign_key.label('job_id'),
+            func.sum(candidate_skills.c.score).label('candidate_score'),
+            func.sum(required_skills.c.score).label('job_score')
+        )
+        .select_from(candidate_skills)
+        .join(required_skills, required_skills.c.skill_id == candidate_skills.c.skill_id)
+        .join(job_openings, job_openings.c.id == required_skills.c.foreign_key)
+        .where(
+            candidate_skills.c.level >= required_skills.c.level,
+            candidate_skills.c.years_of_experience >= required_skills.c.years_of_experience
+        )
+        .group_by(candidate_skills.c.foreign_key, required_skills.c.foreign_key, job_openings.c.skills_quantity)
+        .having(func.count(candidate_skills.c.skill_name) == job_openings.c.skills_quantity)
+    )
+    if candidate_ids is not None:
+        query = query.where(candidate_skills.c.foreign_key.in_(candidate_ids))
+    if job_ids is not None:
+        query = query.where(required_skills.c.foreign_key.in_(job_ids))
+    return query
+
+
+async def refresh_matches(ses: AsyncSession, candidate_ids: List[int] | None = None,
+                          job_ids: List[int] | None = None):
+    """
+    Recompute rows of candidate_job_matches for some candidates or job openings in the current transaction.
+    Without arguments the whole table is recomputed.
+    :param ses: opened session.
+    :param candidate_ids: ids of candidates whose skills were changed.
+    :param job_ids: ids of job openings whose required skills were changed.
+    """
+    stale_matches = delete(CandidateJobMatchesDB)
+    if candidate_ids is not None:
+        stale_matches = stale_matches.where(CandidateJobMatchesDB.candidate_id.in_(candidate_ids))
+    if job_ids is not None:
+        stale_matches = stale_matches.where(CandidateJobMatchesDB.job_id.in_(job_ids))
+    await ses.execute(stale_matches)
+    await ses.execute(
+        insert(CandidateJobMatchesDB).from_select(
+            ['candidate_id', 'job_id', 'candidate_score', 'job_score'],
+            matches_query(candidate_ids=candidate_ids, job_ids=job_ids)
+        )
+    )
+
+
+async def refresh_record_matches(ses: AsyncSession, orm_table_class: Type[Base], record_ids: List[int]):
+    """
+    Recompute matches of the candidates or job openings which own the changed skills.
+    :param ses: opened session.
+    :param orm_table_class: CandidatesDB/CandidatesSkillsDB or JobOpeningsDB/RequiredSkillsDB.
+    :param record_ids: ids of candidates or job openings.
+    """
+    if orm_table_class is CandidatesDB or orm_table_class is CandidatesSkillsDB:
+        await refresh_matches(ses, candidate_ids=record_ids)
+    else:
+        await refresh_matches(ses, job_ids=record_ids)
@@ -0,0 +1,128 @@
+import asyncio
+import itertools
+import logging
+import math
+import time
+from contextvars import ContextVar
+from typing import List
+
+from fastapi import Request
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+
+from core.config import DB_REPLICAS, DB_READ_YOUR_WRITES_WINDOW, DB_REPLICA_CHECK_INTERVAL, DB_REPLICA_CHECK_TIMEOUT
+from core.db.database import engine, make_engine, session
+
+
+logger = logging.getLogger(__name__)
+
+PRIMARY_COOKIE = "read_primary_until"
+
+# state of the current request: {"pinned": reads go to the primary, "wrote": the request changed data}
+request_writes: ContextVar[dict | None] = ContextVar("request_writes", default=None)
+
+
+def mark_write():
+    """
+    Reads of the current request (and of the client during DB_READ_YOUR_WRITES_WINDOW) go to the primary.
+    """
+    state = request_writes.get()
+    if state is not None:
+        state["pinned"] = state["wrote"] = True
+
+
+def pin_primary():
+    """
+    Reads of the current request go to the primary (the client doesn't get the cookie, it didn't write).
+    """
+    state = request_writes.get()
+    if state is not None:
+        state["pinned"] = True
+
+
+@event.listens_for(engine.sync_engine, "commit")
+def _on_commit(conn):
+    mark_write()
+
+
+class Replica:
+    def __init__(self, dsn: str):
+        self.engine = make_engine(dsn)
+        self.session = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.name = self.engine.url.render_as_string(hide_password=True)
+        self.healthy = True
+
+
+class ReplicaSet:
+    """
+    Read replicas of the primary. Sessions for reads are taken from healthy replicas in turn,
+    a replica which fails the health check is ejected until it passes it again.
+    Without healthy replicas and for pinned requests reads go to the primary.
+    """
+
+    def __init__(self, dsns: List[str]):
+        self.replicas = [Replica(dsn) for dsn in dsns]
+        self._turn = itertools.count()
+        self._checker: asyncio.Task | None = None
+
+    def read_session(self) -> AsyncSession:
+        state = request_writes.get()
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy or (state is not None and state["pinned"]):
+            return session()
+        return healthy[next(self._turn) % len(healthy)].session()
+
+    @staticmethod
+    async def _ping(replica: Replica):
+        async with replica.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def _check(self, replica: Replica):
+        try:
+            await asyncio.wait_for(self._ping(replica), timeout=DB_REPLICA_CHECK_TIMEOUT)
+        except Exception:
+            if replica.healthy:
+                logger.warning("Replica %s is ejected:", replica.name, exc_info=True)
+            replica.healthy = False
+        else:
+            if not replica.healthy:
+                logger.info("Replica %s is back", replica.name)
+            replica.healthy = True
+
+    async def watch(self):
+        while True:
+            await asyncio.gather(*(self._check(replica) for replica in self.replicas))
+            await asyncio.sleep(DB_REPLICA_CHECK_INTERVAL)
+
+    def start(self):
+        if self.replicas:
+            self._checker = asyncio.create_task(self.watch())
+
+    async def stop(self):
+        if self._checker is not None:
+            self._checker.cancel()
+            await asyncio.gather(self._checker, return_exceptions=True)
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+replica_set = ReplicaSet(DB_REPLICAS)
+read_session = replica_set.read_session
+
+
+async def read_your_writes(request: Request, call_next):
+    """
+    Middleware: after a write the client gets a cookie and its reads go to the primary until it expires,
+    so it doesn't read stale data from a lagging replica.
+    """
+    until = request.cookies.get(PRIMARY_COOKIE, "")
+    state = {"pinned": until.replace(".", "", 1).isdigit() and float(until) > time.time(), "wrote": False}
+    token = request_writes.set(state)
+    try:
+        response = await call_next(request)
+    finally:
+        request_writes.reset(token)
+    if state["wrote"]:
+        response.set_cookie(PRIMARY_COOKIE, f"{time.time() + DB_READ_YOUR_WRITES_WINDOW:.3f}",
+                            max_age=math.ceil(DB_READ_YOUR_WRITES_WINDOW), httponly=True)
+    return response
@@ -1,43 +1,354 @@
-from typing import List, Type
+import operator
+from functools import lru_cache
+from typing import AsyncIterator, Dict, List, Tuple, Type
 
 from pydantic import BaseModel
-from sqlalchemy import select, update, delete, insert, func, desc, asc
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, update, delete, insert, func, desc, asc, tuple_, text, table, column, bindparam, \
+    Integer, any_
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import undefer
+from sqlalchemy.orm.attributes import manager_of_class, set_committed_value
 from sqlalchemy.exc import IntegrityError
 
-from core.db.database import CandidatesDB, CandidatesSkillsDB, session, Base, JobOpeningsDB, RequiredSkillsDB
+from core.config import MATCHING_ENGINE, PARTIAL_SELECTION_TOP_K, TEXT_SEARCH_CONFIG, SEARCH_RANK_LIMIT
+from core.db.database import CandidatesDB, CandidatesSkillsDB, session, Base, JobOpeningsDB, RequiredSkillsDB, \
+    CandidateJobMatchesDB, SkillsDB, autocommit_engine
+from core.db.replicas import mark_write, read_session
+from core.db.skills_dictionary import skills_dictionary
+from core.db.skill_suggestions import skill_suggestions
+from core.db.matches import refresh_record_matches, matches_query
+from core.db.skills_snapshot import refresh_skills_snapshot, snapshot_aggregate, EMPTY_SNAPSHOT
+from core.matching import IN_MEMORY_ENGINES, skill_index, posting_columns
 from core.schemas import GetCandidateSkills, GetCandidates, GetJobOpenings, GetRequiredSkills
-from core.custom_exceptions import non_existent_object, non_existing_foreign_key
+from core.schemas.utils import THIS_YEAR, count_score
+from core.custom_exceptions import non_existent_object, non_existing_foreign_key, raise_exception, duplicate_skill
+
+SKILLS_TABLES = (CandidatesSkillsDB, RequiredSkillsDB)
+# sqlstate of unique_violation: the record already has the skill (unique index of foreign_key and skill_id)
+UNIQUE_VIOLATION = '23505'
+
+
+def unique_violation(error: IntegrityError) -> bool:
+    return getattr(error.orig, 'sqlstate', None) == UNIQUE_VIOLATION
+
+
+def stored_columns(orm_table_class: Type[Base]) -> list:
+    """
+    Columns of the table without generated ones (documents of the full-text search), which only the database uses,
+    and skills_snapshot, which is derived from the skills.
+    """
+    return [i for i in orm_table_class.__table__.columns if i.computed is None and not i.info.get('skills_snapshot')]
+
+
+# filters of lists which aren't equality of the column with the same name: name -> (column, comparison)
+RANGE_FILTERS = {
+    'salary_from': ('salary', operator.ge),
+    'salary_to': ('salary', operator.le),
+}
+
+
+def filter_condition(orm_table_class: Type[Base], name: str):
+    """
+    Condition of the filter, its value is passed at execution as the bind parameter filter_<name>.
+    """
+    column_name, comparison = RANGE_FILTERS.get(name, (name, operator.eq))
+    return comparison(orm_table_class.__table__.c[column_name], bindparam(f'filter_{name}'))
+
+
+@lru_cache(maxsize=None)
+def model_statement(orm_table_class: Type[Base], by_id: bool, cursor: bool,
+                    columns: Tuple[str, ...] | None = None, filters: Tuple[str, ...] = ()):
+    """
+    Statement of get_model_db (get_rows_db), it is built once for every combination of arguments.
+    Values are passed at execution: record_id or lim with offset/after_id and values of filters.
+    :param orm_table_class: table from database.
+    :param by_id: one record by id.
+    :param cursor: page after the record with id after_id, otherwise page with offset.
+    :param columns: select only these columns of the table (Core), otherwise ORM objects with skills_snapshot.
+    :param filters: names of filters of the page (sorted), see filter_condition.
+    :return: Select
+    """
+    if columns:
+        query = select(*(orm_table_class.__table__.c[name] for name in columns))
+    else:
+        query = select(orm_table_class).options(undefer(orm_table_class.skills_snapshot))
+    if by_id:
+        return query.where(orm_table_class.id == bindparam('record_id'))
+    query = query.where(*(filter_condition(orm_table_class, name) for name in filters))
+    query = query.order_by(orm_table_class.id).limit(bindparam('lim'))
+    if cursor:
+        return query.where(orm_table_class.id > bindparam('after_id'))
+    return query.offset(bindparam('offset'))
 
 
 async def get_model_db(orm_table_class: Type[Base], record_id_db: int | None = None, lim: int | None = None,
-                       page: int | None = None) -> List | GetJobOpenings | GetCandidates:
+                       page: int | None = None, after: Tuple[int, ...] | None = None, filters: dict | None = None
+                       ) -> List | GetJobOpenings | GetCandidates:
     """
     Retrieves data from the database.
     :param orm_table_class: table from database.
     :param record_id_db: id of record from database.
     :param lim: quantity of objects to return.
     :param page: offset in sql request.
+    :param after: cursor (id of the last record of the previous page), if it is passed page is ignored,
+    empty tuple - first page.
+    :param filters: values of filters of the page by their names, None values are ignored.
     :return: List
     """
-    async with session() as ses:
-        if record_id_db:
-            query = select(orm_table_class).where(orm_table_class.id == record_id_db).options(
-                selectinload(orm_table_class.skills))
-        else:
-            query = select(orm_table_class).options(selectinload(orm_table_class.skills)
-                                                    ).limit(lim).offset(page * lim)
-        response = await ses.execute(query)
-    records_set = response.scalars().first() if record_id_db else response.scalars().all()
+    filters = active_filters(filters)
+    query = model_statement(orm_table_class, by_id=bool(record_id_db), cursor=bool(not record_id_db and after),
+                            filters=tuple(filters))
+    async with read_session() as ses:
+        response = await ses.execute(query, model_parameters(record_id_db, lim, page, after, filters))
+        records_set = response.scalars().all()
+        await attach_orm_skills(ses, records_set, orm_table_class)
+    if record_id_db:
+        records_set = records_set[0] if records_set else None
 
     if not records_set and record_id_db:
         non_existent_object()
     elif not records_set:
-        non_existent_object(message="at this moment there are no objects in database")
+        non_existent_object(message=empty_page_message(filters))
 
     return records_set
 
 
+def active_filters(filters: dict | None) -> dict:
+    """
+    Filters with values sorted by name, so every combination of filters has one statement.
+    """
+    return {name: value for name, value in sorted((filters or {}).items()) if value is not None}
+
+
+def empty_page_message(filters: dict) -> str:
+    if filters:
+        return "there are no objects which match the filters"
+    return "at this moment there are no objects in database"
+
+
+def model_parameters(record_id_db: int | None, lim: int | None, page: int | None,
+                     after: Tuple[int, ...] | None, filters: dict | None = None) -> dict:
+    """
+    Values of bind parameters of model_statement.
+    :return: dict
+    """
+    if record_id_db:
+        return {'record_id': record_id_db}
+    parameters = {f'filter_{name}': value for name, value in (filters or {}).items()}
+    if after:
+        return parameters | {'lim': lim, 'after_id': after[0]}
+    return parameters | {'lim': lim, 'offset': page * lim if after is None else 0}
+
+
+async def attach_skills(ses, records: Dict[int, dict],
+                        foreign_orm_table_class: Type[CandidatesSkillsDB | RequiredSkillsDB],
+                        columns: Tuple[str, ...] | None = None, snapshots: Dict[int, List[dict] | None] | None = None):
+    """
+    Add skills of the records (rows by id) under the key 'skills': from skills_snapshot of the records,
+    skills of records without a snapshot by one query.
+    :param ses: opened session.
+    :param records: dict {id: row}
+    :param foreign_orm_table_class: related table from database.
+    :param columns: columns of skills, by default all columns.
+    :param snapshots: skills_snapshot of the records by id.
+    """
+    table_ = foreign_orm_table_class.__table__
+    columns = columns or tuple(table_.c.keys())
+    without_snapshot = {}
+    for record_id, record in records.items():
+        snapshot = (snapshots or {}).get(record_id)
+        if snapshot is None:
+            record['skills'] = without_snapshot[record_id] = []
+        else:
+            record['skills'] = [{name: skill[name] for name in columns} for skill in snapshot]
+    if not without_snapshot:
+        return
+    skills = await ses.execute(
+        select(table_.c.foreign_key, *(table_.c[name] for name in columns))
+        .where(table_.c.foreign_key.in_(without_snapshot)).order_by(table_.c.id)
+    )
+    for foreign_key, *values in skills:
+        without_snapshot[foreign_key].append(dict(zip(columns, values)))
+
+
+async def attach_orm_skills(ses, records: List[CandidatesDB | JobOpeningsDB],
+                            orm_table_class: Type[CandidatesDB | JobOpeningsDB]):
+    """
+    Set the relationship skills of ORM records (loaded with skills_snapshot) without a query: skill objects are
+    filled from the snapshot the way ORM fills loaded rows. Skills of records without a snapshot are loaded
+    by one query.
+    :param ses: opened session.
+    :param records: ORM records.
+    :param orm_table_class: table of the records.
+    """
+    skills_class = orm_table_class.skills.property.mapper.class_
+    manager = manager_of_class(skills_class)
+    without_snapshot = {}
+    for record in records:
+        snapshot = record.skills_snapshot
+        if snapshot is None:
+            without_snapshot[record.id] = (record, [])
+            continue
+        skills = []
+        for values in snapshot:
+            skill = manager.new_instance()
+            skill.__dict__.update(values)
+            skills.append(skill)
+        set_committed_value(record, 'skills', skills)
+    if not without_snapshot:
+        return
+    response = await ses.execute(
+        select(skills_class).where(skills_class.foreign_key.in_(without_snapshot)).order_by(skills_class.id)
+    )
+    for skill in response.scalars():
+        without_snapshot[skill.foreign_key][1].append(skill)
+    for record, skills in without_snapshot.values():
+        set_committed_value(record, 'skills', skills)
+
+
+async def get_rows_db(orm_table_class: Type[CandidatesDB | JobOpeningsDB],
+                      foreign_orm_table_class: Type[CandidatesSkillsDB | RequiredSkillsDB],
+                      fields: Tuple[str, ...], skill_fields: Tuple[str, ...], record_id_db: int | None = None,
+                      lim: int | None = None, page: int | None = None, after: Tuple[int, ...] | None = None,
+                      filters: dict | None = None) -> List[dict] | dict:
+    """
+    Same as get_model_db, but records are read as rows with the passed columns only (without ORM objects
+    and the identity map), skills are taken from skills_snapshot of the rows in the same query.
+    :param orm_table_class: table from database.
+    :param foreign_orm_table_class: related table from database.
+    :param fields: columns of records in the order of keys, 'skills' is the position of the skills.
+    :param skill_fields: columns of skills.
+    :param record_id_db: id of record from database.
+    :param lim: quantity of objects to return.
+    :param page: offset in sql request.
+    :param after: cursor (id of the last record of the previous page), if it is passed page is ignored,
+    empty tuple - first page. In cursor mode an empty page is returned instead of 404.
+    :param filters: values of filters of the page by their names, None values are ignored.
+    :return: List[dict] | dict
+    """
+    filters = active_filters(filters)
+    columns = tuple(name for name in fields if name != 'skills')
+    query = model_statement(orm_table_class, by_id=bool(record_id_db), cursor=bool(not record_id_db and after),
+                            columns=('id', 'skills_snapshot') + columns, filters=tuple(filters))
+    async with read_session() as ses:
+        response = await ses.execute(query, model_parameters(record_id_db, lim, page, after, filters))
+        records, snapshots = rows_with_snapshots(response, fields, columns)
+        if records:
+            await attach_skills(ses, records, foreign_orm_table_class, skill_fields, snapshots)
+
+    if not records and record_id_db:
+        non_existent_object()
+    elif not records and after is None:
+        non_existent_object(message=empty_page_message(filters))
+
+    return records[record_id_db] if record_id_db else list(records.values())
+
+
+def rows_with_snapshots(response, fields: Tuple[str, ...], columns: Tuple[str, ...]
+                        ) -> Tuple[Dict[int, dict], Dict[int, List[dict] | None]]:
+    """
+    Records by id from rows (id, skills_snapshot, *columns) and their skills_snapshot by id.
+    """
+    records, snapshots = {}, {}
+    for record_id, snapshot, *values in response:
+        records[record_id] = dict.fromkeys(fields) | dict(zip(columns, values))
+        snapshots[record_id] = snapshot
+    return records, snapshots
+
+
+async def stream_records_db(orm_table_class: Type[CandidatesDB | JobOpeningsDB],
+                            foreign_orm_table_class: Type[CandidatesSkillsDB | RequiredSkillsDB],
+                            chunk_size: int) -> AsyncIterator[List[dict]]:
+    """
+    Retrieves all records with skills by chunks through a server-side cursor.
+    Rows are read as mappings (without ORM objects), skills are taken from skills_snapshot (records without it
+    get skills by one query per chunk).
+    :param orm_table_class: table from database.
+    :param foreign_orm_table_class: related table from database.
+    :param chunk_size: quantity of records in one chunk.
+    :return: AsyncIterator[List[dict]]
+    """
+    async with read_session() as ses:
+        response = await ses.stream(
+            select(*stored_columns(orm_table_class), orm_table_class.skills_snapshot).order_by(orm_table_class.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        async for partition in response.mappings().partitions():
+            records = {row['id']: dict(row) for row in partition}
+            snapshots = {record_id: record.pop('skills_snapshot') for record_id, record in records.items()}
+            await attach_skills(ses, records, foreign_orm_table_class, snapshots=snapshots)
+            yield list(records.values())
+
+
+@lru_cache(maxsize=None)
+def search_statement(orm_table_class: Type[CandidatesDB | JobOpeningsDB], columns: Tuple[str, ...]):
+    """
+    Statement of search_rows_db: records whose document matches the query (websearch syntax: words, "phrases",
+    OR, -word), the best ranked first, the last column is the number of ranked matches. Matches are found
+    by the GIN index, all of them are ranked or (with SEARCH_RANK_LIMIT) at most SEARCH_RANK_LIMIT + 1 of them,
+    so the time doesn't grow with the number of matches of common words and the extra match shows
+    that some matches were cut.
+    Values are passed at execution: search_query, lim, offset.
+    :param orm_table_class: table from database.
+    :param columns: columns of records.
+    :return: Select
+    """
+    query = func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, bindparam('search_query'))
+    matches = (
+        select(orm_table_class.id, orm_table_class.search_vector)
+        .where(orm_table_class.search_vector.bool_op('@@')(query))
+    )
+    if SEARCH_RANK_LIMIT:
+        matches = matches.limit(SEARCH_RANK_LIMIT + 1)
+    matches = matches.subquery()
+    rank = func.ts_rank(matches.c.search_vector, query)
+    return (
+        select(*(orm_table_class.__table__.c[name] for name in columns), func.count().over())
+        .join(matches, matches.c.id == orm_table_class.id)
+        .order_by(desc(rank), orm_table_class.id)
+        .limit(bindparam('lim')).offset(bindparam('offset'))
+    )
+
+
+async def search_rows_db(orm_table_class: Type[CandidatesDB | JobOpeningsDB],
+                         foreign_orm_table_class: Type[CandidatesSkillsDB | RequiredSkillsDB],
+                         fields: Tuple[str, ...], skill_fields: Tuple[str, ...], search_query: str, lim: int,
+                         page: int) -> Tuple[List[dict], bool]:
+    """
+    Full-text search of records, they are read as rows like in get_rows_db.
+    :param orm_table_class: table from database.
+    :param foreign_orm_table_class: related table from database.
+    :param fields: columns of records in the order of keys, 'skills' is the position of the skills.
+    :param skill_fields: columns of skills.
+    :param search_query: text of the query.
+    :param lim: quantity of objects to return.
+    :param page: offset in sql request.
+    :return: found records, the best ranked first, and whether some matches weren't ranked (SEARCH_RANK_LIMIT).
+    """
+    columns = tuple(name for name in fields if name != 'skills')
+    query = search_statement(orm_table_class, columns=('id', 'skills_snapshot') + columns)
+    async with read_session() as ses:
+        response = await ses.execute(query, {'search_query': search_query, 'lim': lim, 'offset': page * lim})
+        rows = response.all()
+        records, snapshots = rows_with_snapshots([row[:-1] for row in rows], fields, columns)
+        if records:
+            await attach_skills(ses, records, foreign_orm_table_class, skill_fields, snapshots)
+    truncated = bool(SEARCH_RANK_LIMIT and rows and rows[0][-1] > SEARCH_RANK_LIMIT)
+    return list(records.values()), truncated
+
+
+@lru_cache(maxsize=None)
+def skills_statement(orm_table_class: Type[CandidatesSkillsDB | RequiredSkillsDB], by_owner: bool):
+    """
+    Statement of get_skills_db: skills of one owner (foreign_key) or one skill (id), the value is passed as key.
+    :param orm_table_class: table with skills from database.
+    :param by_owner: filter by foreign_key, otherwise by id.
+    :return: Select
+    """
+    column_for_search = orm_table_class.foreign_key if by_owner else orm_table_class.id
+    return select(orm_table_class).where(column_for_search == bindparam('key'))
+
+
 async def get_skills_db(orm_table_class: Type[Base], skill_id_db: int | None = None,
                         foreign_key: int | None = None) -> List | GetCandidateSkills | GetRequiredSkills:
     """
@@ -47,12 +358,9 @@ async def get_skills_db(orm_table_class: Type[Base], skill_id_db: int | None = N
     :param foreign_key: ForeignKey from table.
     :return: List
     """
-    async with session() as ses:
-        if foreign_key:
-            query = select(orm_table_class).where(orm_table_class.foreign_key == foreign_key)
-        else:
-            query = select(orm_table_class).where(orm_table_class.id == skill_id_db)
-        response = await ses.execute(query)
+    query = skills_statement(orm_table_class, by_owner=bool(foreign_key))
+    async with read_session() as ses:
+        response = await ses.execute(query, {'key': foreign_key or skill_id_db})
     records_set = response.scalars().first() if skill_id_db else response.scalars().all()
 
     if not records_set and skill_id_db:
@@ -63,27 +371,154 @@ async def get_skills_db(orm_table_class: Type[Base], skill_id_db: int | None = N
     return records_set
 
 
-async def add_model_db(model: BaseModel, orm_table_class: Type[Base], foreign_orm_table_class: Type[Base]):
+def record_columns(orm_table_class: Type[Base]) -> List[str]:
+    """
+    Columns of the table which are filled from the request (id, time_create and generated columns are set
+    by database).
+    """
+    return [i.name for i in stored_columns(orm_table_class) if i.name not in ('id', 'foreign_key', 'time_create')]
+
+
+@lru_cache(maxsize=None)
+def create_statement(orm_table_class: Type[CandidatesDB | JobOpeningsDB],
+                     foreign_orm_table_class: Type[CandidatesSkillsDB | RequiredSkillsDB]):
+    """
+    One statement which adds records with skills and their matches.
+    Rows are passed as arrays of columns (record_<column>, skill_<column>, skill_row_number - number of the record
+    of the skill starting from 1), so the statement doesn't depend on the number of rows.
+    Ids of records and skills are taken from the sequences before the inserts, skills are joined with records
+    by the record number, so skills_snapshot of records is built from the same rows as the skills.
+    Data-modifying CTEs don't see rows of each other, so matches are computed from the rows returned by the inserts.
+    The result is one row for every skill (or record without skills): row_number, columns of the record
+    and columns of the skill with the prefix skill_.
+    :param orm_table_class: table from database.
+    :param foreign_orm_table_class: related table from database.
+    :return: Select
+    """
+    main_table, skills_table = orm_table_class.__table__, foreign_orm_table_class.__table__
+    columns, skill_columns = record_columns(orm_table_class), record_columns(foreign_orm_table_class)
+
+    record_rows = func.unnest(
+        *(bindparam(f'record_{i}', type_=ARRAY(main_table.c[i].type)) for i in columns)
+    ).table_valued(*columns, with_ordinality='row_number').render_derived()
+    records = select(
+        func.nextval(func.pg_get_serial_sequence(main_table.name, 'id')).label('id'), record_rows.c.row_number,
+        *(record_rows.c[i] for i in columns)
+    ).cte('records')
+    skill_rows = func.unnest(
+        bindparam('skill_row_number', type_=ARRAY(Integer)),
+        *(bindparam(f'skill_{i}', type_=ARRAY(skills_table.c[i].type)) for i in skill_columns)
+    ).table_valued('row_number', *skill_columns, with_ordinality='ordinality').render_derived()
+    # nextval is computed after the sorting, so ids of skills follow their order in the request
+    skills = select(
+        func.nextval(func.pg_get_serial_sequence(skills_table.name, 'id')).label('id'), skill_rows.c.row_number,
+        *(skill_rows.c[i] for i in skill_columns)
+    ).order_by(skill_rows.c.ordinality).cte('skills')
+    snapshots = (
+        select(skills.c.row_number, snapshot_aggregate(
+            {'id': skills.c.id, 'foreign_key': records.c.id, **{i: skills.c[i] for i in skill_columns}}, skills.c.id
+        ).label('skills_snapshot'))
+        .join(records, records.c.row_number == skills.c.row_number)
+        .group_by(skills.c.row_number, records.c.id)
+        .subquery('snapshots')
+    )
+    parent = (
+        insert(main_table).from_select(
+            ['id', *columns, 'skills_snapshot'],
+            select(records.c.id, *(records.c[i] for i in columns),
+                   func.coalesce(snapshots.c.skills_snapshot, EMPTY_SNAPSHOT))
+            .select_from(records).outerjoin(snapshots, snapshots.c.row_number == records.c.row_number)
+        )
+        .returning(*stored_columns(orm_table_class)).cte('parent')
+    )
+    new_skills = (
+        insert(skills_table).from_select(
+            ['id', 'foreign_key', *skill_columns],
+            select(skills.c.id, parent.c.id, *(skills.c[i] for i in skill_columns))
+            .join(records, records.c.row_number == skills.c.row_number)
+            .join(parent, parent.c.id == records.c.id)
+            .order_by(skills.c.id)
+        )
+        .returning(*skills_table.columns).cte('new_skills')
+    )
+    if orm_table_class is CandidatesDB:
+        matches = matches_query(candidate_skills=new_skills)
+    else:
+        matches = matches_query(required_skills=new_skills, job_openings=parent)
+    new_matches = insert(CandidateJobMatchesDB).from_select(
+        ['candidate_id', 'job_id', 'candidate_score', 'job_score'], matches
+    ).cte('new_matches')
+
+    return (
+        select(records.c.row_number, *parent.c, *(i.label(f'skill_{i.name}') for i in new_skills.c))
+        .join(records, records.c.id == parent.c.id)
+        .outerjoin(new_skills, new_skills.c.foreign_key == parent.c.id)
+        .order_by(records.c.row_number, new_skills.c.id)
+        .add_cte(new_matches)
+    )
+
+
+async def add_models_db(models: List[BaseModel], orm_table_class: Type[CandidatesDB | JobOpeningsDB],
+                        foreign_orm_table_class: Type[CandidatesSkillsDB | RequiredSkillsDB]) -> List[dict]:
+    """
+    Add records with skills to the database by one statement without transaction round-trips (create_statement).
+    :param models: validated models with data to record in database.
+    :param orm_table_class: table from database.
+    :param foreign_orm_table_class: related table from database.
+    :return: List[dict] - added records (all columns) with skills in the order of models.
+    """
+    columns, skill_columns = record_columns(orm_table_class), record_columns(foreign_orm_table_class)
+    models_data = [model.model_dump() for model in models]
+    skill_ids = await skills_dictionary.resolve(
+        skill['indexing_skill_name'] for model_data in models_data for skill in model_data['skills'] or []
+    )
+    skills = []
+    for row_number, model_data in enumerate(models_data, start=1):
+        for skill in model_data['skills'] or []:
+            skill['skill_id'] = skill_ids[skill['indexing_skill_name']]
+            skills.append((row_number, skill))
+    parameters = {f'record_{i}': [model_data[i] for model_data in models_data] for i in columns}
+    parameters['skill_row_number'] = [row_number for row_number, _ in skills]
+    parameters.update({f'skill_{i}': [skill[i] for _, skill in skills] for i in skill_columns})
+
+    async with autocommit_engine.connect() as connection:
+        response = await connection.execute(create_statement(orm_table_class, foreign_orm_table_class), parameters)
+    # there is no commit in autocommit mode
+    mark_write()
+
+    main_columns = [i.name for i in stored_columns(orm_table_class)]
+    foreign_columns = [i.name for i in foreign_orm_table_class.__table__.columns]
+    records = {}
+    for row in response.mappings():
+        record = records.get(row['row_number'])
+        if record is None:
+            record = records[row['row_number']] = {i: row[i] for i in main_columns} | {'skills': []}
+        if row['skill_foreign_key'] is not None:
+            record['skills'].append({i: row[f'skill_{i}'] for i in foreign_columns})
+
+    added = list(records.values())
+    if orm_table_class is JobOpeningsDB:
+        for record in added:
+            skill_index.set_skills_quantity(job_id=record['id'], quantity=record['skills_quantity'])
+    skill_index.add_skills(orm_table_class=foreign_orm_table_class, rows=[
+        tuple(skill[i.name] for i in posting_columns(foreign_orm_table_class))
+        for record in added for skill in record['skills']
+    ])
+    skill_suggestions.add((skill['indexing_skill_name'], skill['skill_name']) for _, skill in skills)
+    return added
+
+
+async def add_model_db(model: BaseModel, orm_table_class: Type[CandidatesDB | JobOpeningsDB],
+                       foreign_orm_table_class: Type[CandidatesSkillsDB | RequiredSkillsDB]) -> dict:
     """
     Add data to the database.
     :param model: model with data to record in database.
     :param orm_table_class: table from database.
     :param foreign_orm_table_class: related table from database.
+    :return: dict - added record with skills.
     """
-    model_data = model.model_dump()
-    print(model_data)
-    async with session() as ses:
-        skills = model_data['skills']
-        print(skills)
-        del model_data['skills']
-        data_bd = orm_table_class(**model_data)
-        ses.add(data_bd)
-        await ses.flush()
-        if skills:
-            for skill in skills:
-                skill['foreign_key'] = data_bd.id
-            await ses.execute(insert(foreign_orm_table_class).values(skills))
-        await ses.commit()
+    return (await add_models_db(models=[model], orm_table_class=orm_table_class,
+                                foreign_orm_table_class=foreign_orm_table_class))[0]
 
 
 async def add_skills_db(skills: List[BaseModel], orm_table_class: Type[Base], foreign_key: int):
@@ -93,116 +528,784 @@ async def add_skills_db(skills: List[BaseModel], orm_table_class: Type[Base], fo
     :param orm_table_class: table from database.
     :param foreign_key: ForeignKey from table.
     """
+    data = await skills_dictionary.skill_rows(i.model_dump() for i in skills)
+    for skill in data:
+        skill['foreign_key'] = foreign_key
     async with (session() as ses):
-        data = []
-        for i in skills:
-            skill = i.model_dump()
-            skill['foreign_key'] = foreign_key
-            data.append(skill)
         try:
-            await ses.execute(insert(orm_table_class).values(data))
-        except IntegrityError:
+            response = await ses.execute(
+                insert(orm_table_class).values(data).returning(*posting_columns(orm_table_class))
+            )
+        except IntegrityError as error:
+            if unique_violation(error):
+                duplicate_skill()
             non_existing_foreign_key()
-        finally:
-            if orm_table_class is RequiredSkillsDB:
-                await ses.execute(update(JobOpeningsDB).where(JobOpeningsDB.id == foreign_key)
-                                  .values(skills_quantity=JobOpeningsDB.skills_quantity + len(data)))
+        indexed_skills = response.all()
+        if orm_table_class is RequiredSkillsDB:
+            quantity = await ses.execute(update(JobOpeningsDB).where(JobOpeningsDB.id == foreign_key)
+                                         .values(skills_quantity=JobOpeningsDB.skills_quantity + len(data))
+                                         .returning(JobOpeningsDB.skills_quantity))
+            skills_quantity = quantity.scalar_one()
+        await refresh_record_matches(ses, orm_table_class=orm_table_class, record_ids=[foreign_key])
+        await refresh_skills_snapshot(ses, orm_table_class=orm_table_class, record_ids=[foreign_key])
         await ses.commit()
 
+    if orm_table_class is RequiredSkillsDB:
+        skill_index.set_skills_quantity(job_id=foreign_key, quantity=skills_quantity)
+    skill_index.add_skills(orm_table_class=orm_table_class, rows=indexed_skills)
+    skill_suggestions.add((skill.indexing_skill_name, skill.skill_name) for skill in skills)
 
-async def update_record_db(record_id_db: int, values: dict, orm_table_class: Type[Base]):
+
+async def bulk_add_models_db(models: List[BaseModel], orm_table_class: Type[CandidatesDB | JobOpeningsDB],
+                             foreign_orm_table_class: Type[CandidatesSkillsDB | RequiredSkillsDB]) -> List[int]:
+    """
+    Add a batch of records with skills to the database in one transaction.
+    Rows are loaded with COPY into temporary tables (ids are taken from the sequences there), then moved to the
+    tables with two INSERT ... SELECT statements, skills_snapshot of the records is built by one UPDATE.
+    :param models: validated models with data to record in database.
+    :param orm_table_class: table from database.
+    :param foreign_orm_table_class: related table from database.
+    :return: List[int] - ids of added records.
+    """
+    main_table, skills_table = orm_table_class.__table__, foreign_orm_table_class.__table__
+    columns = [i.name for i in stored_columns(orm_table_class) if i.name not in ('id', 'time_create')]
+    skill_columns = [i.name for i in skills_table.columns if i.name not in ('id', 'foreign_key')]
+
+    models_data = [model.model_dump() for model in models]
+    skill_ids = await skills_dictionary.resolve(
+        skill['indexing_skill_name'] for model_data in models_data for skill in model_data['skills'] or []
+    )
+    records, skills = [], []
+    for row_number, model_data in enumerate(models_data):
+        records.append((row_number, *(model_data[i] for i in columns)))
+        for skill in model_data['skills'] or []:
+            skill['skill_id'] = skill_ids[skill['indexing_skill_name']]
+            skills.append((row_number, *(skill[i] for i in skill_columns)))
+
+    staging = table(f"bulk_{main_table.name}", column('id'), column('row_number'), *map(column, columns))
+    skills_staging = table(
+        f"bulk_{skills_table.name}", column('id'), column('foreign_key'), *map(column, skill_columns)
+    )
+
+    async with session() as ses:
+        for staging_table, like_table, extra_columns in (
+                (staging, main_table, ", row_number integer"), (skills_staging, skills_table, "")):
+            await ses.execute(text(
+                f"CREATE TEMP TABLE {staging_table.name} (LIKE {like_table.name} INCLUDING DEFAULTS{extra_columns}) "
+                f"ON COMMIT DROP"
+            ))
+        connection = await (await ses.connection()).get_raw_connection()
+        await connection.driver_connection.copy_records_to_table(
+            staging.name, records=records, columns=['row_number', *columns]
+        )
+        if skills:
+            # foreign_key of staged skill holds row_number of its record until the ids are known
+            await connection.driver_connection.copy_records_to_table(
+                skills_staging.name, records=skills, columns=['foreign_key', *skill_columns]
+            )
+
+        response = await ses.execute(
+            insert(orm_table_class)
+            .from_select(['id', *columns], select(staging.c.id, *(staging.c[i] for i in columns)))
+            .returning(orm_table_class.id)
+        )
+        ids = response.scalars().all()
+        response = await ses.execute(
+            insert(foreign_orm_table_class)
+            .from_select(
+                ['id', 'foreign_key', *skill_columns],
+                select(skills_staging.c.id, staging.c.id, *(skills_staging.c[i] for i in skill_columns))
+                .join(staging, staging.c.row_number == skills_staging.c.foreign_key)
+            )
+            .returning(*posting_columns(foreign_orm_table_class))
+        )
+        indexed_skills = response.all()
+        await refresh_record_matches(ses, orm_table_class=orm_table_class, record_ids=ids)
+        await refresh_skills_snapshot(ses, orm_table_class=orm_table_class, record_ids=ids, lock=False)
+        if orm_table_class is JobOpeningsDB:
+            quantity = await ses.execute(select(JobOpeningsDB.id, JobOpeningsDB.skills_quantity)
+                                         .where(JobOpeningsDB.id.in_(ids)))
+            skills_quantity = quantity.all()
+        await ses.commit()
+
+    if orm_table_class is JobOpeningsDB:
+        for job_id, quantity in skills_quantity:
+            skill_index.set_skills_quantity(job_id=job_id, quantity=quantity)
+    skill_index.add_skills(orm_table_class=foreign_orm_table_class, rows=indexed_skills)
+    skill_suggestions.add((skill['indexing_skill_name'], skill['skill_name'])
+                          for model_data in models_data for skill in model_data['skills'] or [])
+    return ids
+
+
+async def update_record_db(record_id_db: int, values: dict, orm_table_class: Type[Base]) -> List[Tuple[int, str]]:
     """
     Update data of item from the database.
     :param values: new information to be recorded
     :param record_id_db: id of record from database
     :param orm_table_class: table from database
+    :return: List with pairs (foreign_key, indexing skill name) of updated skills for tables with skills,
+    empty list for other tables.
     """
+    renamed = orm_table_class in SKILLS_TABLES and 'indexing_skill_name' in values
+    if renamed:
+        values = (await skills_dictionary.skill_rows([values]))[0]
+    query = update(orm_table_class).where(orm_table_class.id == record_id_db).values(values)
+    if orm_table_class in SKILLS_TABLES:
+        query = query.returning(*posting_columns(orm_table_class))
     async with session() as ses:
-        await ses.execute(update(orm_table_class).where(orm_table_class.id == record_id_db).values(values))
+        old_skill_ids = []
+        if renamed:
+            response = await ses.execute(select(orm_table_class.skill_id).where(orm_table_class.id == record_id_db)
+                                         .with_for_update())
+            old_skill_ids = response.scalars().all()
+        try:
+            response = await ses.execute(query)
+        except IntegrityError as error:
+            if not unique_violation(error):
+                raise
+            duplicate_skill()
+        indexed_skills = response.all() if orm_table_class in SKILLS_TABLES else []
+        for skill in indexed_skills:
+            await refresh_record_matches(ses, orm_table_class=orm_table_class, record_ids=[skill.foreign_key])
+        await refresh_skills_snapshot(ses, orm_table_class=orm_table_class,
+                                      record_ids=[skill.foreign_key for skill in indexed_skills])
         await ses.commit()
 
+    skill_index.add_skills(orm_table_class=orm_table_class, rows=indexed_skills)
+    names = await skills_dictionary.get_names([skill.skill_id for skill in indexed_skills] + old_skill_ids)
+    if renamed and indexed_skills:
+        skill_suggestions.remove(names[i] for i in old_skill_ids if i in names)
+        skill_suggestions.add((names[skill.skill_id], values['skill_name']) for skill in indexed_skills
+                              if skill.skill_id in names)
+    return [(skill.foreign_key, names.get(skill.skill_id)) for skill in indexed_skills]
+
 
-async def delete_record_db(record_id_db: int, orm_table_class: Type[Base]):
+async def delete_record_db(record_id_db: int, orm_table_class: Type[Base]) -> int | None:
     """
     Delete data from the database.
     :param record_id_db: id of record from the database
     :param orm_table_class: table from database
+    :return: id of candidate or job opening which owned the deleted skill (None for other tables).
     """
-    async with session() as ses:
-        if orm_table_class is RequiredSkillsDB:
-            job_id = await ses.execute(select(RequiredSkillsDB.foreign_key).where(orm_table_class.id == record_id_db))
-            if job_id:
-                ses.execute(update(JobOpeningsDB).where(JobOpeningsDB.id == job_id)
-                            .values(skills_quantity=JobOpeningsDB.skills_quantity - 1))
+    if orm_table_class is RequiredSkillsDB:
+        return await delete_required_skill_db(record_id_db=record_id_db)
 
-        await ses.execute(delete(orm_table_class).where(orm_table_class.id == record_id_db))
+    async with session() as ses:
+        if orm_table_class in SKILLS_TABLES:
+            owner = await ses.execute(
+                delete(orm_table_class).where(orm_table_class.id == record_id_db)
+                .returning(orm_table_class.foreign_key, orm_table_class.skill_id)
+            )
+            owner = owner.one_or_none()
+            if owner:
+                await refresh_record_matches(ses, orm_table_class=orm_table_class, record_ids=[owner[0]])
+                await refresh_skills_snapshot(ses, orm_table_class=orm_table_class, record_ids=[owner[0]])
+            skill_ids = [owner.skill_id] if owner else []
+        else:
+            skill_ids = []
+            if hasattr(orm_table_class, 'skills'):
+                # skills are deleted by the cascade of the foreign key
+                skills_class = orm_table_class.skills.property.mapper.class_
+                response = await ses.execute(select(skills_class.skill_id)
+                                             .where(skills_class.foreign_key == record_id_db))
+                skill_ids = response.scalars().all()
+            await ses.execute(delete(orm_table_class).where(orm_table_class.id == record_id_db))
         await ses.commit()
 
+    await forget_skills(skill_ids)
+    if orm_table_class in SKILLS_TABLES:
+        skill_index.remove_skills(orm_table_class=orm_table_class, skill_ids=[record_id_db])
+        return owner[0] if owner else None
+    skill_index.remove_record(orm_table_class=orm_table_class, record_id=record_id_db)
+
+
+async def forget_skills(skill_ids: List[int]):
+    """
+    Uncount deleted skills in the skill suggestions.
+    :param skill_ids: ids from the table skills, one per deleted skill.
+    """
+    if skill_ids:
+        names = await skills_dictionary.get_names(skill_ids)
+        skill_suggestions.remove(names[i] for i in skill_ids if i in names)
 
-async def delete_required_skill_db(record_id_db: int):
+
+async def delete_required_skill_db(record_id_db: int) -> int | None:
     """
     Delete skill from the table required_skills.
     :param record_id_db: id of record from the table required_skills
+    :return: id of job opening which owned the deleted skill.
     """
     async with session() as ses:
-        job_id = await ses.execute(select(RequiredSkillsDB.foreign_key).where(RequiredSkillsDB.id == record_id_db))
+        job_id = await ses.execute(select(RequiredSkillsDB.foreign_key, RequiredSkillsDB.skill_id)
+                                   .where(RequiredSkillsDB.id == record_id_db))
         job_id = job_id.one_or_none()
         if job_id:
-            await ses.execute(update(JobOpeningsDB).where(JobOpeningsDB.id == job_id[0])
-                              .values(skills_quantity=JobOpeningsDB.skills_quantity - 1))
+            quantity = await ses.execute(update(JobOpeningsDB).where(JobOpeningsDB.id == job_id[0])
+                                         .values(skills_quantity=JobOpeningsDB.skills_quantity - 1)
+                                         .returning(JobOpeningsDB.skills_quantity))
             await ses.execute(delete(RequiredSkillsDB).where(RequiredSkillsDB.id == record_id_db))
+            await refresh_record_matches(ses, orm_table_class=RequiredSkillsDB, record_ids=[job_id[0]])
+            await refresh_skills_snapshot(ses, orm_table_class=RequiredSkillsDB, record_ids=[job_id[0]])
+            skills_quantity = quantity.scalar_one()
+        await ses.commit()
+
+    if job_id:
+        await forget_skills([job_id.skill_id])
+        skill_index.set_skills_quantity(job_id=job_id[0], quantity=skills_quantity)
+        skill_index.remove_skills(orm_table_class=RequiredSkillsDB, skill_ids=[record_id_db])
+        return job_id[0]
+
+
+def skill_score(orm_table_class: Type[CandidatesSkillsDB | RequiredSkillsDB], level, years_of_experience,
+                last_used_year=None):
+    """
+    SQL expression of score of the skill, the same as AddCandidateSkills/AddRequiredSkills count it.
+    """
+    score = count_score(level=level, year=years_of_experience)
+    if orm_table_class is CandidatesSkillsDB:
+        score = score - func.least((THIS_YEAR - last_used_year) * (THIS_YEAR - last_used_year) * 30, score // 3)
+    return score
+
+
+@lru_cache(maxsize=None)
+def change_skills_statement(orm_table_class: Type[CandidatesSkillsDB | RequiredSkillsDB]):
+    """
+    UPDATE ... FROM of skills of one owner (the parameter owner). Changes are passed as arrays of columns
+    (change_id, change_<column>), null keeps the current value, score is recomputed from the resulting values.
+    :param orm_table_class: table with skills from database.
+    :return: Update
+    """
+    table_ = orm_table_class.__table__
+    columns = [i for i in record_columns(orm_table_class) if i != 'score']
+    changes = func.unnest(
+        bindparam('change_id', type_=ARRAY(Integer)),
+        *(bindparam(f'change_{i}', type_=ARRAY(table_.c[i].type)) for i in columns)
+    ).table_valued('id', *columns).render_derived()
+    values = {i: func.coalesce(changes.c[i], table_.c[i]) for i in columns}
+    score = skill_score(orm_table_class, level=values['level'], years_of_experience=values['years_of_experience'],
+                        last_used_year=values.get('last_used_year'))
+    return (
+        update(table_).where(table_.c.id == changes.c.id, table_.c.foreign_key == bindparam('owner'))
+        .values(**values, score=score).returning(*table_.columns)
+    )
+
+
+@lru_cache(maxsize=None)
+def delete_skills_statement(orm_table_class: Type[CandidatesSkillsDB | RequiredSkillsDB]):
+    """
+    DELETE of skills (the parameter ids) of one owner (the parameter owner).
+    :param orm_table_class: table with skills from database.
+    :return: Delete
+    """
+    return (
+        delete(orm_table_class)
+        .where(orm_table_class.foreign_key == bindparam('owner'),
+               orm_table_class.id == any_(bindparam('ids', type_=ARRAY(Integer))))
+        .returning(orm_table_class.id, orm_table_class.skill_id)
+    )
+
+
+async def change_skills_db(orm_table_class: Type[CandidatesSkillsDB | RequiredSkillsDB], foreign_key: int,
+                           changes: List[dict], deleted: List[int]) -> Tuple[List[dict], List[int], List[str]]:
+    """
+    Update and delete skills of one candidate or job opening by one UPDATE and one DELETE in one transaction,
+    skills_quantity of job opening is changed once. If some skill doesn't belong to the owner nothing is changed.
+    :param orm_table_class: table with skills from database.
+    :param foreign_key: id of candidate or job opening.
+    :param changes: new values of skills with their id (dumped PATCH schemas without None).
+    :param deleted: ids of skills to delete.
+    :return: updated skills, ids of deleted skills, indexing names of updated and deleted skills.
+    """
+    columns = [i for i in record_columns(orm_table_class) if i != 'score']
+    skill_ids = await skills_dictionary.resolve(
+        change['indexing_skill_name'] for change in changes if change.get('indexing_skill_name')
+    )
+    for change in changes:
+        change['skill_id'] = skill_ids.get(change.get('indexing_skill_name'))
+    parameters = {'owner': foreign_key, 'change_id': [change['id'] for change in changes]}
+    parameters.update({f'change_{i}': [change.get(i) for change in changes] for i in columns})
+
+    renamed = [change['id'] for change in changes if change.get('indexing_skill_name')]
+
+    async with session() as ses:
+        removed, updated, old_skill_ids = [], [], []
+        if renamed:
+            response = await ses.execute(
+                select(orm_table_class.skill_id)
+                .where(orm_table_class.foreign_key == foreign_key, orm_table_class.id.in_(renamed))
+                .with_for_update()
+            )
+            old_skill_ids = response.scalars().all()
+        if deleted:
+            response = await ses.execute(delete_skills_statement(orm_table_class),
+                                         {'owner': foreign_key, 'ids': deleted})
+            removed = response.all()
+        if changes:
+            try:
+                response = await ses.execute(change_skills_statement(orm_table_class), parameters)
+            except IntegrityError as error:
+                if not unique_violation(error):
+                    raise
+                duplicate_skill()
+            updated = response.mappings().all()
+        if len(removed) != len(deleted) or len(updated) != len(changes):
+            non_existent_object(message="There are no skills with these ids for this record")
+        if orm_table_class is RequiredSkillsDB and removed:
+            quantity = await ses.execute(update(JobOpeningsDB).where(JobOpeningsDB.id == foreign_key)
+                                         .values(skills_quantity=JobOpeningsDB.skills_quantity - len(removed))
+                                         .returning(JobOpeningsDB.skills_quantity))
+            skills_quantity = quantity.scalar_one()
+        await refresh_record_matches(ses, orm_table_class=orm_table_class, record_ids=[foreign_key])
+        await refresh_skills_snapshot(ses, orm_table_class=orm_table_class, record_ids=[foreign_key])
         await ses.commit()
 
+    if orm_table_class is RequiredSkillsDB and removed:
+        skill_index.set_skills_quantity(job_id=foreign_key, quantity=skills_quantity)
+    skill_index.remove_skills(orm_table_class=orm_table_class, skill_ids=[skill.id for skill in removed])
+    skill_index.add_skills(orm_table_class=orm_table_class, rows=[
+        tuple(skill[i.name] for i in posting_columns(orm_table_class)) for skill in updated
+    ])
+    names = await skills_dictionary.get_names(
+        [skill.skill_id for skill in removed] + [skill['skill_id'] for skill in updated] + old_skill_ids
+    )
+    skill_suggestions.remove(names[i] for i in [skill.skill_id for skill in removed] + old_skill_ids if i in names)
+    skill_suggestions.add((names[skill['skill_id']], skill['skill_name']) for skill in updated
+                          if skill['id'] in renamed and skill['skill_id'] in names)
+    return [dict(skill) for skill in updated], [skill.id for skill in removed], list(names.values())
+
+
+async def get_skill_names_db(orm_table_class: Type[CandidatesSkillsDB | RequiredSkillsDB], foreign_key: int
+                             ) -> List[str]:
+    """
+    Retrieves indexing names of skills of candidate or job opening.
+    :param orm_table_class: table with skills from database.
+    :param foreign_key: ForeignKey from table.
+    :return: List[str]
+    """
+    async with session() as ses:
+        response = await ses.execute(
+            select(SkillsDB.name).join(orm_table_class, orm_table_class.skill_id == SkillsDB.id)
+            .where(orm_table_class.foreign_key == foreign_key).distinct()
+        )
+    return response.scalars().all()
+
+
+async def get_records_by_ids(orm_table_class: Type[CandidatesDB | JobOpeningsDB], ids: List[int]) -> List:
+    """
+    Retrieves records with skills from the database keeping the order of the transmitted ids.
+    :param orm_table_class: table from database.
+    :param ids: ids of records from database.
+    :return: List
+    """
+    if not ids:
+        return []
+    async with read_session() as ses:
+        records = {record.id: record for record in await select_records_by_ids(ses, orm_table_class, ids)}
+    missing = [record_id for record_id in ids if record_id not in records]
+    if missing:
+        # the in-memory index is ahead of a lagging replica: new records are read from the primary
+        async with session() as ses:
+            records.update((record.id, record) for record in await select_records_by_ids(ses, orm_table_class, missing))
+    return [records[record_id] for record_id in ids if record_id in records]
+
+
+async def select_records_by_ids(ses, orm_table_class: Type[CandidatesDB | JobOpeningsDB], ids: List[int]) -> List:
+    """
+    Records with skills in any order.
+    :param ses: opened session.
+    :param orm_table_class: table from database.
+    :param ids: ids of records from database.
+    :return: List
+    """
+    response = await ses.execute(
+        select(orm_table_class).where(orm_table_class.id.in_(ids)).options(undefer(orm_table_class.skills_snapshot))
+    )
+    records = response.scalars().all()
+    await attach_orm_skills(ses, records=records, orm_table_class=orm_table_class)
+    return records
+
+
+def order_by_score(query, total_score, found_id, sorting, cursor: bool, aggregated: bool = False):
+    """
+    Add sorting by (total score, id) and pagination to the selection query.
+    Values are bound parameters (see page_parameters): lim, offset and for cursor after_score, after_id.
+    :param query: selection query.
+    :param total_score: column or aggregate with total score.
+    :param found_id: column with id of the found record.
+    :param sorting: sorting parameter.
+    :param cursor: page after the record (after_score, after_id).
+    :param aggregated: total_score is an aggregate, so the cursor condition goes to HAVING.
+    :return: Select
+    """
+    if sorting == 'lower':
+        query = query.order_by(asc(total_score), asc(found_id))
+    else:
+        query = query.order_by(desc(total_score), desc(found_id))
+    query = query.limit(bindparam('lim')).offset(bindparam('offset'))
+
+    if not cursor:
+        return query
+    after = tuple_(bindparam('after_score'), bindparam('after_id'))
+    if sorting == 'lower':
+        condition = tuple_(total_score, found_id) > after
+    else:
+        condition = tuple_(total_score, found_id) < after
+    return query.having(condition) if aggregated else query.where(condition)
+
+
+def page_parameters(lim: int, page: int, after: Tuple[int, int] | None) -> dict:
+    """
+    Values of bound parameters added by order_by_score.
+    :param lim: maximum number of records to be given.
+    :param page: group of records (sql offset - lim * page), ignored if after is passed.
+    :param after: cursor (total_score, id) of the last record of the previous page, empty tuple - first page.
+    :return: dict
+    """
+    parameters = {'lim': lim, 'offset': page * lim if after is None else 0}
+    if after:
+        parameters['after_score'], parameters['after_id'] = after
+    return parameters
+
 
 async def find_suitable_records(
-        record_id: int, orm_table_for_search: Type[CandidatesDB | JobOpeningsDB], sorting, lim: int, page: int) -> List:
+        record_id: int, orm_table_for_search: Type[CandidatesDB | JobOpeningsDB], sorting, lim: int, page: int,
+        after: Tuple[int, int] | None = None) -> List:
     """
     Selection of relevant candidates or job openings.
+    Uses the in-memory skill index (MATCHING_ENGINE=index), the dense skill matrices (MATCHING_ENGINE=numpy),
+    the table candidate_job_matches (MATCHING_ENGINE=table) or the sql aggregation.
     :param record_id: id of record for which the selection will be made.
     :param orm_table_for_search: the table with the record to be searched for.
     :param sorting: sorting parameter.
     :param lim: maximum number of records to be given.
     :param page: group of records (sql offset - lim * page)
-    :return: List
+    :param after: cursor (total_score, id) of the last record of the previous page, if it is passed page is ignored,
+    empty tuple - first page. In cursor mode an empty page is returned instead of 404.
+    :return: List of pairs (record, total_score)
     """
-    find_candidate_request = (
-        select(CandidatesDB, func.sum(CandidatesSkillsDB.score).label('total_score'))
-        .join(CandidatesSkillsDB)
-        .join(RequiredSkillsDB, RequiredSkillsDB.indexing_skill_name == CandidatesSkillsDB.indexing_skill_name)
-        .where(
-            RequiredSkillsDB.foreign_key == record_id,
-            CandidatesSkillsDB.level >= RequiredSkillsDB.level,
-            CandidatesSkillsDB.years_of_experience >= RequiredSkillsDB.years_of_experience
-        )
-        .group_by(CandidatesDB.id)
-        .having(
-            func.count(CandidatesSkillsDB.skill_name) == select(JobOpeningsDB.skills_quantity)
-            .where(JobOpeningsDB.id == record_id)
-        )
-        .order_by(asc('total_score') if sorting == 'lower' else desc('total_score'))
-    ).options(selectinload(CandidatesDB.skills)).limit(lim).offset(page * lim)
-
-    find_job_openings_request = (
-        select(JobOpeningsDB, func.sum(RequiredSkillsDB.score).label('total_score'))
-        .join(RequiredSkillsDB)
-        .join(CandidatesSkillsDB, RequiredSkillsDB.indexing_skill_name == CandidatesSkillsDB.indexing_skill_name)
-        .where(
-            CandidatesSkillsDB.foreign_key == record_id,
-            RequiredSkillsDB.level <= CandidatesSkillsDB.level,
-            RequiredSkillsDB.years_of_experience <= CandidatesSkillsDB.years_of_experience
-        )
-        .group_by(JobOpeningsDB.id)
-        .having(
-            func.count(CandidatesSkillsDB.skill_name) == select(JobOpeningsDB.skills_quantity)
-            .where(JobOpeningsDB.id == record_id)
-        ).order_by(asc('total_score') if sorting == 'lower' else desc('total_score'))
-    ).options(selectinload(JobOpeningsDB.skills)).limit(lim).offset(page * lim)
-
-    async with session() as ses:
-        response = await ses.execute(
-            find_candidate_request if orm_table_for_search is CandidatesDB else find_job_openings_request
+    if MATCHING_ENGINE in IN_MEMORY_ENGINES and skill_index.ready:
+        ranking = dict(skill_index.select(
+            record_id=record_id, orm_table_for_search=orm_table_for_search, sorting=sorting, lim=lim, page=page,
+            after=after
+        ))
+        records = await get_records_by_ids(orm_table_class=orm_table_for_search, ids=list(ranking))
+        records_set = [(record, ranking[record.id]) for record in records]
+    elif MATCHING_ENGINE == 'table':
+        records_set = await find_suitable_records_table(
+            record_id=record_id, orm_table_for_search=orm_table_for_search, sorting=sorting, lim=lim, page=page,
+            after=after
+        )
+    else:
+        records_set = await find_suitable_records_sql(
+            record_id=record_id, orm_table_for_search=orm_table_for_search, sorting=sorting, lim=lim, page=page,
+            after=after
         )
-    records_set = response.scalars().all()
-    if not records_set:
+    if not records_set and after is None:
         non_existent_object(message="at this moment there are no relevant objects according to these conditions")
     return records_set
+
+
+@lru_cache(maxsize=None)
+def suitable_records_table_statement(orm_table_for_search: Type[CandidatesDB | JobOpeningsDB], sorting,
+                                     cursor: bool):
+    """
+    Statement of find_suitable_records_table, record_id and page values are bound parameters.
+    :param orm_table_for_search: the table with the record to be searched for.
+    :param sorting: sorting parameter.
+    :param cursor: page after the record (after_score, after_id).
+    :return: Select
+    """
+    if orm_table_for_search is CandidatesDB:
+        found_id, total_score = CandidateJobMatchesDB.candidate_id, CandidateJobMatchesDB.candidate_score
+        where = CandidateJobMatchesDB.job_id == bindparam('record_id')
+    else:
+        found_id, total_score = CandidateJobMatchesDB.job_id, CandidateJobMatchesDB.job_score
+        where = CandidateJobMatchesDB.candidate_id == bindparam('record_id')
+
+    query = (
+        select(orm_table_for_search, total_score)
+        .join(CandidateJobMatchesDB, found_id == orm_table_for_search.id)
+        .where(where)
+    ).options(undefer(orm_table_for_search.skills_snapshot))
+    return order_by_score(query, total_score, found_id, sorting=sorting, cursor=cursor)
+
+
+async def find_suitable_records_table(
+        record_id: int, orm_table_for_search: Type[CandidatesDB | JobOpeningsDB], sorting, lim: int, page: int,
+        after: Tuple[int, int] | None = None) -> List:
+    """
+    Selection of relevant candidates or job openings from the table candidate_job_matches.
+    :param record_id: id of record for which the selection will be made.
+    :param orm_table_for_search: the table with the record to be searched for.
+    :param sorting: sorting parameter.
+    :param lim: maximum number of records to be given.
+    :param page: group of records (sql offset - lim * page)
+    :param after: cursor (total_score, id) of the last record of the previous page.
+    :return: List of pairs (record, total_score)
+    """
+    query = suitable_records_table_statement(orm_table_for_search, sorting, cursor=bool(after))
+    async with read_session() as ses:
+        response = await ses.execute(query, {'record_id': record_id, **page_parameters(lim, page, after)})
+        rows = response.all()
+        await attach_orm_skills(ses, records=[row[0] for row in rows], orm_table_class=orm_table_for_search)
+    return rows
+
+
+@lru_cache(maxsize=None)
+def suitable_records_sql_statement(orm_table_for_search: Type[CandidatesDB | JobOpeningsDB], sorting,
+                                   cursor: bool):
+    """
+    Statement of find_suitable_records_sql, record_id and page values are bound parameters.
+    :param orm_table_for_search: the table with the record to be searched for.
+    :param sorting: sorting parameter.
+    :param cursor: page after the record (after_score, after_id).
+    :return: Select
+    """
+    if orm_table_for_search is CandidatesDB:
+        total_score = func.sum(CandidatesSkillsDB.score)
+        query = (
+            select(CandidatesDB, total_score.label('total_score'))
+            .join(CandidatesSkillsDB)
+            .join(RequiredSkillsDB, RequiredSkillsDB.skill_id == CandidatesSkillsDB.skill_id)
+            .where(
+                RequiredSkillsDB.foreign_key == bindparam('record_id'),
+                CandidatesSkillsDB.level >= RequiredSkillsDB.level,
+                CandidatesSkillsDB.years_of_experience >= RequiredSkillsDB.years_of_experience
+            )
+            .group_by(CandidatesDB.id)
+            .having(
+                func.count(CandidatesSkillsDB.skill_name) == select(JobOpeningsDB.skills_quantity)
+                .where(JobOpeningsDB.id == bindparam('record_id')).scalar_subquery()
+            )
+        ).options(undefer(CandidatesDB.skills_snapshot))
+    else:
+        total_score = func.sum(RequiredSkillsDB.score)
+        query = (
+            select(JobOpeningsDB, total_score.label('total_score'))
+            .join(RequiredSkillsDB)
+            .join(CandidatesSkillsDB, RequiredSkillsDB.skill_id == CandidatesSkillsDB.skill_id)
+            .where(
+                CandidatesSkillsDB.foreign_key == bindparam('record_id'),
+                RequiredSkillsDB.level <= CandidatesSkillsDB.level,
+                RequiredSkillsDB.years_of_experience <= CandidatesSkillsDB.years_of_experience
+            )
+            .group_by(JobOpeningsDB.id)
+            .having(func.count(CandidatesSkillsDB.skill_name) == JobOpeningsDB.skills_quantity)
+        ).options(undefer(JobOpeningsDB.skills_snapshot))
+    return order_by_score(query, total_score, orm_table_for_search.id, sorting=sorting, cursor=cursor,
+                          aggregated=True)
+
+
+async def find_suitable_records_sql(
+        record_id: int, orm_table_for_search: Type[CandidatesDB | JobOpeningsDB], sorting, lim: int, page: int,
+        after: Tuple[int, int] | None = None) -> List:
+    """
+    Selection of relevant candidates or job openings with sql aggregation.
+    :param record_id: id of record for which the selection will be made.
+    :param orm_table_for_search: the table with the record to be searched for.
+    :param sorting: sorting parameter.
+    :param lim: maximum number of records to be given.
+    :param page: group of records (sql offset - lim * page)
+    :param after: cursor (total_score, id) of the last record of the previous page.
+    :return: List of pairs (record, total_score)
+    """
+    query = suitable_records_sql_statement(orm_table_for_search, sorting, cursor=bool(after))
+    async with read_session() as ses:
+        response = await ses.execute(query, {'record_id': record_id, **page_parameters(lim, page, after)})
+        rows = response.all()
+        await attach_orm_skills(ses, records=[row[0] for row in rows], orm_table_class=orm_table_for_search)
+    return rows
+
+
+def missing_skills(requirements: List[RequiredSkillsDB], skills: List[CandidatesSkillsDB]) -> List[str]:
+    """
+    Names of requirements which aren't covered by skills (by skill id, level and years of experience).
+    :param requirements: required skills of job opening.
+    :param skills: skills of candidate.
+    :return: List[str]
+    """
+    return [
+        requirement.skill_name for requirement in requirements
+        if not any(
+            skill.skill_id == requirement.skill_id and skill.level >= requirement.level and
+            skill.years_of_experience >= requirement.years_of_experience for skill in skills
+        )
+    ]
+
+
+async def find_partially_suitable_records(
+        record_id: int, orm_table_for_search: Type[CandidatesDB | JobOpeningsDB], sorting, lim: int, page: int
+) -> List:
+    """
+    Selection of candidates or job openings which meet at least one requirement.
+    Records are ordered by coverage (share of matched requirements, from the highest), then by total score and id,
+    only lim * (page + 1) best records are kept, so the depth of pages is limited by PARTIAL_SELECTION_TOP_K.
+    :param record_id: id of record for which the selection will be made.
+    :param orm_table_for_search: the table with the record to be searched for.
+    :param sorting: sorting parameter.
+    :param lim: maximum number of records to be given.
+    :param page: group of records.
+    :return: List of tuples (record, coverage, total_score, names of missing skills)
+    """
+    if lim * (page + 1) > PARTIAL_SELECTION_TOP_K:
+        raise_exception(info=f"limit * (page + 1) must not exceed {PARTIAL_SELECTION_TOP_K} in partial mode")
+
+    if MATCHING_ENGINE in IN_MEMORY_ENGINES and skill_index.ready:
+        ranking = skill_index.select_partial(
+            record_id=record_id, orm_table_for_search=orm_table_for_search, sorting=sorting, lim=lim, page=page
+        )
+    else:
+        ranking = await rank_partially_suitable_records_sql(
+            record_id=record_id, orm_table_for_search=orm_table_for_search, sorting=sorting, lim=lim, page=page
+        )
+    records = await get_records_by_ids(orm_table_class=orm_table_for_search, ids=[row[0] for row in ranking])
+    if not records:
+        non_existent_object(message="at this moment there are no relevant objects according to these conditions")
+
+    ranking = {found_id: (coverage, score) for found_id, coverage, score in ranking}
+    if orm_table_for_search is CandidatesDB:
+        requirements = await get_skills_db(orm_table_class=RequiredSkillsDB, foreign_key=record_id)
+        return [(record, *ranking[record.id], missing_skills(requirements, record.skills)) for record in records]
+    skills = await get_skills_db(orm_table_class=CandidatesSkillsDB, foreign_key=record_id)
+    return [(record, *ranking[record.id], missing_skills(record.skills, skills)) for record in records]
+
+
+@lru_cache(maxsize=None)
+def partially_suitable_records_statement(orm_table_for_search: Type[CandidatesDB | JobOpeningsDB], sorting):
+    """
+    Statement of rank_partially_suitable_records_sql, record_id, lim and offset are bound parameters.
+    :param orm_table_for_search: the table with the record to be searched for.
+    :param sorting: sorting parameter.
+    :return: Select
+    """
+    if orm_table_for_search is CandidatesDB:
+        found_id, total_score = CandidatesSkillsDB.foreign_key, func.sum(CandidatesSkillsDB.score)
+        quantity = select(JobOpeningsDB.skills_quantity).where(JobOpeningsDB.id == bindparam('record_id'))
+        coverage = func.count(CandidatesSkillsDB.id) * 1.0 / quantity.scalar_subquery()
+        query = (
+            select(found_id, coverage.label('coverage'), total_score.label('total_score'))
+            .join(RequiredSkillsDB, RequiredSkillsDB.skill_id == CandidatesSkillsDB.skill_id)
+            .where(
+                RequiredSkillsDB.foreign_key == bindparam('record_id'),
+                CandidatesSkillsDB.level >= RequiredSkillsDB.level,
+                CandidatesSkillsDB.years_of_experience >= RequiredSkillsDB.years_of_experience
+            )
+            .group_by(found_id)
+        )
+    else:
+        found_id, total_score = RequiredSkillsDB.foreign_key, func.sum(RequiredSkillsDB.score)
+        coverage = func.count(RequiredSkillsDB.id) * 1.0 / JobOpeningsDB.skills_quantity
+        query = (
+            select(found_id, coverage.label('coverage'), total_score.label('total_score'))
+            .join(JobOpeningsDB, JobOpeningsDB.id == RequiredSkillsDB.foreign_key)
+            .join(CandidatesSkillsDB, RequiredSkillsDB.skill_id == CandidatesSkillsDB.skill_id)
+            .where(
+                CandidatesSkillsDB.foreign_key == bindparam('record_id'),
+                RequiredSkillsDB.level <= CandidatesSkillsDB.level,
+                RequiredSkillsDB.years_of_experience <= CandidatesSkillsDB.years_of_experience
+            )
+            .group_by(found_id, JobOpeningsDB.skills_quantity)
+        )
+    if sorting == 'lower':
+        query = query.order_by(desc(coverage), asc(total_score), asc(found_id))
+    else:
+        query = query.order_by(desc(coverage), desc(total_score), desc(found_id))
+    return query.limit(bindparam('lim')).offset(bindparam('offset'))
+
+
+async def rank_partially_suitable_records_sql(
+        record_id: int, orm_table_for_search: Type[CandidatesDB | JobOpeningsDB], sorting, lim: int, page: int
+) -> List[Tuple[int, float, int]]:
+    """
+    Partial matches with sql aggregation, the sorting with limit lets the database keep only the best rows.
+    :param record_id: id of record for which the selection will be made.
+    :param orm_table_for_search: the table with the record to be searched for.
+    :param sorting: sorting parameter.
+    :param lim: maximum number of records to be given.
+    :param page: group of records (sql offset - lim * page)
+    :return: List[Tuple[int, float, int]] - (found id, coverage, total_score)
+    """
+    query = partially_suitable_records_statement(orm_table_for_search, sorting)
+    async with read_session() as ses:
+        response = await ses.execute(query, {'record_id': record_id, **page_parameters(lim, page, None)})
+    return [(found, float(share), score) for found, share, score in response.all()]
+
+
+async def find_suitable_records_batch(record_ids: List[int], orm_table_for_search: Type[CandidatesDB | JobOpeningsDB],
+                                      sorting, top: int) -> Dict[int, List]:
+    """
+    Selection of the top relevant candidates or job openings for many records at once.
+    Matches are ranked in one pass (the skill index or one query with row_number() over every record),
+    skills of the union of found records are loaded once.
+    :param record_ids: ids of records for which the selection will be made.
+    :param orm_table_for_search: the table with the record to be searched for.
+    :param sorting: sorting parameter.
+    :param top: maximum number of records to be given for every record.
+    :return: Dict[int, List] - {record id: list of pairs (found record, total_score)}
+    """
+    if MATCHING_ENGINE in IN_MEMORY_ENGINES and skill_index.ready:
+        rankings = {
+            record_id: skill_index.select(
+                record_id=record_id, orm_table_for_search=orm_table_for_search, sorting=sorting, lim=top, page=0
+            )
+            for record_id in record_ids
+        }
+    else:
+        rankings = await rank_suitable_records_db(
+            record_ids=record_ids, orm_table_for_search=orm_table_for_search, sorting=sorting, top=top
+        )
+
+    found_ids = list({found_id for ranking in rankings.values() for found_id, _ in ranking})
+    records = {record.id: record for record in await get_records_by_ids(orm_table_for_search, found_ids)}
+    return {
+        record_id: [
+            (records[found_id], score) for found_id, score in rankings.get(record_id, []) if found_id in records
+        ]
+        for record_id in record_ids
+    }
+
+
+async def rank_suitable_records_db(record_ids: List[int], orm_table_for_search: Type[CandidatesDB | JobOpeningsDB],
+                                   sorting, top: int) -> Dict[int, List[Tuple[int, int]]]:
+    """
+    Top matches for many records with one query over the table candidate_job_matches (MATCHING_ENGINE=table)
+    or the sql aggregation.
+    :param record_ids: ids of records for which the selection will be made.
+    :param orm_table_for_search: the table with the record to be searched for.
+    :param sorting: sorting parameter.
+    :param top: maximum number of records to be given for every record.
+    :return: Dict[int, List[Tuple[int, int]]] - {record id: list of pairs (found id, total_score)}
+    """
+    if MATCHING_ENGINE == 'table':
+        matches = select(CandidateJobMatchesDB.candidate_id, CandidateJobMatchesDB.job_id,
+                         CandidateJobMatchesDB.candidate_score, CandidateJobMatchesDB.job_score)
+        if orm_table_for_search is CandidatesDB:
+            matches = matches.where(CandidateJobMatchesDB.job_id.in_(record_ids))
+        else:
+            matches = matches.where(CandidateJobMatchesDB.candidate_id.in_(record_ids))
+        matches = matches.subquery()
+    elif orm_table_for_search is CandidatesDB:
+        matches = matches_query(job_ids=record_ids).subquery()
+    else:
+        matches = matches_query(candidate_ids=record_ids).subquery()
+
+    if orm_table_for_search is CandidatesDB:
+        owner_id, found_id, total_score = matches.c.job_id, matches.c.candidate_id, matches.c.candidate_score
+    else:
+        owner_id, found_id, total_score = matches.c.candidate_id, matches.c.job_id, matches.c.job_score
+    order = (asc(total_score), asc(found_id)) if sorting == 'lower' else (desc(total_score), desc(found_id))
+    ranked = select(
+        owner_id.label('owner_id'), found_id.label('found_id'), total_score.label('total_score'),
+        func.row_number().over(partition_by=owner_id, order_by=order).label('position')
+    ).subquery()
+
+    async with read_session() as ses:
+        response = await ses.execute(
+            select(ranked.c.owner_id, ranked.c.found_id, ranked.c.total_score)
+            .where(ranked.c.position <= top)
+            .order_by(ranked.c.owner_id, ranked.c.position)
+        )
+    rankings = {}
+    for record_id, found, score in response.all():
+        rankings.setdefault(record_id, []).append((found, score))
+    return rankings
@@ -0,0 +1,314 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple, Type
+from uuid import uuid4
+
+from fastapi import HTTPException
+
+from core.cache.redis_conf import redis
+from core.config import SELECTION_JOB_WORKERS, SELECTION_JOB_QUEUE_SIZE, SELECTION_JOB_TTL, SELECTION_JOB_TIMEOUT, \
+    SELECTION_JOB_LEASE
+from core.custom_exceptions import raise_exception
+from core.db.database import CandidatesDB, JobOpeningsDB
+from core.db.request_db import find_suitable_records
+from core.schemas import GetCandidates, GetJobOpenings
+from core.serialization import type_adapter
+
+
+logger = logging.getLogger(__name__)
+
+TABLES = {CandidatesDB.__tablename__: CandidatesDB, JobOpeningsDB.__tablename__: JobOpeningsDB}
+SCHEMAS = {CandidatesDB: GetCandidates, JobOpeningsDB: GetJobOpenings}
+KEY_PREFIX = "selection-jobs"
+# statuses of jobs which wait in the queue of their process or are executed by it
+PENDING_STATUSES = ("queued", "running")
+ORPHANED_ERROR = "the process which executed the job has stopped, submit the selection again"
+
+_release_script = redis.register_script("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+""")
+
+
+class RedisJobStore:
+    """
+    Jobs and their results in Redis, so the job is visible to every worker of the application:
+    '{prefix}:{job_id}' - the job (JSON), '{prefix}:{job_id}:result' - list of found records (JSON of each one),
+    '{prefix}:pending:{key}' - id of the pending job with these parameters,
+    '{prefix}:owner:{owner}' - lease of the process which queued jobs (they are lost when it expires).
+    """
+
+    def __init__(self, client, prefix: str = KEY_PREFIX):
+        self.redis = client
+        self.prefix = prefix
+
+    async def claim(self, key: str, job_id: str, ttl: int) -> str:
+        """
+        Register the job as pending for the parameters.
+        :return: id of the pending job with the same parameters, job_id if there is no such job.
+        """
+        while True:
+            if await self.redis.set(f"{self.prefix}:pending:{key}", job_id, nx=True, ex=ttl):
+                return job_id
+            pending = await self.redis.get(f"{self.prefix}:pending:{key}")
+            if pending is not None:
+                return pending.decode()
+
+    async def release(self, key: str, job_id: str):
+        await _release_script(keys=[f"{self.prefix}:pending:{key}"], args=[job_id], client=self.redis)
+
+    async def save(self, job: dict, ttl: int):
+        await self.redis.set(f"{self.prefix}:{job['job_id']}", json.dumps(job), ex=ttl)
+
+    async def load(self, job_id: str) -> dict | None:
+        job = await self.redis.get(f"{self.prefix}:{job_id}")
+        return json.loads(job) if job is not None else None
+
+    async def delete(self, job_id: str):
+        await self.redis.delete(f"{self.prefix}:{job_id}", f"{self.prefix}:{job_id}:result")
+
+    async def finish(self, job: dict, items: List[bytes], ttl: int):
+        result = f"{self.prefix}:{job['job_id']}:result"
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(result)
+            if items:
+                pipe.rpush(result, *items)
+                pipe.expire(result, ttl)
+            pipe.set(f"{self.prefix}:{job['job_id']}", json.dumps(job), ex=ttl)
+            await pipe.execute()
+
+    async def page(self, job_id: str, start: int, stop: int) -> List[bytes]:
+        return await self.redis.lrange(f"{self.prefix}:{job_id}:result", start, stop - 1)
+
+    async def renew(self, owner: str, lease: float):
+        await self.redis.set(f"{self.prefix}:owner:{owner}", 1, px=int(lease * 1000))
+
+    async def alive(self, owner: str) -> bool:
+        return bool(await self.redis.exists(f"{self.prefix}:owner:{owner}"))
+
+    async def expire(self, owner: str):
+        await self.redis.delete(f"{self.prefix}:owner:{owner}")
+
+
+class MemoryJobStore:
+    """
+    Jobs and their results in the memory of the process, the same interface as RedisJobStore
+    (for tests and a single process without Redis).
+    """
+
+    def __init__(self):
+        self.entries: Dict[str, Tuple[float, object]] = {}
+
+    def _get(self, key: str):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self.entries[key]
+            return None
+        return entry[1]
+
+    def _set(self, key: str, value, ttl: int):
+        self.entries[key] = (time.monotonic() + ttl, value)
+
+    async def claim(self, key: str, job_id: str, ttl: int) -> str:
+        pending = self._get(f"pending:{key}")
+        if pending is not None:
+            return pending
+        self._set(f"pending:{key}", job_id, ttl)
+        return job_id
+
+    async def release(self, key: str, job_id: str):
+        if self._get(f"pending:{key}") == job_id:
+            del self.entries[f"pending:{key}"]
+
+    async def save(self, job: dict, ttl: int):
+        self._set(job["job_id"], dict(job), ttl)
+
+    async def load(self, job_id: str) -> dict | None:
+        job = self._get(job_id)
+        return dict(job) if job is not None else None
+
+    async def delete(self, job_id: str):
+        self.entries.pop(job_id, None)
+        self.entries.pop(f"{job_id}:result", None)
+
+    async def finish(self, job: dict, items: List[bytes], ttl: int):
+        self._set(f"{job['job_id']}:result", list(items), ttl)
+        await self.save(job, ttl)
+
+    async def page(self, job_id: str, start: int, stop: int) -> List[bytes]:
+        return (self._get(f"{job_id}:result") or [])[start:stop]
+
+    async def renew(self, owner: str, lease: float):
+        self._set(f"owner:{owner}", True, lease)
+
+    async def alive(self, owner: str) -> bool:
+        return self._get(f"owner:{owner}") is not None
+
+    async def expire(self, owner: str):
+        self.entries.pop(f"owner:{owner}", None)
+
+
+def now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class SelectionJobs:
+    """
+    Selection in the background for requests which take longer than the gateway allows.
+    Jobs are queued in the process and executed by a fixed number of worker tasks (at most `workers` selections
+    run at the same time, at most `queue_size` wait), their status and results are kept in the store for `ttl`
+    seconds. A job with the same parameters as a queued or running one isn't created, the pending job is returned.
+    The process renews its lease in the store while it runs: pending jobs of a process whose lease has expired
+    (it has stopped with its queue) are failed when they are read, so they don't block the same submissions.
+    """
+
+    def __init__(self, store, workers: int = SELECTION_JOB_WORKERS, queue_size: int = SELECTION_JOB_QUEUE_SIZE,
+                 ttl: int = SELECTION_JOB_TTL, timeout: float = SELECTION_JOB_TIMEOUT,
+                 lease: float = SELECTION_JOB_LEASE):
+        self.store = store
+        self.workers = workers
+        self.queue_size = queue_size
+        self.ttl = ttl
+        self.timeout = timeout
+        self.lease = lease
+        self.owner = uuid4().hex
+        self.queue: asyncio.Queue | None = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._renew_lease())]
+        self._tasks += [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # the jobs of this process won't be executed, other processes see it at once
+        try:
+            await self.store.expire(self.owner)
+        except Exception:
+            logger.warning("Lease of selection jobs isn't released:", exc_info=True)
+
+    async def _renew_lease(self):
+        while True:
+            try:
+                await self.store.renew(self.owner, self.lease)
+            except Exception:
+                logger.warning("Lease of selection jobs isn't renewed:", exc_info=True)
+            await asyncio.sleep(self.lease / 3)
+
+    async def orphaned(self, job: dict) -> bool:
+        """
+        The job is pending, but the process which queued it has stopped.
+        """
+        return job["status"] in PENDING_STATUSES and job.get("owner") != self.owner and \
+            not await self.store.alive(job.get("owner", ""))
+
+    async def load(self, job_id: str) -> dict | None:
+        """
+        The job from the store, a pending job of a stopped process is failed.
+        """
+        job = await self.store.load(job_id)
+        if job is not None and await self.orphaned(job):
+            await self.fail(job, ORPHANED_ERROR)
+        return job
+
+    async def submit(self, orm_table_for_search: Type[CandidatesDB | JobOpeningsDB], record_id: int, top: int,
+                     sorting) -> dict:
+        """
+        Queue the selection or find the pending job with the same parameters.
+        :param orm_table_for_search: the table with the records to be found.
+        :param record_id: id of record for which the selection will be made.
+        :param top: number of the best records to find.
+        :param sorting: sorting parameter.
+        :return: dict - the job.
+        """
+        if self.queue is None or self.queue.full():
+            raise_exception(status=503, info="too many selection jobs are waiting, try again later")
+        key = f"{orm_table_for_search.__tablename__}:{record_id}:{top}:{sorting}"
+        job = {
+            "job_id": uuid4().hex, "status": "queued", "kind": orm_table_for_search.__tablename__,
+            "record_id": record_id, "top": top, "sorting_from": sorting, "created_at": now(), "owner": self.owner,
+        }
+        await self.store.save(job, self.ttl)
+        while (pending_id := await self.store.claim(key, job["job_id"], self.ttl)) != job["job_id"]:
+            pending = await self.store.load(pending_id)
+            if pending is not None and not await self.orphaned(pending):
+                await self.store.delete(job["job_id"])
+                return pending
+            # the pending job has expired or its process has stopped, this one is queued instead
+            if pending is not None:
+                await self.fail(pending, ORPHANED_ERROR)
+            await self.store.release(key, pending_id)
+        try:
+            self.queue.put_nowait((job, key))
+        except asyncio.QueueFull:
+            await self.store.release(key, job["job_id"])
+            await self.store.delete(job["job_id"])
+            raise_exception(status=503, info="too many selection jobs are waiting, try again later")
+        return job
+
+    async def _work(self):
+        while True:
+            job, key = await self.queue.get()
+            try:
+                await self.run(job)
+            except Exception:
+                logger.exception("Selection job %s isn't saved:", job["job_id"])
+            finally:
+                await self.store.release(key, job["job_id"])
+                self.queue.task_done()
+
+    async def run(self, job: dict):
+        """
+        Execute the selection of the job and save its result.
+        """
+        job["status"] = "running"
+        await self.store.save(job, self.ttl)
+        orm_table_for_search = TABLES[job["kind"]]
+        try:
+            records = await asyncio.wait_for(find_suitable_records(
+                record_id=job["record_id"], orm_table_for_search=orm_table_for_search, sorting=job["sorting_from"],
+                lim=job["top"], page=0
+            ), self.timeout)
+            models = type_adapter(List[SCHEMAS[orm_table_for_search]]).validate_python(
+                [record for record, _ in records], from_attributes=True
+            )
+        except HTTPException as error:
+            if error.status_code != 404:
+                return await self.fail(job, str(error.detail))
+            models = []  # there are no relevant records
+        except asyncio.TimeoutError:
+            return await self.fail(job, f"the selection took longer than {self.timeout} seconds")
+        except Exception:
+            logger.exception("Selection job %s failed:", job["job_id"])
+            return await self.fail(job, "the selection failed")
+
+        items = [model.model_dump_json().encode() for model in models]
+        job.update(status="done", total=len(items), finished_at=now())
+        await self.store.finish(job, items, self.ttl)
+
+    async def fail(self, job: dict, error: str):
+        job.update(status="failed", error=error, finished_at=now())
+        await self.store.save(job, self.ttl)
+
+    async def page(self, job: dict, limit: int, page: int) -> dict:
+        """
+        :return: dict - the job with the page of found records (if it is done).
+        """
+        if job["status"] == "done":
+            start = limit * page
+            job["items"] = [json.loads(item) for item in await self.store.page(job["job_id"], start, start + limit)]
+        return job
+
+
+selection_jobs = SelectionJobs(RedisJobStore(redis))
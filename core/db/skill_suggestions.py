@@ -0,0 +1,182 @@
+import heapq
+from bisect import bisect_left, insort
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import select, func, desc, union_all, bindparam
+
+from core.cache.change_feed import Replicated
+from core.db.database import CandidatesSkillsDB, RequiredSkillsDB, SkillsDB, session
+from core.db.replicas import read_session
+
+
+# prefixes up to this length match too many names to rank them per request, their answers are kept ranked
+SHORT_PREFIX = 2
+# maximum number of suggestions in one answer
+MAX_SUGGESTIONS = 50
+# more new names are merged into the sorted array by sorting it again
+INSORT_LIMIT = 64
+
+
+@lru_cache(maxsize=None)
+def fuzzy_statement():
+    """
+    Indexing skill names similar to the typed text (trigram word similarity, the GIN index of skills.name),
+    the most similar first. Values are passed at execution: text, lim.
+    :return: Select
+    """
+    typed = bindparam('text')
+    return (
+        select(SkillsDB.name)
+        .where(typed.op('<%')(SkillsDB.name))
+        .order_by(desc(func.word_similarity(typed, SkillsDB.name)), SkillsDB.name)
+        .limit(bindparam('lim'))
+    )
+
+
+class SkillSuggestions(Replicated):
+    """
+    Sorted array of distinct indexing skill names for autocomplete: names with a prefix are a slice
+    found by binary search, the most popular of them (by the number of skills of candidates and job openings
+    with the name) are returned with the most common spelling of the name.
+    For short prefixes the most popular names are kept ranked: they are updated in place, a full list which loses
+    a name is ranked again from the slice of the prefix.
+    Every worker keeps its copy, changes are shared through the change feed.
+    """
+    replica_name = "skill_suggestions"
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.spelling: Dict[str, str] = {}
+        self.popularity: Dict[str, int] = {}
+        self.top: Dict[str, List[str]] = {}
+        self.ready = False
+
+    def _rank(self, name: str) -> tuple:
+        return -self.popularity[name], name
+
+    async def build(self):
+        """
+        Load names of all skills with their popularity from database.
+        """
+        skills = union_all(
+            select(CandidatesSkillsDB.skill_id, CandidatesSkillsDB.skill_name),
+            select(RequiredSkillsDB.skill_id, RequiredSkillsDB.skill_name),
+        ).subquery()
+        query = (
+            select(SkillsDB.name, func.mode().within_group(skills.c.skill_name), func.count())
+            .join(skills, skills.c.skill_id == SkillsDB.id)
+            .group_by(SkillsDB.name)
+        )
+        async with session() as ses:
+            response = await ses.execute(query)
+        spelling, popularity = {}, {}
+        for name, skill_name, count in response:
+            spelling[name], popularity[name] = skill_name, count
+        self.names, self.spelling, self.popularity = sorted(popularity), spelling, popularity
+
+        top = defaultdict(list)
+        for name in self.names:
+            for length in range(1, min(len(name), SHORT_PREFIX) + 1):
+                top[name[:length]].append(name)
+        self.top = {prefix: sorted(names, key=self._rank)[:MAX_SUGGESTIONS] for prefix, names in top.items()}
+        self.ready = True
+
+    def add(self, skills: Iterable[Tuple[str, str]]):
+        """
+        Count new skills.
+        :param skills: pairs (indexing skill name, skill name).
+        """
+        if self.tracked:
+            self.change("add", [list(pair) for pair in skills])
+
+    def apply_add(self, skills: List[list]):
+        new_names = []
+        for name, skill_name in skills:
+            if name not in self.popularity:
+                new_names.append(name)
+                self.spelling[name] = skill_name
+                self.popularity[name] = 0
+            self.popularity[name] += 1
+            for length in range(1, min(len(name), SHORT_PREFIX) + 1):
+                top = self.top.setdefault(name[:length], [])
+                if name not in top:
+                    if len(top) >= MAX_SUGGESTIONS and self._rank(name) > self._rank(top[-1]):
+                        continue
+                    top.append(name)
+                top.sort(key=self._rank)
+                del top[MAX_SUGGESTIONS:]
+        if len(new_names) > INSORT_LIMIT:
+            self.names = sorted(self.names + new_names)
+        else:
+            for name in new_names:
+                insort(self.names, name)
+
+    def remove(self, names: Iterable[str]):
+        """
+        Uncount deleted skills and old names of renamed ones.
+        :param names: indexing skill names, one per skill.
+        """
+        if self.tracked:
+            self.change("remove", list(names))
+
+    def apply_remove(self, names: List[str]):
+        for name in names:
+            if name not in self.popularity:
+                continue
+            self.popularity[name] -= 1
+            if not self.popularity[name]:
+                del self.popularity[name], self.spelling[name]
+                del self.names[bisect_left(self.names, name)]
+            for length in range(1, min(len(name), SHORT_PREFIX) + 1):
+                prefix = name[:length]
+                top = self.top.get(prefix, [])
+                if name not in top:
+                    continue
+                if len(top) >= MAX_SUGGESTIONS:
+                    # a less popular name from outside the list may outrank it now
+                    self.top[prefix] = heapq.nsmallest(MAX_SUGGESTIONS, self.prefixed(prefix), key=self._rank)
+                elif name in self.popularity:
+                    top.sort(key=self._rank)
+                else:
+                    top.remove(name)
+
+    def prefixed(self, prefix: str) -> List[str]:
+        """
+        Slice of the sorted names which start with the prefix.
+        """
+        start = bisect_left(self.names, prefix)
+        end = bisect_left(self.names, prefix[:-1] + chr(ord(prefix[-1]) + 1), lo=start)
+        return self.names[start:end]
+
+    def suggest(self, prefix: str, limit: int) -> List[dict]:
+        """
+        The most popular skills whose indexing names start with the prefix.
+        :param prefix: typed text (any case).
+        :param limit: maximum number of skills (up to MAX_SUGGESTIONS).
+        :return: List[dict] - {"name": skill name, "popularity": number of skills with the name}
+        """
+        prefix = prefix.lower()
+        if len(prefix) <= SHORT_PREFIX:
+            return [self.named(name) for name in self.top.get(prefix, [])[:limit]]
+        return [self.named(name) for name in heapq.nsmallest(limit, self.prefixed(prefix), key=self._rank)]
+
+    def named(self, name: str) -> dict:
+        return {"name": self.spelling.get(name, name), "popularity": self.popularity.get(name, 0)}
+
+    async def suggest_fuzzy(self, text: str, limit: int, exclude: Iterable[str] = ()) -> List[dict]:
+        """
+        Skills whose names are similar to the text (typos, missing letters), from database.
+        :param text: typed text.
+        :param limit: maximum number of skills.
+        :param exclude: skill names which are already suggested.
+        :return: List[dict] - same as suggest.
+        """
+        exclude = {name.lower() for name in exclude}
+        async with read_session() as ses:
+            response = await ses.execute(fuzzy_statement(), {'text': text.lower(), 'lim': limit + len(exclude)})
+        return [self.named(name) for name in response.scalars() if name not in exclude][:limit]
+
+
+skill_suggestions = SkillSuggestions()
@@ -0,0 +1,72 @@
+from typing import Dict, Iterable
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from core.db.database import SkillsDB, session
+
+
+class SkillsDictionary:
+    """
+    In-process cache of the table skills (indexing skill name <-> id).
+    Rows of the table are never changed or deleted, so cached pairs can't become stale.
+    """
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.names: Dict[int, str] = {}
+
+    def _remember(self, rows: Iterable[tuple]):
+        for skill_id, name in rows:
+            self.ids[name] = skill_id
+            self.names[skill_id] = name
+
+    async def resolve(self, names: Iterable[str]) -> Dict[str, int]:
+        """
+        Ids of indexing skill names, unknown names are added to the table skills.
+        New names are committed in a separate transaction, so cached ids exist even if the caller's
+        transaction is rolled back.
+        :param names: indexing skill names.
+        :return: dict {name: id}
+        """
+        names = set(names)
+        unknown = names - self.ids.keys()
+        if unknown:
+            async with session() as ses:
+                await ses.execute(
+                    insert(SkillsDB).values([{"name": name} for name in unknown])
+                    .on_conflict_do_nothing(index_elements=[SkillsDB.name])
+                )
+                response = await ses.execute(select(SkillsDB.id, SkillsDB.name).where(SkillsDB.name.in_(unknown)))
+                await ses.commit()
+            self._remember(response.all())
+        return {name: self.ids[name] for name in names}
+
+    async def get_names(self, skill_ids: Iterable[int]) -> Dict[int, str]:
+        """
+        Indexing skill names of ids.
+        :param skill_ids: ids from the table skills.
+        :return: dict {id: name}
+        """
+        skill_ids = set(skill_ids)
+        unknown = skill_ids - self.names.keys()
+        if unknown:
+            async with session() as ses:
+                response = await ses.execute(select(SkillsDB.id, SkillsDB.name).where(SkillsDB.id.in_(unknown)))
+            self._remember(response.all())
+        return {skill_id: self.names[skill_id] for skill_id in skill_ids if skill_id in self.names}
+
+    async def skill_rows(self, skills: Iterable[dict]) -> list:
+        """
+        Replace indexing_skill_name of validated skills with skill_id (rows for the skills tables).
+        :param skills: dumped AddCandidateSkills/AddRequiredSkills.
+        :return: list
+        """
+        skills = [dict(skill) for skill in skills]
+        skill_ids = await self.resolve(skill["indexing_skill_name"] for skill in skills)
+        for skill in skills:
+            skill["skill_id"] = skill_ids[skill.pop("indexing_skill_name")]
+        return skills
+
+
+skills_dictionary = SkillsDictionary()
@@ -0,0 +1,91 @@
+from functools import lru_cache
+from typing import List, Mapping, Type
+
+from sqlalchemy import select, update, func, bindparam, any_, literal_column, Integer, ColumnElement
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.db.database import CandidatesDB, CandidatesSkillsDB, RequiredSkillsDB, JobOpeningsDB, Base
+
+
+# table of skills -> table of their owners
+OWNERS = {CandidatesSkillsDB: CandidatesDB, RequiredSkillsDB: JobOpeningsDB}
+# skills_snapshot of a record without skills
+EMPTY_SNAPSHOT = literal_column("'[]'::jsonb")
+
+
+def snapshot_aggregate(skill_columns: Mapping[str, ColumnElement], order_by: ColumnElement):
+    """
+    Aggregate which builds skills_snapshot: JSON array of skills (objects with all columns of the skills table),
+    null if there are no skills (see EMPTY_SNAPSHOT).
+    :param skill_columns: columns of the skill by their names in the table of skills.
+    :param order_by: order of skills in the array (id of the skill).
+    :return: ColumnElement
+    """
+    skill = func.jsonb_build_object(
+        *(argument for name, value in skill_columns.items() for argument in (literal_column(f"'{name}'"), value))
+    )
+    return func.jsonb_agg(aggregate_order_by(skill, order_by))
+
+
+def snapshot_subquery(orm_table_class: Type[CandidatesSkillsDB | RequiredSkillsDB]):
+    """
+    Correlated subquery with skills_snapshot of the owner from its current skills.
+    :param orm_table_class: table with skills from database.
+    :return: ScalarSelect
+    """
+    owner, skills = OWNERS[orm_table_class].__table__, orm_table_class.__table__
+    return (
+        select(func.coalesce(snapshot_aggregate({i.name: i for i in skills.columns}, skills.c.id), EMPTY_SNAPSHOT))
+        .where(skills.c.foreign_key == owner.c.id)
+        .scalar_subquery()
+    )
+
+
+@lru_cache(maxsize=None)
+def refresh_snapshot_statement(orm_table_class: Type[CandidatesSkillsDB | RequiredSkillsDB]):
+    """
+    UPDATE of skills_snapshot of the owners (the parameter ids) from their current skills.
+    :param orm_table_class: table with skills from database.
+    :return: Update
+    """
+    owner = OWNERS[orm_table_class].__table__
+    return (
+        update(owner).where(owner.c.id == any_(bindparam('ids', type_=ARRAY(Integer))))
+        .values(skills_snapshot=snapshot_subquery(orm_table_class))
+    )
+
+
+@lru_cache(maxsize=None)
+def lock_owners_statement(orm_table_class: Type[CandidatesSkillsDB | RequiredSkillsDB]):
+    """
+    SELECT ... FOR UPDATE of the owners (the parameter ids) in the order of ids, so transactions don't deadlock.
+    """
+    owner = OWNERS[orm_table_class].__table__
+    return (
+        select(owner.c.id).where(owner.c.id == any_(bindparam('ids', type_=ARRAY(Integer))))
+        .order_by(owner.c.id).with_for_update()
+    )
+
+
+async def refresh_skills_snapshot(ses: AsyncSession, orm_table_class: Type[Base], record_ids: List[int],
+                                  lock: bool = True):
+    """
+    Rewrite skills_snapshot of the candidates or job openings which own the changed skills in the current transaction.
+    The owners are locked first: a concurrent transaction which changes skills of the same record waits for the commit
+    of this one and then builds the snapshot with its skills (a single UPDATE would aggregate skills which were visible
+    when it started).
+    :param ses: opened session.
+    :param orm_table_class: CandidatesDB/CandidatesSkillsDB or JobOpeningsDB/RequiredSkillsDB.
+    :param record_ids: ids of candidates or job openings.
+    :param lock: False for records added in the current transaction (other transactions don't see them).
+    """
+    if orm_table_class is CandidatesDB or orm_table_class is CandidatesSkillsDB:
+        orm_table_class = CandidatesSkillsDB
+    else:
+        orm_table_class = RequiredSkillsDB
+    if not record_ids:
+        return
+    if lock:
+        await ses.execute(lock_owners_statement(orm_table_class), {'ids': record_ids})
+    await ses.execute(refresh_snapshot_statement(orm_table_class), {'ids': record_ids})
@@ -0,0 +1,130 @@
+import asyncio
+import contextvars
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, List
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from core.config import SLOW_QUERY_THRESHOLD, SLOW_QUERY_EXPLAIN_THRESHOLD, SLOW_QUERY_EXPLAIN_INTERVAL, \
+    SLOW_QUERY_LOG_SIZE, SLOW_QUERY_LOG_PARAMETERS
+from core.metrics import request_scope, route_of, statement_label
+
+
+logger = logging.getLogger(__name__)
+
+# plans are captured by a second execution of the statement, it is interrupted after this time
+EXPLAIN_TIMEOUT = 30
+PARAMETER_LENGTH = 200
+
+
+def printable_parameters(parameters, redact: bool = not SLOW_QUERY_LOG_PARAMETERS) -> list:
+    """
+    Bound parameters of the statement for the log (long values are cut).
+    :param parameters: bound parameters (sequence or dict).
+    :param redact: values are replaced with their types, e.g. "<str>" (None is kept).
+    """
+    if isinstance(parameters, dict):
+        parameters = list(parameters.values())
+    if redact:
+        return [None if value is None else f"<{type(value).__name__}>" for value in parameters or ()]
+    return [value if isinstance(value, (int, float, bool, type(None))) else repr(value)[:PARAMETER_LENGTH]
+            for value in parameters or ()]
+
+
+class SlowQueryLog:
+    """
+    Ring buffer of slow statements with their bound parameters (redacted by default) and duration.
+    For statements above the explain threshold the plan is captured in a background task on a separate connection:
+    EXPLAIN (ANALYZE, BUFFERS) for reading statements (in a read-only transaction),
+    EXPLAIN without execution for statements which change data.
+    One plan is captured at a time, the same statement is explained at most once per the interval.
+    """
+
+    def __init__(self, threshold: float = SLOW_QUERY_THRESHOLD, explain_threshold: float = SLOW_QUERY_EXPLAIN_THRESHOLD,
+                 explain_interval: float = SLOW_QUERY_EXPLAIN_INTERVAL, size: int = SLOW_QUERY_LOG_SIZE):
+        self.threshold = threshold
+        self.explain_threshold = explain_threshold
+        self.explain_interval = explain_interval
+        self.entries: Deque[dict] = deque(maxlen=size)
+        self._explained_at: Dict[str, float] = {}
+        self._explaining: asyncio.Task | None = None
+
+    def instrument(self, engine: AsyncEngine):
+        """
+        Record slow statements executed by the engine.
+        """
+        @event.listens_for(engine.sync_engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            context.slow_query_started = time.perf_counter()
+
+        @event.listens_for(engine.sync_engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            duration = time.perf_counter() - context.slow_query_started
+            if duration >= self.threshold and context.execution_options.get("slow_query_log", True):
+                self.record(engine, statement, parameters, duration, executemany)
+
+    def record(self, engine: AsyncEngine, statement: str, parameters, duration: float, executemany: bool):
+        scope = request_scope.get()
+        entry = {
+            "time": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round(duration * 1000, 3),
+            "route": route_of(scope) if scope is not None else None,
+            "statement": statement,
+            "parameters": printable_parameters(parameters[0] if executemany and parameters else parameters),
+            "executemany": executemany,
+            "plan": None,
+        }
+        self.entries.append(entry)
+        logger.warning("Slow statement (%.1f ms): %s", entry["duration_ms"], statement_label(statement))
+        if duration >= self.explain_threshold and not executemany and self._may_explain(statement):
+            # without the context of the request, so the EXPLAIN isn't counted for its route
+            self._explaining = contextvars.Context().run(
+                asyncio.get_running_loop().create_task, self.explain(engine, entry, parameters)
+            )
+
+    def _may_explain(self, statement: str) -> bool:
+        if self._explaining is not None and not self._explaining.done():
+            return False
+        now = time.monotonic()
+        if now - self._explained_at.get(statement, -self.explain_interval) < self.explain_interval:
+            return False
+        self._explained_at = {text: at for text, at in self._explained_at.items() if now - at < self.explain_interval}
+        self._explained_at[statement] = now
+        return True
+
+    @staticmethod
+    async def explain(engine: AsyncEngine, entry: dict, parameters):
+        """
+        Capture the plan of the statement into the entry of the log (the transaction is rolled back).
+        """
+        reading = statement_label(entry["statement"]).split()[0] == "SELECT"
+        options = "ANALYZE, BUFFERS" if reading else "COSTS"
+        try:
+            async with engine.connect() as conn:
+                conn = await conn.execution_options(slow_query_log=False)
+                if reading:
+                    await conn.exec_driver_sql("SET TRANSACTION READ ONLY")
+                await conn.exec_driver_sql(f"SET LOCAL statement_timeout = '{EXPLAIN_TIMEOUT}s'")
+                result = await conn.exec_driver_sql(f"EXPLAIN ({options}) {entry['statement']}", tuple(parameters))
+                entry["plan"] = "\n".join(row[0] for row in result)
+                await conn.rollback()
+        except Exception as error:
+            logger.warning("Plan of the slow statement isn't captured:", exc_info=True)
+            entry["plan"] = f"EXPLAIN failed: {error!r}"
+
+    def recent(self, limit: int) -> List[dict]:
+        """
+        :return: the latest entries first.
+        """
+        return list(reversed(self.entries))[:limit]
+
+    def clear(self):
+        self.entries.clear()
+        self._explained_at.clear()
+
+
+slow_query_log = SlowQueryLog()
@@ -0,0 +1,193 @@
+import gzip
+import hashlib
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.config import COMPRESSION_MINIMUM_SIZE, COMPRESSION_CACHE_SIZE, GZIP_LEVEL, BROTLI_QUALITY
+
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+# headers of 304 response (RFC 9110, 15.4.5), the others describe the body which isn't sent
+NOT_MODIFIED_HEADERS = ("cache-control", "content-location", "date", "etag", "expires", "vary")
+
+
+def strong_etag(body: bytes) -> str:
+    """
+    Strong entity tag of the body: a digest of its bytes, the same in every worker.
+    """
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def preferred_encoding(accept_encoding: str) -> str | None:
+    """
+    Content coding accepted by the client: brotli before gzip, codings with q=0 are refused.
+    :param accept_encoding: value of the Accept-Encoding header.
+    :return: "br", "gzip" or None
+    """
+    accepted: Dict[str, float] = {}
+    for item in accept_encoding.lower().split(","):
+        coding, _, parameters = item.partition(";")
+        quality = 1.0
+        if parameters.strip().startswith("q="):
+            try:
+                quality = float(parameters.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip()] = quality
+    for coding in ("br", "gzip"):
+        if accepted.get(coding, accepted.get("*", 0)) > 0:
+            return coding
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class StreamCompressor:
+    """
+    Compressor of a streamed body: every chunk is flushed, so the client gets records as they are produced.
+    """
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self.compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def chunk(self, data: bytes, last: bool) -> bytes:
+        if self.encoding == "br":
+            compressed = self.compressor.process(data)
+            return compressed + (self.compressor.finish() if last else self.compressor.flush())
+        compressed = self.compressor.compress(data)
+        return compressed + self.compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Weak comparison of entity tags (RFC 9110, 13.1.2): W/ prefixes and suffixes of content codings are ignored.
+    """
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    for tag in if_none_match.split(","):
+        tag = tag.strip().removeprefix("W/")
+        for coding in ("gzip", "br"):
+            tag = tag.replace(f'-{coding}"', '"')
+        if tag == opaque:
+            return True
+    return False
+
+
+class ConditionalResponseMiddleware:
+    """
+    ASGI middleware for responses of GET requests: strong ETags, conditional requests and compression.
+    - A complete 200 response gets a strong ETag (cached endpoints bring the digest of the cached payload,
+      see core.cache.conditional, the others get a digest of the body).
+    - If-None-Match with this tag is answered by 304 without the body (cached endpoints answer it themselves
+      without computing the response).
+    - Bodies of JSON and text types from COMPRESSION_MINIMUM_SIZE bytes are compressed by brotli or gzip
+      (by Accept-Encoding), the coding is added to the ETag. Compressed bodies are kept by their tags,
+      so polling of the same page doesn't compress it again. Streamed bodies are compressed chunk by chunk.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MINIMUM_SIZE,
+                 cache_size: int = COMPRESSION_CACHE_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache_size = cache_size
+        self.compressed: OrderedDict[Tuple[str, str], bytes] = OrderedDict()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        if_none_match = request_headers.get("if-none-match")
+        encoding = preferred_encoding(request_headers.get("accept-encoding", ""))
+        start: Message | None = None
+        chunks: List[bytes] = []
+        stream: StreamCompressor | None = None
+
+        async def send_response(message: Message):
+            nonlocal start, stream
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                if stream is not None and message["type"] == "http.response.body":
+                    more_body = message.get("more_body", False)
+                    message = {**message, "body": stream.chunk(message.get("body", b""), last=not more_body)}
+                await send(message)
+                return
+
+            headers = MutableHeaders(scope=start)
+            if "content-length" not in headers:
+                # a streamed body, it is only compressed
+                response_start, start = start, None
+                if self.compressible(headers) and encoding is not None and response_start["status"] == 200:
+                    stream = StreamCompressor(encoding)
+                    headers.add_vary_header("Accept-Encoding")
+                    headers["content-encoding"] = encoding
+                    more_body = message.get("more_body", False)
+                    message = {**message, "body": stream.chunk(message.get("body", b""), last=not more_body)}
+                await send(response_start)
+                await send(message)
+                return
+            # a body of known size (it may come in chunks through BaseHTTPMiddleware) is collected
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            response_start, start = start, None
+            await self.send_complete(response_start, headers, b"".join(chunks), if_none_match, encoding, send)
+
+        await self.app(scope, receive, send_response)
+
+    async def send_complete(self, start: Message, headers: MutableHeaders, body: bytes, if_none_match: str | None,
+                            encoding: str | None, send: Send):
+        compressible = self.compressible(headers)
+        if compressible:
+            headers.add_vary_header("Accept-Encoding")
+        if start["status"] == 200:
+            etag = headers.get("etag")
+            if etag is None or etag.startswith("W/"):
+                etag = headers["etag"] = strong_etag(body)
+            if if_none_match is not None and etag_matches(if_none_match, etag):
+                await send(self.not_modified(start, headers))
+                await send({"type": "http.response.body", "body": b""})
+                return
+            if compressible and encoding is not None and len(body) >= self.minimum_size:
+                body = self.compress(etag, body, encoding)
+                headers["etag"] = f'{etag[:-1]}-{encoding}"'
+                headers["content-encoding"] = encoding
+                headers["content-length"] = str(len(body))
+        await send(start)
+        await send({"type": "http.response.body", "body": body})
+
+    def compressible(self, headers: MutableHeaders) -> bool:
+        return "content-encoding" not in headers and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+
+    @staticmethod
+    def not_modified(start: Message, headers: MutableHeaders) -> Message:
+        raw: List[Tuple[bytes, bytes]] = [(name, value) for name, value in headers.raw
+                                          if name.decode("latin-1") in NOT_MODIFIED_HEADERS]
+        return {**start, "status": 304, "headers": raw}
+
+    def compress(self, etag: str, body: bytes, encoding: str) -> bytes:
+        key = (etag, encoding)
+        compressed = self.compressed.get(key)
+        if compressed is not None:
+            self.compressed.move_to_end(key)
+            return compressed
+        compressed = self.compressed[key] = compress(body, encoding)
+        while len(self.compressed) > self.cache_size:
+            self.compressed.popitem(last=False)
+        return compressed
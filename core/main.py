@@ -2,24 +2,60 @@ from fastapi import FastAPI
 from contextlib import asynccontextmanager
 
 from fastapi_cache import FastAPICache
-from fastapi_cache.backends.redis import RedisBackend
 
 from core.routers import routers_set
 from core.db.create_tables import create_if_the_database_is_empty
+from core.db.database import engine
+from core.db.replicas import read_your_writes, replica_set
+from core.db.slow_queries import slow_query_log
+from core.db.skill_suggestions import skill_suggestions
+from core.db.selection_jobs import selection_jobs
 from core.cache.redis_conf import redis
+from core.cache.change_feed import change_feed
+from core.cache.invalidation import tagged_key_builder
+from core.cache.two_tier import TwoTierBackend
+from core.config import MATCHING_ENGINE
+from core.matching import IN_MEMORY_ENGINES, skill_index
+from core.metrics import metrics, MetricsMiddleware
+from core.http_cache import ConditionalResponseMiddleware
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
-    Create a connection to the cache service and tables in database (if they don't exist).
+    Create a connection to the cache service (with the local cache tier and its invalidation listener)
+    and tables in database (if they don't exist), build the in-memory skill index (or skill matrices)
+    if it is used for selection and the index of skill names for suggestions (they are kept in sync with other
+    workers by the change feed), start health checks of read replicas and workers of selection jobs.
     """
-    FastAPICache.init(RedisBackend(redis), prefix="fastapi-cache")
+    backend = TwoTierBackend(redis)
+    FastAPICache.init(backend, prefix="fastapi-cache", key_builder=tagged_key_builder)
+    backend.start()
     await create_if_the_database_is_empty()
+    if MATCHING_ENGINE in IN_MEMORY_ENGINES:
+        change_feed.register(skill_index)
+    change_feed.register(skill_suggestions)
+    await change_feed.start()
+    replica_set.start()
+    selection_jobs.start()
     yield
+    await selection_jobs.stop()
+    await replica_set.stop()
+    await change_feed.stop()
+    await backend.stop()
 
 
 my_job = FastAPI(openapi_prefix="/api/v1", lifespan=lifespan)
 
 for router in routers_set:
     my_job.include_router(router)
+
+if replica_set.replicas:
+    my_job.middleware("http")(read_your_writes)
+
+my_job.add_middleware(ConditionalResponseMiddleware)
+# the outermost middleware, so the latency includes the other ones
+my_job.add_middleware(MetricsMiddleware)
+for instrumented_engine in (engine, *(replica.engine for replica in replica_set.replicas)):
+    metrics.instrument(instrumented_engine)
+    slow_query_log.instrument(instrumented_engine)
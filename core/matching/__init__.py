@@ -0,0 +1,11 @@
+from core.config import MATCHING_ENGINE
+from .inverted_index import SkillIndex, posting_columns
+
+# engines which keep skills in the memory of the process
+IN_MEMORY_ENGINES = ('index', 'numpy')
+
+if MATCHING_ENGINE == 'numpy':
+    from .vectorized import SkillMatrixIndex
+    skill_index = SkillMatrixIndex()
+else:
+    skill_index = SkillIndex()
@@ -0,0 +1,373 @@
+import heapq
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Set, Tuple, Type
+
+from sqlalchemy import select
+
+from core.cache.change_feed import Replicated
+from core.db.database import CandidatesDB, CandidatesSkillsDB, JobOpeningsDB, RequiredSkillsDB, session
+
+
+def posting_columns(orm_table_class: Type[CandidatesSkillsDB | RequiredSkillsDB]) -> tuple:
+    """
+    Columns of skills table which are stored in the index (in the order expected by SkillIndex.add_skills).
+    :param orm_table_class: table with skills from database.
+    :return: tuple
+    """
+    return (
+        orm_table_class.id, orm_table_class.foreign_key, orm_table_class.skill_id, orm_table_class.level,
+        orm_table_class.years_of_experience, orm_table_class.score
+    )
+
+
+class Postings:
+    """
+    Skills of one table grouped by skill (id from the table skills).
+    Every posting list is sorted by (level, years_of_experience, owner id, skill id, score).
+    """
+
+    def __init__(self):
+        self.by_key: Dict[int, List[tuple]] = {}
+        self.by_skill: Dict[int, Tuple[int, tuple]] = {}
+        self.by_owner: Dict[int, Set[int]] = defaultdict(set)
+
+    def load(self, rows: Iterable[tuple]):
+        """
+        Fill empty postings with rows (id, foreign_key, skill_id, level, years_of_experience, score).
+        Lists are sorted once at the end instead of inserting every row in place.
+        :param rows: rows from skills table.
+        """
+        for skill_id, owner_id, key, level, years, score in rows:
+            entry = (level, years, owner_id, skill_id, score)
+            self.by_key.setdefault(key, []).append(entry)
+            self.by_skill[skill_id] = (key, entry)
+            self.by_owner[owner_id].add(skill_id)
+        for postings in self.by_key.values():
+            postings.sort()
+
+    def add(self, skill_id: int, owner_id: int, key: int, level: int, years: int, score: int):
+        """
+        Add skill to the postings (previous version of this skill is replaced).
+        """
+        self.remove(skill_id)
+        entry = (level, years, owner_id, skill_id, score)
+        insort(self.by_key.setdefault(key, []), entry)
+        self.by_skill[skill_id] = (key, entry)
+        self.by_owner[owner_id].add(skill_id)
+
+    def remove(self, skill_id: int):
+        """
+        Remove skill from the postings.
+        :param skill_id: id of skill in table.
+        """
+        found = self.by_skill.pop(skill_id, None)
+        if found is None:
+            return
+        key, entry = found
+        postings = self.by_key[key]
+        del postings[bisect_left(postings, entry)]
+        if not postings:
+            del self.by_key[key]
+        owner_skills = self.by_owner[entry[2]]
+        owner_skills.discard(skill_id)
+        if not owner_skills:
+            del self.by_owner[entry[2]]
+
+    def remove_owner(self, owner_id: int):
+        """
+        Remove all skills of candidate or job opening.
+        :param owner_id: id of candidate or job opening.
+        """
+        for skill_id in list(self.by_owner.get(owner_id, ())):
+            self.remove(skill_id)
+
+    def owner_skills(self, owner_id: int) -> List[Tuple[int, tuple]]:
+        """
+        Return all skills of candidate or job opening as (skill_id, entry).
+        """
+        return [self.by_skill[skill_id] for skill_id in self.by_owner.get(owner_id, ())]
+
+    def size(self, key: int) -> int:
+        return len(self.by_key.get(key, ()))
+
+    def at_least(self, key: int, level: int, years: int) -> Iterator[tuple]:
+        """
+        Entries of the skill, level >= level and years_of_experience >= years.
+        Every level block is entered with a binary search, so entries with too little experience are skipped.
+        """
+        postings = self.by_key.get(key, [])
+        i = bisect_left(postings, (level, years))
+        while i < len(postings):
+            current = postings[i][0]
+            if postings[i][1] < years:
+                i = bisect_left(postings, (current, years), i)
+                continue
+            end = bisect_left(postings, (current + 1,), i)
+            yield from postings[i:end]
+            i = end
+
+    def at_most(self, key: int, level: int, years: int) -> Iterator[tuple]:
+        """
+        Entries of the skill, level <= level and years_of_experience <= years.
+        """
+        postings = self.by_key.get(key, [])
+        i = 0
+        stop = bisect_left(postings, (level + 1,))
+        while i < stop:
+            current = postings[i][0]
+            end = bisect_left(postings, (current, years + 1), i, stop)
+            yield from postings[i:end]
+            i = bisect_left(postings, (current + 1,), end, stop)
+
+
+def paginate_scores(scores: Dict[int, int], sorting: str, lim: int, page: int,
+                    after: Tuple[int, int] | None = None) -> List[Tuple[int, int]]:
+    """
+    Order matched records by total score (ties by id) and cut the requested page.
+    Only lim * (page + 1) records are kept in the heap.
+    :param scores: dict {record id: total score}.
+    :param sorting: 'lower' - from less qualified, 'upper' - from more qualified.
+    :param lim: maximum number of records to be given.
+    :param page: group of records, ignored if after is passed.
+    :param after: cursor (total score, id) of the last record of the previous page, empty tuple - first page.
+    :return: List[Tuple[int, int]] - (record id, total score)
+    """
+    if after is not None:
+        page = 0
+    if after and sorting == 'lower':
+        scores = {record_id: score for record_id, score in scores.items() if (score, record_id) > after}
+    elif after:
+        scores = {record_id: score for record_id, score in scores.items() if (score, record_id) < after}
+
+    if sorting == 'lower':
+        ordered = heapq.nsmallest(lim * (page + 1), scores.items(), key=lambda item: (item[1], item[0]))
+    else:
+        ordered = heapq.nsmallest(lim * (page + 1), scores.items(), key=lambda item: (-item[1], -item[0]))
+    return ordered[lim * page:]
+
+
+def paginate_partial_scores(matches: Dict[int, Tuple[float, int]], sorting: str, lim: int, page: int
+                            ) -> List[Tuple[int, float, int]]:
+    """
+    Order partially matched records by coverage (from the highest), then by total score and id, and cut the page.
+    Only lim * (page + 1) records are kept in the heap however many records are matched.
+    :param matches: dict {record id: (coverage, total score)}.
+    :param sorting: 'lower' - from less qualified, 'upper' - from more qualified (among records with equal coverage).
+    :param lim: maximum number of records to be given.
+    :param page: group of records.
+    :return: List[Tuple[int, float, int]] - (record id, coverage, total score)
+    """
+    if sorting == 'lower':
+        ordered = heapq.nsmallest(lim * (page + 1), matches.items(),
+                                  key=lambda item: (-item[1][0], item[1][1], item[0]))
+    else:
+        ordered = heapq.nsmallest(lim * (page + 1), matches.items(),
+                                  key=lambda item: (-item[1][0], -item[1][1], -item[0]))
+    return [(record_id, coverage, score) for record_id, (coverage, score) in ordered[lim * page:]]
+
+
+# names of tables of candidates and their skills (arguments of changes are passed by table names)
+CANDIDATE_TABLES = (CandidatesDB.__tablename__, CandidatesSkillsDB.__tablename__)
+
+
+class ReplicatedSkillIndex(Replicated):
+    """
+    Changes of the skill index made by the write functions from core.db.request_db, they are applied
+    by apply_<change> in every worker (see ChangeFeed).
+    """
+    replica_name = "skill_index"
+
+    def add_skills(self, orm_table_class: Type[CandidatesSkillsDB | RequiredSkillsDB], rows: Iterable[tuple]):
+        """
+        Add new or updated skills to the index.
+        :param orm_table_class: table with skills from database.
+        :param rows: rows with columns from posting_columns.
+        """
+        if self.tracked:
+            self.change("add_skills", orm_table_class.__tablename__, [list(row) for row in rows])
+
+    def remove_skills(self, orm_table_class: Type[CandidatesSkillsDB | RequiredSkillsDB], skill_ids: Iterable[int]):
+        """
+        Remove skills from the index.
+        :param orm_table_class: table with skills from database.
+        :param skill_ids: ids of skills in table.
+        """
+        if self.tracked:
+            self.change("remove_skills", orm_table_class.__tablename__, list(skill_ids))
+
+    def remove_record(self, orm_table_class: Type[CandidatesDB | JobOpeningsDB], record_id: int):
+        """
+        Remove candidate or job opening with all its skills from the index.
+        :param orm_table_class: table from database.
+        :param record_id: id of record from database.
+        """
+        if self.tracked:
+            self.change("remove_record", orm_table_class.__tablename__, record_id)
+
+    def set_skills_quantity(self, job_id: int, quantity: int):
+        """
+        Save number of required skills of job opening.
+        """
+        if self.tracked:
+            self.change("set_skills_quantity", job_id, quantity)
+
+
+class SkillIndex(ReplicatedSkillIndex):
+    """
+    In-memory inverted index of candidates skills and required skills of job openings.
+    The index lives in the memory of every worker: it is built at startup and kept up to date by the write
+    functions from core.db.request_db, writes made by other workers come through the change feed.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.candidates = Postings()
+        self.required = Postings()
+        self.skills_quantity: Dict[int, int] = {}
+
+    def _postings(self, table_name: str) -> Postings:
+        return self.candidates if table_name in CANDIDATE_TABLES else self.required
+
+    async def build(self):
+        """
+        Load all skills from database into the index.
+        """
+        candidates, required, skills_quantity = Postings(), Postings(), {}
+        async with session() as ses:
+            for orm_table_class, postings in ((CandidatesSkillsDB, candidates), (RequiredSkillsDB, required)):
+                response = await ses.stream(select(*posting_columns(orm_table_class)))
+                postings.load([tuple(row) async for row in response])
+            response = await ses.stream(select(JobOpeningsDB.id, JobOpeningsDB.skills_quantity))
+            async for job_id, quantity in response:
+                skills_quantity[job_id] = quantity
+        self.candidates, self.required, self.skills_quantity = candidates, required, skills_quantity
+        self.ready = True
+
+    def apply_add_skills(self, table_name: str, rows: List[list]):
+        postings = self._postings(table_name)
+        for row in rows:
+            postings.add(*row)
+
+    def apply_remove_skills(self, table_name: str, skill_ids: List[int]):
+        postings = self._postings(table_name)
+        for skill_id in skill_ids:
+            postings.remove(skill_id)
+
+    def apply_remove_record(self, table_name: str, record_id: int):
+        self._postings(table_name).remove_owner(record_id)
+        if table_name == JobOpeningsDB.__tablename__:
+            self.skills_quantity.pop(record_id, None)
+
+    def apply_set_skills_quantity(self, job_id: int, quantity: int):
+        self.skills_quantity[job_id] = quantity
+
+    def match_candidates(self, job_id: int) -> Dict[int, int]:
+        """
+        Candidates who have every required skill of the job opening.
+        Candidates are taken from the smallest posting list and only they are checked against other requirements.
+        :param job_id: id of job opening.
+        :return: dict {candidate id: sum of scores of matched candidate skills}
+        """
+        requirements = self.required.owner_skills(job_id)
+        quantity = self.skills_quantity.get(job_id, 0)
+        if not requirements or not quantity:
+            return {}
+        key, (level, years, *_) = min(requirements, key=lambda requirement: self.candidates.size(requirement[0]))
+        owners = {entry[2] for entry in self.candidates.at_least(key, level, years)}
+
+        scores = {}
+        for owner_id in owners:
+            count, total_score = 0, 0
+            skills = self.candidates.owner_skills(owner_id)
+            for required_key, (required_level, required_years, *_) in requirements:
+                for skill_key, (skill_level, skill_years, _, _, skill_score) in skills:
+                    if skill_key == required_key and skill_level >= required_level and \
+                            skill_years >= required_years:
+                        count += 1
+                        total_score += skill_score
+            if count == quantity:
+                scores[owner_id] = total_score
+        return scores
+
+    def match_job_openings(self, candidate_id: int) -> Dict[int, int]:
+        """
+        Job openings whose every required skill is covered by skills of the candidate.
+        :param candidate_id: id of candidate.
+        :return: dict {job opening id: sum of scores of matched required skills}
+        """
+        counts, scores = defaultdict(int), defaultdict(int)
+        for key, (level, years, *_) in self.candidates.owner_skills(candidate_id):
+            for _, _, job_id, _, score in self.required.at_most(key, level, years):
+                counts[job_id] += 1
+                scores[job_id] += score
+        return {
+            job_id: score for job_id, score in scores.items() if counts[job_id] == self.skills_quantity.get(job_id)
+        }
+
+    def select(self, record_id: int, orm_table_for_search: Type[CandidatesDB | JobOpeningsDB], sorting: str,
+               lim: int, page: int, after: Tuple[int, int] | None = None) -> List[Tuple[int, int]]:
+        """
+        Selection of relevant candidates or job openings.
+        :param record_id: id of record for which the selection will be made.
+        :param orm_table_for_search: the table with the record to be searched for.
+        :param sorting: sorting parameter.
+        :param lim: maximum number of records to be given.
+        :param page: group of records.
+        :param after: cursor (total score, id) of the last record of the previous page.
+        :return: List[Tuple[int, int]] - (record id, total score)
+        """
+        if orm_table_for_search is CandidatesDB:
+            scores = self.match_candidates(record_id)
+        else:
+            scores = self.match_job_openings(record_id)
+        return paginate_scores(scores=scores, sorting=sorting, lim=lim, page=page, after=after)
+
+    def match_candidates_partial(self, job_id: int) -> Dict[int, Tuple[float, int]]:
+        """
+        Candidates who have at least one required skill of the job opening.
+        :param job_id: id of job opening.
+        :return: dict {candidate id: (share of matched requirements, sum of scores of matched candidate skills)}
+        """
+        quantity = self.skills_quantity.get(job_id, 0)
+        if not quantity:
+            return {}
+        counts, scores = defaultdict(int), defaultdict(int)
+        for key, (level, years, *_) in self.required.owner_skills(job_id):
+            for _, _, owner_id, _, score in self.candidates.at_least(key, level, years):
+                counts[owner_id] += 1
+                scores[owner_id] += score
+        return {owner_id: (count / quantity, scores[owner_id]) for owner_id, count in counts.items()}
+
+    def match_job_openings_partial(self, candidate_id: int) -> Dict[int, Tuple[float, int]]:
+        """
+        Job openings with at least one required skill covered by skills of the candidate.
+        :param candidate_id: id of candidate.
+        :return: dict {job opening id: (share of matched requirements, sum of scores of matched required skills)}
+        """
+        counts, scores = defaultdict(int), defaultdict(int)
+        for key, (level, years, *_) in self.candidates.owner_skills(candidate_id):
+            for _, _, job_id, _, score in self.required.at_most(key, level, years):
+                counts[job_id] += 1
+                scores[job_id] += score
+        return {
+            job_id: (count / self.skills_quantity[job_id], scores[job_id])
+            for job_id, count in counts.items() if self.skills_quantity.get(job_id)
+        }
+
+    def select_partial(self, record_id: int, orm_table_for_search: Type[CandidatesDB | JobOpeningsDB], sorting: str,
+                       lim: int, page: int) -> List[Tuple[int, float, int]]:
+        """
+        Selection of candidates or job openings which match the requirements partially.
+        :param record_id: id of record for which the selection will be made.
+        :param orm_table_for_search: the table with the record to be searched for.
+        :param sorting: sorting parameter.
+        :param lim: maximum number of records to be given.
+        :param page: group of records.
+        :return: List[Tuple[int, float, int]] - (record id, coverage, total score)
+        """
+        if orm_table_for_search is CandidatesDB:
+            matches = self.match_candidates_partial(record_id)
+        else:
+            matches = self.match_job_openings_partial(record_id)
+        return paginate_partial_scores(matches=matches, sorting=sorting, lim=lim, page=page)
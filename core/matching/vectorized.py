@@ -0,0 +1,346 @@
+from typing import Dict, Iterable, List, Tuple, Type
+
+import numpy as np
+from sqlalchemy import select
+
+from core.db.database import CandidatesDB, CandidatesSkillsDB, JobOpeningsDB, RequiredSkillsDB, session
+from core.matching.inverted_index import CANDIDATE_TABLES, ReplicatedSkillIndex, paginate_partial_scores, \
+    posting_columns
+
+ABSENT = -1
+
+
+class SkillMatrix:
+    """
+    Skills of one table as dense arrays: a row for every skill (id from the table skills), a column for every
+    candidate or job opening.
+    Cells hold level (ABSENT if the owner doesn't have the skill), years_of_experience and score.
+    One cell keeps one skill: an owner has every skill once (unique constraint of foreign_key and skill_id
+    of the skills tables), cell_skills tells which skill holds the cell, so removal of a replaced skill doesn't
+    clear it.
+    This is the only difference from the SQL engine, which counts and sums every pair of repeated skills:
+    the application doesn't start on a database with them (see add_unique_skills).
+    """
+
+    def __init__(self, vocabulary: Dict[int, int]):
+        self.vocabulary = vocabulary
+        self.columns: Dict[int, int] = {}
+        self.cells: Dict[int, Tuple[int, int]] = {}
+        self.cell_skills: Dict[Tuple[int, int], int] = {}
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.level = np.full((0, 0), ABSENT, dtype=np.int16)
+        self.years = np.zeros((0, 0), dtype=np.int32)
+        self.score = np.zeros((0, 0), dtype=np.int64)
+        self.quantity = np.zeros(0, dtype=np.int64)
+
+    @property
+    def size(self) -> int:
+        return len(self.columns)
+
+    def _reserve(self, rows: int, columns: int):
+        """
+        Grow arrays (capacity is doubled) to hold the transmitted number of rows and columns.
+        """
+        old_rows, old_columns = self.level.shape
+        if rows <= old_rows and columns <= old_columns:
+            return
+        new_rows = max(rows, old_rows * 2 if rows > old_rows else old_rows, 8)
+        new_columns = max(columns, old_columns * 2 if columns > old_columns else old_columns, 64)
+
+        level = np.full((new_rows, new_columns), ABSENT, dtype=np.int16)
+        years = np.zeros((new_rows, new_columns), dtype=np.int32)
+        score = np.zeros((new_rows, new_columns), dtype=np.int64)
+        level[:old_rows, :old_columns] = self.level
+        years[:old_rows, :old_columns] = self.years
+        score[:old_rows, :old_columns] = self.score
+        self.level, self.years, self.score = level, years, score
+
+        ids = np.zeros(new_columns, dtype=np.int64)
+        ids[:old_columns] = self.ids
+        quantity = np.zeros(new_columns, dtype=np.int64)
+        quantity[:old_columns] = self.quantity
+        self.ids, self.quantity = ids, quantity
+
+    def row(self, key: int) -> int:
+        if key not in self.vocabulary:
+            self.vocabulary[key] = len(self.vocabulary)
+        return self.vocabulary[key]
+
+    def column(self, owner_id: int) -> int:
+        if owner_id not in self.columns:
+            self._reserve(len(self.vocabulary), self.size + 1)
+            self.columns[owner_id] = self.size
+            self.ids[self.columns[owner_id]] = owner_id
+        return self.columns[owner_id]
+
+    def load(self, rows: Iterable[tuple]):
+        """
+        Fill empty matrix with rows (id, foreign_key, skill_id, level, years_of_experience, score).
+        :param rows: rows from skills table.
+        """
+        skill_ids, row_numbers, column_numbers, levels, years, scores = [], [], [], [], [], []
+        for skill_id, owner_id, key, level, years_of_experience, score in rows:
+            row_number = self.row(key)
+            if owner_id not in self.columns:
+                self.columns[owner_id] = len(self.columns)
+            skill_ids.append(skill_id)
+            row_numbers.append(row_number)
+            column_numbers.append(self.columns[owner_id])
+            levels.append(level)
+            years.append(years_of_experience)
+            scores.append(score)
+
+        self._reserve(len(self.vocabulary), self.size)
+        self.ids[list(self.columns.values())] = list(self.columns)
+        self.level[row_numbers, column_numbers] = levels
+        self.years[row_numbers, column_numbers] = years
+        self.score[row_numbers, column_numbers] = scores
+        self.cells = dict(zip(skill_ids, zip(row_numbers, column_numbers)))
+        self.cell_skills = {cell: skill_id for skill_id, cell in self.cells.items()}
+
+    def add(self, skill_id: int, owner_id: int, key: int, level: int, years: int, score: int):
+        """
+        Add skill to the matrix (previous version of this skill and a skill in the same cell are replaced).
+        """
+        self.remove(skill_id)
+        row_number, column_number = self.row(key), self.column(owner_id)
+        self._reserve(len(self.vocabulary), self.size)
+        self.level[row_number, column_number] = level
+        self.years[row_number, column_number] = years
+        self.score[row_number, column_number] = score
+        replaced = self.cell_skills.get((row_number, column_number))
+        if replaced is not None:
+            del self.cells[replaced]
+        self.cells[skill_id] = (row_number, column_number)
+        self.cell_skills[(row_number, column_number)] = skill_id
+
+    def remove(self, skill_id: int):
+        """
+        Remove skill from the matrix.
+        :param skill_id: id of skill in table.
+        """
+        cell = self.cells.pop(skill_id, None)
+        if cell is not None:
+            self.level[cell] = ABSENT
+            del self.cell_skills[cell]
+
+    def remove_owner(self, owner_id: int):
+        """
+        Remove all skills of candidate or job opening, its column stays empty.
+        :param owner_id: id of candidate or job opening.
+        """
+        column_number = self.columns.get(owner_id)
+        if column_number is None:
+            return
+        self.level[:, column_number] = ABSENT
+        self.quantity[column_number] = 0
+        self.cells = {skill_id: cell for skill_id, cell in self.cells.items() if cell[1] != column_number}
+        self.cell_skills = {cell: skill_id for skill_id, cell in self.cells.items()}
+
+    def owner_rows(self, owner_id: int) -> np.ndarray:
+        """
+        Rows of skills of candidate or job opening.
+        """
+        column_number = self.columns.get(owner_id)
+        if column_number is None:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(self.level[:len(self.vocabulary), column_number] != ABSENT)
+
+
+def top_scores(ids: np.ndarray, scores: np.ndarray, sorting: str, lim: int, page: int,
+               after: Tuple[int, int] | None = None) -> List[Tuple[int, int]]:
+    """
+    Order matched records by total score (ties by id) and cut the requested page.
+    Only records not worse than the k-th one (found by argpartition) are sorted.
+    :param ids: ids of matched records.
+    :param scores: total scores of matched records.
+    :param sorting: 'lower' - from less qualified, 'upper' - from more qualified.
+    :param lim: maximum number of records to be given.
+    :param page: group of records, ignored if after is passed.
+    :param after: cursor (total score, id) of the last record of the previous page, empty tuple - first page.
+    :return: List[Tuple[int, int]] - (record id, total score)
+    """
+    if after is not None:
+        page = 0
+    if after:
+        after_score, after_id = after
+        if sorting == 'lower':
+            keep = (scores > after_score) | ((scores == after_score) & (ids > after_id))
+        else:
+            keep = (scores < after_score) | ((scores == after_score) & (ids < after_id))
+        ids, scores = ids[keep], scores[keep]
+
+    # both keys are ascending for 'lower', for 'upper' they are negated
+    keys, tie_keys = (scores, ids) if sorting == 'lower' else (-scores, -ids)
+    k = lim * (page + 1)
+    if len(keys) > k:
+        threshold = keys[np.argpartition(keys, k - 1)[k - 1]]
+        candidates = np.flatnonzero(keys <= threshold)
+        keys, tie_keys, ids, scores = keys[candidates], tie_keys[candidates], ids[candidates], scores[candidates]
+    order = np.lexsort((tie_keys, keys))[lim * page:k]
+    return list(zip(ids[order].tolist(), scores[order].tolist()))
+
+
+class SkillMatrixIndex(ReplicatedSkillIndex):
+    """
+    Matching engine with vectorized comparisons over dense skill matrices of candidates and job openings.
+    Like SkillIndex it lives in the memory of every worker and has the same interface.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.vocabulary: Dict[int, int] = {}
+        self.candidates = SkillMatrix(self.vocabulary)
+        self.required = SkillMatrix(self.vocabulary)
+
+    def _matrix(self, table_name: str) -> SkillMatrix:
+        return self.candidates if table_name in CANDIDATE_TABLES else self.required
+
+    async def build(self):
+        """
+        Load all skills from database into the matrices.
+        """
+        async with session() as ses:
+            await self.load(ses)
+
+    async def load(self, ses):
+        """
+        Load all skills into the matrices through the opened session (or connection).
+        :param ses: AsyncSession or AsyncConnection.
+        """
+        vocabulary = {}
+        candidates, required = SkillMatrix(vocabulary), SkillMatrix(vocabulary)
+        for orm_table_class, matrix in ((CandidatesSkillsDB, candidates), (RequiredSkillsDB, required)):
+            response = await ses.stream(select(*posting_columns(orm_table_class)))
+            matrix.load([tuple(row) async for row in response])
+        response = await ses.stream(select(JobOpeningsDB.id, JobOpeningsDB.skills_quantity))
+        async for job_id, quantity in response:
+            required.quantity[required.column(job_id)] = quantity
+        for matrix in (candidates, required):
+            matrix._reserve(len(vocabulary), matrix.size)
+        self.vocabulary, self.candidates, self.required = vocabulary, candidates, required
+        self.ready = True
+
+    def apply_add_skills(self, table_name: str, rows: List[list]):
+        matrix = self._matrix(table_name)
+        for row in rows:
+            matrix.add(*row)
+        # every matrix has a row for every skill
+        for other in (self.candidates, self.required):
+            other._reserve(len(self.vocabulary), other.size)
+
+    def apply_remove_skills(self, table_name: str, skill_ids: List[int]):
+        matrix = self._matrix(table_name)
+        for skill_id in skill_ids:
+            matrix.remove(skill_id)
+
+    def apply_remove_record(self, table_name: str, record_id: int):
+        self._matrix(table_name).remove_owner(record_id)
+
+    def apply_set_skills_quantity(self, job_id: int, quantity: int):
+        self.required.quantity[self.required.column(job_id)] = quantity
+
+    def match_candidates(self, job_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Candidates who have every required skill of the job opening: one comparison over all candidates
+        for every requirement, the total score is a masked sum of rows of candidates scores.
+        :param job_id: id of job opening.
+        :return: (ids of candidates, sums of scores of matched candidate skills)
+        """
+        rows = self.required.owner_rows(job_id)
+        column_number = self.required.columns.get(job_id)
+        size = self.candidates.size
+        if not len(rows) or self.required.quantity[column_number] != len(rows) or not size:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        required_level = self.required.level[rows, column_number][:, None]
+        required_years = self.required.years[rows, column_number][:, None]
+        fits = (self.candidates.level[rows, :size] >= required_level) & \
+               (self.candidates.years[rows, :size] >= required_years)
+        mask = fits.all(axis=0)
+        total = self.candidates.score[rows, :size][:, mask].sum(axis=0)
+        return self.candidates.ids[:size][mask], total
+
+    def match_job_openings(self, candidate_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Job openings whose every required skill is covered by skills of the candidate.
+        Only rows of skills of the candidate are compared, over all job openings at once.
+        :param candidate_id: id of candidate.
+        :return: (ids of job openings, sums of scores of matched required skills)
+        """
+        rows = self.candidates.owner_rows(candidate_id)
+        column_number = self.candidates.columns.get(candidate_id)
+        size = self.required.size
+        if not len(rows) or not size:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        candidate_level = self.candidates.level[rows, column_number][:, None]
+        candidate_years = self.candidates.years[rows, column_number][:, None]
+        required_level = self.required.level[rows, :size]
+        fits = (required_level != ABSENT) & (required_level <= candidate_level) & \
+               (self.required.years[rows, :size] <= candidate_years)
+        quantity = self.required.quantity[:size]
+        mask = (fits.sum(axis=0) == quantity) & (quantity > 0)
+        total = np.where(fits, self.required.score[rows, :size], 0).sum(axis=0)
+        return self.required.ids[:size][mask], total[mask]
+
+    def select(self, record_id: int, orm_table_for_search: Type[CandidatesDB | JobOpeningsDB], sorting: str,
+               lim: int, page: int, after: Tuple[int, int] | None = None) -> List[Tuple[int, int]]:
+        """
+        Selection of relevant candidates or job openings.
+        :param record_id: id of record for which the selection will be made.
+        :param orm_table_for_search: the table with the record to be searched for.
+        :param sorting: sorting parameter.
+        :param lim: maximum number of records to be given.
+        :param page: group of records.
+        :param after: cursor (total score, id) of the last record of the previous page.
+        :return: List[Tuple[int, int]] - (record id, total score)
+        """
+        if orm_table_for_search is CandidatesDB:
+            ids, scores = self.match_candidates(record_id)
+        else:
+            ids, scores = self.match_job_openings(record_id)
+        return top_scores(ids=ids, scores=scores, sorting=sorting, lim=lim, page=page, after=after)
+
+    def select_partial(self, record_id: int, orm_table_for_search: Type[CandidatesDB | JobOpeningsDB], sorting: str,
+                       lim: int, page: int) -> List[Tuple[int, float, int]]:
+        """
+        Selection of candidates or job openings which match the requirements partially.
+        Matched requirements are counted by one comparison over all columns, only records with at least one
+        matched requirement go to the bounded heap.
+        :param record_id: id of record for which the selection will be made.
+        :param orm_table_for_search: the table with the record to be searched for.
+        :param sorting: sorting parameter.
+        :param lim: maximum number of records to be given.
+        :param page: group of records.
+        :return: List[Tuple[int, float, int]] - (record id, coverage, total score)
+        """
+        if orm_table_for_search is CandidatesDB:
+            rows = self.required.owner_rows(record_id)
+            column_number = self.required.columns.get(record_id)
+            size = self.candidates.size
+            if not len(rows) or not self.required.quantity[column_number] or not size:
+                return []
+            fits = (self.candidates.level[rows, :size] >= self.required.level[rows, column_number][:, None]) & \
+                   (self.candidates.years[rows, :size] >= self.required.years[rows, column_number][:, None])
+            quantity = self.required.quantity[column_number]
+            scores, ids = self.candidates.score[rows, :size], self.candidates.ids[:size]
+        else:
+            rows = self.candidates.owner_rows(record_id)
+            column_number = self.candidates.columns.get(record_id)
+            size = self.required.size
+            if not len(rows) or not size:
+                return []
+            required_level = self.required.level[rows, :size]
+            fits = (required_level != ABSENT) & \
+                   (required_level <= self.candidates.level[rows, column_number][:, None]) & \
+                   (self.required.years[rows, :size] <= self.candidates.years[rows, column_number][:, None])
+            quantity = self.required.quantity[:size]
+            scores, ids = self.required.score[rows, :size], self.required.ids[:size]
+
+        counts = fits.sum(axis=0)
+        mask = (counts > 0) & (quantity > 0)
+        coverage = counts / np.where(quantity > 0, quantity, 1)
+        total = np.where(fits, scores, 0).sum(axis=0)
+        matches = dict(zip(ids[mask].tolist(), zip(coverage[mask].tolist(), total[mask].tolist())))
+        return paginate_partial_scores(matches=matches, sorting=sorting, lim=lim, page=page)
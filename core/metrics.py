@@ -0,0 +1,199 @@
+import re
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+UNMATCHED_ROUTE = "<unmatched>"
+
+# scope of the current request, its route is known after routing
+request_scope: ContextVar[Scope | None] = ContextVar("request_scope", default=None)
+
+
+class Histogram:
+    """
+    Cumulative histogram of observations in the Prometheus format (counts are made cumulative on export).
+    """
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self, name: str, labels: str) -> Iterable[str]:
+        total = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            total += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {total}'
+        yield f"{name}_sum{{{labels}}} {self.sum}"
+        yield f"{name}_count{{{labels}}} {total}"
+
+
+def route_of(scope: Scope) -> str:
+    route = scope.get("route")
+    return route.path if route is not None else UNMATCHED_ROUTE
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def labels(**values: str) -> str:
+    return ",".join(f'{name}="{escape(str(value))}"' for name, value in values.items())
+
+
+@lru_cache(maxsize=2048)
+def statement_label(statement: str) -> str:
+    """
+    Low-cardinality name of the statement: its kind and the first table, e.g. 'SELECT candidates'
+    (a statement with CTEs is named by its first data-modifying part).
+    """
+    kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+    if kind == "WITH":
+        modifying = re.search(r"\b(INSERT|UPDATE|DELETE)\b", statement, re.IGNORECASE)
+        kind = modifying.group(1).upper() if modifying else "SELECT"
+    table = re.search(r'\b(?:FROM|INTO|UPDATE)\s+"?(\w+)', statement, re.IGNORECASE)
+    return f"{kind} {table.group(1)}" if table else kind
+
+
+class Metrics:
+    """
+    Latency of requests by route, requests in flight and duration of SQL statements by route and statement.
+    Observations are plain dict and list updates in the event loop, so collecting them costs microseconds.
+    """
+
+    def __init__(self):
+        self.requests: Dict[Tuple[str, str, int], Histogram] = {}
+        self.statements: Dict[Tuple[str, str], Histogram] = {}
+        self.statement_errors: Dict[Tuple[str, str], int] = {}
+        self.in_flight: Dict[int, Scope] = {}
+
+    def observe_request(self, scope: Scope, status: int, duration: float):
+        key = (scope["method"], route_of(scope), status)
+        histogram = self.requests.get(key)
+        if histogram is None:
+            histogram = self.requests[key] = Histogram(REQUEST_BUCKETS)
+        histogram.observe(duration)
+
+    def observe_statement(self, statement: str, duration: float):
+        scope = request_scope.get()
+        key = (route_of(scope) if scope is not None else "", statement_label(statement))
+        histogram = self.statements.get(key)
+        if histogram is None:
+            histogram = self.statements[key] = Histogram(STATEMENT_BUCKETS)
+        histogram.observe(duration)
+
+    def count_statement_error(self, statement: str):
+        scope = request_scope.get()
+        key = (route_of(scope) if scope is not None else "", statement_label(statement))
+        self.statement_errors[key] = self.statement_errors.get(key, 0) + 1
+
+    def instrument(self, engine: AsyncEngine):
+        """
+        Time every statement executed by the engine.
+        """
+        @event.listens_for(engine.sync_engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            context.metrics_started = time.perf_counter()
+
+        @event.listens_for(engine.sync_engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            self.observe_statement(statement, time.perf_counter() - context.metrics_started)
+
+        @event.listens_for(engine.sync_engine, "handle_error")
+        def handle_error(exception_context):
+            if exception_context.statement is not None:
+                self.count_statement_error(exception_context.statement)
+
+    def export(self, cache_stats: Dict[str, Dict[str, Dict[str, int]]]) -> str:
+        """
+        All metrics in the Prometheus text format.
+        :param cache_stats: hits, misses and bytes of cache tiers by namespace (TwoTierBackend.stats()).
+        """
+        lines: List[str] = [
+            "# HELP http_request_duration_seconds Latency of requests by route.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route, status), histogram in list(self.requests.items()):
+            lines.extend(histogram.samples(
+                "http_request_duration_seconds", labels(method=method, route=route, status=status)
+            ))
+
+        lines += ["# HELP http_requests_in_flight Requests being processed by route.",
+                  "# TYPE http_requests_in_flight gauge"]
+        in_flight: Dict[Tuple[str, str], int] = {}
+        for scope in list(self.in_flight.values()):
+            key = (scope["method"], route_of(scope))
+            in_flight[key] = in_flight.get(key, 0) + 1
+        for (method, route), count in in_flight.items():
+            lines.append(f"http_requests_in_flight{{{labels(method=method, route=route)}}} {count}")
+
+        lines += ["# HELP db_statement_duration_seconds Duration of SQL statements by route and statement.",
+                  "# TYPE db_statement_duration_seconds histogram"]
+        for (route, statement), histogram in list(self.statements.items()):
+            lines.extend(histogram.samples(
+                "db_statement_duration_seconds", labels(route=route, statement=statement)
+            ))
+        lines += ["# HELP db_statement_errors_total Failed SQL statements by route and statement.",
+                  "# TYPE db_statement_errors_total counter"]
+        for (route, statement), count in list(self.statement_errors.items()):
+            lines.append(f"db_statement_errors_total{{{labels(route=route, statement=statement)}}} {count}")
+
+        for outcome, help_text in (("hits", "Cache hits"), ("misses", "Cache misses"),
+                                   ("bytes", "Bytes of cached responses served")):
+            name = f"cache_{outcome}_total"
+            lines += [f"# HELP {name} {help_text} by namespace and tier.", f"# TYPE {name} counter"]
+            for namespace, tiers in cache_stats.items():
+                if namespace == "total":
+                    continue
+                for tier, counters in tiers.items():
+                    lines.append(f"{name}{{{labels(namespace=namespace, tier=tier)}}} {counters[outcome]}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware which measures latency of HTTP requests and keeps track of requests in flight.
+    It is a plain ASGI middleware (not BaseHTTPMiddleware) to avoid extra tasks and streams per request.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        token = request_scope.set(scope)
+        metrics.in_flight[id(scope)] = scope
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            del metrics.in_flight[id(scope)]
+            request_scope.reset(token)
+            metrics.observe_request(scope, status, time.perf_counter() - started)
@@ -6,6 +6,12 @@ from .crud_job_openings import router as router5
 from .rud_candidates_skills import router as router6
 from .rud_job_openings_skills import router as router7
 from .selection_of_candidates_and_job_openings import router as router8
+from .bulk_import import router as router9
+from .cache_stats import router as router10
+from .metrics import router as router11
+from .slow_queries import router as router12
+from .skill_suggestions import router as router13
+from .selection_jobs import router as router14
 
 
 routers_set = (
@@ -17,4 +23,10 @@ routers_set = (
     router6,
     router7,
     router8,
+    router9,
+    router10,
+    router11,
+    router12,
+    router13,
+    router14,
 )
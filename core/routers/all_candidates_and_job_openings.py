@@ -1,33 +1,212 @@
-from typing import List
+import csv
+import json
+from io import StringIO
+from typing import AsyncIterator, List, Type
 
 from fastapi import APIRouter, Depends
-from fastapi_cache.decorator import cache
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 
-from core.db.request_db import get_model_db
-from core.db.database import CandidatesDB, JobOpeningsDB
-from core.schemas import GetCandidates, GetJobOpenings, Pagination
+from core.cache.conditional import cache
+from core.cache.invalidation import cache_if_repeated, skip_caching
+from core.config import CACHE_EXPIRE, CACHE_FILTERED_PAGES, EXPORT_CHUNK_SIZE
+from core.db.request_db import get_rows_db, search_rows_db, stream_records_db
+from core.db.database import CandidatesDB, CandidatesSkillsDB, JobOpeningsDB, RequiredSkillsDB
+from core.schemas import GetCandidates, GetJobOpenings, Pagination, CursorPage, decode_cursor, cursor_page, \
+    fetch_limit, Export, EnumExportFormat, Search, CandidatesFilter, JobOpeningsFilter
+from core.custom_exceptions import raise_exception
+from core.serialization import RawJSONCoder, RawJSONResponse, json_response, response_fields
 
 
 router = APIRouter(tags=["Get all candidates and job openings"])
 
+MEDIA_TYPES = {EnumExportFormat.ndjson: "application/x-ndjson", EnumExportFormat.csv: "text/csv"}
+# header of search pages computed from a part of the matches (SEARCH_RANK_LIMIT)
+TRUNCATED_HEADER = "X-Search-Truncated"
 
-@router.get("/candidates", response_model=List[GetCandidates])
-@cache(1, namespace="all_candidates_with_pagination")
-async def get_all_candidates(pagination: Pagination = Depends()) -> List[GetCandidates]:
+
+async def export_file(orm_table_class: Type[CandidatesDB | JobOpeningsDB],
+                      foreign_orm_table_class: Type[CandidatesSkillsDB | RequiredSkillsDB], schema: Type[BaseModel],
+                      file_format: EnumExportFormat) -> AsyncIterator[bytes]:
+    """
+    Serialize all records of the table chunk by chunk.
+    In csv the skills of a record are written to one column as json array.
+    :param orm_table_class: table from database.
+    :param foreign_orm_table_class: related table from database.
+    :param schema: schema of one record.
+    :param file_format: ndjson or csv.
+    :return: AsyncIterator[bytes]
+    """
+    fields = list(schema.model_fields)
+    if file_format is EnumExportFormat.csv:
+        buffer = StringIO()
+        csv.writer(buffer).writerow(fields)
+        yield buffer.getvalue().encode()
+
+    async for records in stream_records_db(orm_table_class=orm_table_class,
+                                           foreign_orm_table_class=foreign_orm_table_class,
+                                           chunk_size=EXPORT_CHUNK_SIZE):
+        if file_format is EnumExportFormat.csv:
+            buffer = StringIO()
+            writer = csv.writer(buffer)
+            for record in records:
+                data = schema.model_validate(record).model_dump(mode="json")
+                data["skills"] = json.dumps(data["skills"])
+                writer.writerow([data[field] for field in fields])
+            yield buffer.getvalue().encode()
+        else:
+            yield b"".join(schema.model_validate(record).model_dump_json().encode() + b"\n" for record in records)
+
+
+async def records_page(orm_table_class: Type[CandidatesDB | JobOpeningsDB],
+                       foreign_orm_table_class: Type[CandidatesSkillsDB | RequiredSkillsDB], schema: Type[BaseModel],
+                       pagination: Pagination, filters: BaseModel) -> RawJSONResponse:
+    """
+    Page of records serialized without ORM objects and revalidation against response_model.
+    Filtered pages are cached only if they are among the first CACHE_FILTERED_PAGES pages and were requested
+    recently, so the number of cache keys doesn't grow with the number of filter combinations.
+    :param orm_table_class: table from database.
+    :param foreign_orm_table_class: related table from database.
+    :param schema: schema of one record.
+    :param pagination: class with information that used for pagination.
+    :param filters: values of filters, None - the filter isn't used.
+    :return: RawJSONResponse
+    """
+    after = decode_cursor(pagination.after, size=1)
+    filter_values = filters.model_dump(exclude_none=True)
+    if filter_values:
+        if after or (after is None and pagination.page >= CACHE_FILTERED_PAGES):
+            skip_caching()
+        else:
+            cache_if_repeated()
+    fields, skill_fields = response_fields(schema)
+    records = await get_rows_db(orm_table_class=orm_table_class, foreign_orm_table_class=foreign_orm_table_class,
+                                fields=fields, skill_fields=skill_fields, lim=fetch_limit(pagination.limit, after),
+                                page=pagination.page, after=after, filters=filter_values)
+    if after is None:
+        return json_response(records)
+    return json_response(cursor_page(items=records, limit=pagination.limit, last_values=lambda record: (record["id"],)))
+
+
+@router.get("/candidates", response_model=List[GetCandidates] | CursorPage[GetCandidates])
+@cache(CACHE_EXPIRE, namespace="all_candidates_with_pagination", coder=RawJSONCoder)
+async def get_all_candidates(pagination: Pagination = Depends(),
+                             filters: CandidatesFilter = Depends()) -> RawJSONResponse:
     """
     Return all candidates from database with pagination.
-    :param pagination: class with information that used for pagination
-    :return: List[GetCandidates]
+    :param pagination: class with information that used for pagination, with 'after' the page and the cursor
+    for the next page are returned.
+    :param filters: only candidates with these values of city, status, education degree, publication
+    and desired position.
+    :return: RawJSONResponse
     """
-    return await get_model_db(orm_table_class=CandidatesDB, lim=pagination.limit, page=pagination.page)
+    return await records_page(orm_table_class=CandidatesDB, foreign_orm_table_class=CandidatesSkillsDB,
+                              schema=GetCandidates, pagination=pagination, filters=filters)
 
 
-@router.get("/job-openings", response_model=List[GetJobOpenings])
-@cache(1, namespace="all_job_openings_with_pagination")
-async def get_job_openings(pagination: Pagination = Depends()) -> List[GetJobOpenings]:
+@router.get("/job-openings", response_model=List[GetJobOpenings] | CursorPage[GetJobOpenings])
+@cache(CACHE_EXPIRE, namespace="all_job_openings_with_pagination", coder=RawJSONCoder)
+async def get_job_openings(pagination: Pagination = Depends(),
+                           filters: JobOpeningsFilter = Depends()) -> RawJSONResponse:
     """
     Return all job openings from database with pagination.
+    :param pagination: class with information that used for pagination, with 'after' the page and the cursor
+    for the next page are returned.
+    :param filters: only job openings with salary in the range and with this address.
+    :return: RawJSONResponse
+    """
+    if filters.salary_from is not None and filters.salary_to is not None and filters.salary_from > filters.salary_to:
+        raise_exception(info="salary_from must not be greater than salary_to")
+    return await records_page(orm_table_class=JobOpeningsDB, foreign_orm_table_class=RequiredSkillsDB,
+                              schema=GetJobOpenings, pagination=pagination, filters=filters)
+
+
+async def search_page(orm_table_class: Type[CandidatesDB | JobOpeningsDB],
+                      foreign_orm_table_class: Type[CandidatesSkillsDB | RequiredSkillsDB], schema: Type[BaseModel],
+                      search: Search, pagination: Pagination) -> RawJSONResponse:
+    """
+    Page of found records serialized and cached like filtered pages of records_page.
+    If not all matches were ranked (SEARCH_RANK_LIMIT), the page has the header X-Search-Truncated
+    and it isn't cached.
+    :param orm_table_class: table from database.
+    :param foreign_orm_table_class: related table from database.
+    :param schema: schema of one record.
+    :param search: text of the query.
     :param pagination: class with information that used for pagination.
-    :return: List[GetCandidates]
+    :return: RawJSONResponse
+    """
+    if pagination.after is not None:
+        raise_exception(info="after isn't supported in search, use page")
+    if pagination.page >= CACHE_FILTERED_PAGES:
+        skip_caching()
+    else:
+        cache_if_repeated()
+    fields, skill_fields = response_fields(schema)
+    records, truncated = await search_rows_db(
+        orm_table_class=orm_table_class, foreign_orm_table_class=foreign_orm_table_class, fields=fields,
+        skill_fields=skill_fields, search_query=search.q, lim=pagination.limit, page=pagination.page
+    )
+    response = json_response(records)
+    if truncated:
+        skip_caching()
+        response.headers[TRUNCATED_HEADER] = "true"
+    return response
+
+
+@router.get("/candidates/search", response_model=List[GetCandidates])
+@cache(CACHE_EXPIRE, namespace="candidates_search", coder=RawJSONCoder)
+async def search_candidates(search: Search = Depends(), pagination: Pagination = Depends()) -> RawJSONResponse:
+    """
+    Return candidates whose desired position, working experience or information about oneself match the query,
+    the most relevant first (the desired position weighs the most). The header X-Search-Truncated means
+    that only SEARCH_RANK_LIMIT matches were ranked.
+    :param search: text of the query.
+    :param pagination: class with information that used for pagination.
+    :return: RawJSONResponse
+    """
+    return await search_page(orm_table_class=CandidatesDB, foreign_orm_table_class=CandidatesSkillsDB,
+                             schema=GetCandidates, search=search, pagination=pagination)
+
+
+@router.get("/job-openings/search", response_model=List[GetJobOpenings])
+@cache(CACHE_EXPIRE, namespace="job_openings_search", coder=RawJSONCoder)
+async def search_job_openings(search: Search = Depends(), pagination: Pagination = Depends()) -> RawJSONResponse:
+    """
+    Return job openings whose title or description match the query, the most relevant first
+    (the title weighs more). The header X-Search-Truncated means that only SEARCH_RANK_LIMIT matches were ranked.
+    :param search: text of the query.
+    :param pagination: class with information that used for pagination.
+    :return: RawJSONResponse
+    """
+    return await search_page(orm_table_class=JobOpeningsDB, foreign_orm_table_class=RequiredSkillsDB,
+                             schema=GetJobOpenings, search=search, pagination=pagination)
+
+
+@router.get("/candidates/export", response_class=StreamingResponse)
+async def export_candidates(export: Export = Depends()) -> StreamingResponse:
+    """
+    Return all candidates with skills as a stream of NDJSON lines or CSV rows.
+    :param export: format of the file.
+    :return: StreamingResponse
+    """
+    return StreamingResponse(
+        export_file(orm_table_class=CandidatesDB, foreign_orm_table_class=CandidatesSkillsDB, schema=GetCandidates,
+                    file_format=export.file_format),
+        media_type=MEDIA_TYPES[export.file_format],
+        headers={"Content-Disposition": f"attachment; filename=candidates.{export.file_format.value}"}
+    )
+
+
+@router.get("/job-openings/export", response_class=StreamingResponse)
+async def export_job_openings(export: Export = Depends()) -> StreamingResponse:
+    """
+    Return all job openings with skills as a stream of NDJSON lines or CSV rows.
+    :param export: format of the file.
+    :return: StreamingResponse
     """
-    return await get_model_db(orm_table_class=JobOpeningsDB, lim=pagination.limit, page=pagination.page)
+    return StreamingResponse(
+        export_file(orm_table_class=JobOpeningsDB, foreign_orm_table_class=RequiredSkillsDB, schema=GetJobOpenings,
+                    file_format=export.file_format),
+        media_type=MEDIA_TYPES[export.file_format],
+        headers={"Content-Disposition": f"attachment; filename=job_openings.{export.file_format.value}"}
+    )
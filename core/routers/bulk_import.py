@@ -0,0 +1,143 @@
+from typing import AsyncIterator, Callable, List, Tuple, Type
+
+from asyncpg import DataError as PostgresDataError, IntegrityConstraintViolationError, PostgresError
+from fastapi import APIRouter, Request
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.exc import DataError, IntegrityError, SQLAlchemyError
+
+from core.cache.invalidation import candidate_tags, invalidate_cache, job_opening_tags
+from core.config import BULK_BATCH_SIZE
+from core.db.request_db import bulk_add_models_db
+from core.db.database import CandidatesDB, CandidatesSkillsDB, JobOpeningsDB, RequiredSkillsDB
+from core.schemas import AddCandidates, AddJobOpenings, BulkReport, BulkRowError
+
+
+router = APIRouter(tags=["Bulk import of candidates and job openings"])
+
+NDJSON_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/x-ndjson": {"schema": {"type": "string", "format": "binary"}}},
+    }
+}
+
+
+async def ndjson_lines(request: Request) -> AsyncIterator[Tuple[int, bytes]]:
+    """
+    Read the request body by chunks and yield its non-empty lines with their numbers.
+    :param request: request with NDJSON body.
+    """
+    line_number, tail = 0, b""
+    async for chunk in request.stream():
+        *lines, tail = (tail + chunk).split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield line_number, line
+    if tail.strip():
+        yield line_number + 1, tail
+
+
+def row_error(error: Exception) -> bool:
+    """
+    The error is caused by values of some row (the rest of the batch may be added without it).
+    """
+    return isinstance(error, (IntegrityError, DataError, IntegrityConstraintViolationError, PostgresDataError))
+
+
+async def add_batch(models: List[BaseModel], lines: List[int], orm_table_class: Type[CandidatesDB | JobOpeningsDB],
+                    foreign_orm_table_class: Type[CandidatesSkillsDB | RequiredSkillsDB],
+                    report: BulkReport) -> List[BaseModel]:
+    """
+    Add the batch in one transaction. If values of some row are rejected by the database, the batch is split
+    in halves which are added separately, so only the failing rows are reported (with their lines).
+    :param models: validated rows.
+    :param lines: line numbers of the rows.
+    :param orm_table_class: table from database.
+    :param foreign_orm_table_class: related table from database.
+    :param report: report of the import, inserted and errors are updated.
+    :return: List[BaseModel] - added rows.
+    """
+    try:
+        ids = await bulk_add_models_db(
+            models=models, orm_table_class=orm_table_class, foreign_orm_table_class=foreign_orm_table_class
+        )
+    except (SQLAlchemyError, PostgresError) as error:
+        if len(models) == 1 or not row_error(error):
+            report.errors.extend(BulkRowError(line=line, detail=str(error)) for line in lines)
+            return []
+        middle = len(models) // 2
+        return [
+            *await add_batch(models[:middle], lines[:middle], orm_table_class, foreign_orm_table_class, report),
+            *await add_batch(models[middle:], lines[middle:], orm_table_class, foreign_orm_table_class, report),
+        ]
+    report.inserted += len(ids)
+    return models
+
+
+async def bulk_import(request: Request, model_class: Type[BaseModel],
+                      orm_table_class: Type[CandidatesDB | JobOpeningsDB],
+                      foreign_orm_table_class: Type[CandidatesSkillsDB | RequiredSkillsDB],
+                      cache_tags: Callable[..., list]) -> BulkReport:
+    """
+    Validate rows of the body in batches and add every batch to the database.
+    :param request: request with NDJSON body.
+    :param model_class: schema of one row.
+    :param orm_table_class: table from database.
+    :param foreign_orm_table_class: related table from database.
+    :param cache_tags: function which returns tags of cached responses affected by new records.
+    :return: BulkReport
+    """
+    report = BulkReport()
+    batch: List[BaseModel] = []
+    lines: List[int] = []
+
+    async def flush():
+        added = await add_batch(batch, lines, orm_table_class, foreign_orm_table_class, report)
+        if added:
+            await invalidate_cache(*cache_tags(
+                skill_names={skill.indexing_skill_name for model in added for skill in model.skills or []}
+            ))
+        batch.clear()
+        lines.clear()
+
+    async for line_number, line in ndjson_lines(request):
+        try:
+            batch.append(model_class.model_validate_json(line))
+        except ValidationError as error:
+            report.errors.append(
+                BulkRowError(line=line_number, detail=error.errors(include_url=False, include_input=False))
+            )
+            continue
+        lines.append(line_number)
+        if len(batch) == BULK_BATCH_SIZE:
+            await flush()
+    if batch:
+        await flush()
+    return report
+
+
+@router.post("/candidates:bulk", response_model=BulkReport, openapi_extra=NDJSON_BODY)
+async def bulk_add_candidates(request: Request) -> BulkReport:
+    """
+    Creating many candidates from NDJSON body (one AddCandidates object per line).
+    :param request: request with NDJSON body.
+    :return: BulkReport with number of created candidates and errors of rejected lines.
+    """
+    return await bulk_import(
+        request=request, model_class=AddCandidates, orm_table_class=CandidatesDB,
+        foreign_orm_table_class=CandidatesSkillsDB, cache_tags=candidate_tags
+    )
+
+
+@router.post("/job-openings:bulk", response_model=BulkReport, openapi_extra=NDJSON_BODY)
+async def bulk_add_job_openings(request: Request) -> BulkReport:
+    """
+    Creating many job openings from NDJSON body (one AddJobOpenings object per line).
+    :param request: request with NDJSON body.
+    :return: BulkReport with number of created job openings and errors of rejected lines.
+    """
+    return await bulk_import(
+        request=request, model_class=AddJobOpenings, orm_table_class=JobOpeningsDB,
+        foreign_orm_table_class=RequiredSkillsDB, cache_tags=job_opening_tags
+    )
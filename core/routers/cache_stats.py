@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+from fastapi_cache import FastAPICache
+
+from core.cache.two_tier import TwoTierBackend
+
+
+router = APIRouter(prefix="/cache", tags=["Cache"])
+
+
+@router.get("/stats")
+async def get_cache_stats() -> dict:
+    """
+    Return hits, misses and bytes served of the local and Redis cache tiers, in total and by namespace.
+    :return: dict
+    """
+    backend = FastAPICache.get_backend()
+    return backend.stats() if isinstance(backend, TwoTierBackend) else {}
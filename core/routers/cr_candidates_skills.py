@@ -1,11 +1,14 @@
 from typing import List
 
 from fastapi import APIRouter
-from fastapi_cache.decorator import cache
 
-from core.db.request_db import add_skills_db, get_skills_db
+from core.cache.conditional import cache
+from core.cache.invalidation import candidate_tags, invalidate_cache
+from core.config import CACHE_EXPIRE
+from core.db.request_db import add_skills_db, change_skills_db, get_skills_db
 from core.db.database import CandidatesSkillsDB
-from core.schemas import GetAllCandidateSkills, AddCandidateSkills
+from core.schemas import GetAllCandidateSkills, AddCandidateSkills, CandidateSkillsChanges, \
+    CandidateSkillsChangesResult
 from core.custom_exceptions import invalid_id
 
 
@@ -13,7 +16,7 @@ router = APIRouter(prefix="/candidates/{candidate_id}/skills", tags=["CR skills
 
 
 @router.get("", response_model=List[GetAllCandidateSkills])
-@cache(1, namespace="all_candidates_skills")
+@cache(CACHE_EXPIRE, namespace="all_candidates_skills")
 async def get_skills(candidate_id: int) -> List[GetAllCandidateSkills]:
     """
     Return all skills of candidate from database with the transmitted candidate id.
@@ -32,3 +35,23 @@ async def add_skills(candidate_id: int, skills_data: List[AddCandidateSkills]):
     :param skills_data: list with dicts of skills data.
     """
     await add_skills_db(skills=skills_data, orm_table_class=CandidatesSkillsDB, foreign_key=candidate_id)
+    await invalidate_cache(*candidate_tags(
+        candidate_id=candidate_id, skill_names=[skill.indexing_skill_name for skill in skills_data]
+    ))
+
+
+@router.patch("", response_model=CandidateSkillsChangesResult)
+async def change_skills(candidate_id: int, changes: CandidateSkillsChanges) -> CandidateSkillsChangesResult:
+    """
+    Update and delete several skills of candidate at once (all changes or nothing).
+    :param candidate_id: id of candidate in table.
+    :param changes: new data of skills (with their ids) and ids of skills to delete.
+    :return: CandidateSkillsChangesResult
+    """
+    invalid_id(id_number=candidate_id)
+    updated, deleted, skill_names = await change_skills_db(
+        orm_table_class=CandidatesSkillsDB, foreign_key=candidate_id,
+        changes=[change.model_dump(exclude_none=True) for change in changes.update], deleted=changes.delete
+    )
+    await invalidate_cache(*candidate_tags(candidate_id=candidate_id, skill_names=skill_names))
+    return CandidateSkillsChangesResult(updated=updated, deleted=deleted)
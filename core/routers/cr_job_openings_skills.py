@@ -1,11 +1,14 @@
 from typing import List
 
 from fastapi import APIRouter
-from fastapi_cache.decorator import cache
 
-from core.db.request_db import add_skills_db, get_skills_db
+from core.cache.conditional import cache
+from core.cache.invalidation import job_opening_tags, invalidate_cache, removed_requirements_tags
+from core.config import CACHE_EXPIRE
+from core.db.request_db import add_skills_db, change_skills_db, get_skills_db
 from core.db.database import RequiredSkillsDB
-from core.schemas import GetJobOpeningsRequiredSkills, AddRequiredSkills
+from core.schemas import GetJobOpeningsRequiredSkills, AddRequiredSkills, RequiredSkillsChanges, \
+    RequiredSkillsChangesResult
 from core.custom_exceptions import invalid_id
 
 
@@ -13,7 +16,7 @@ router = APIRouter(prefix="/job-openings/{job_openings_id}/skills", tags=["CR sk
 
 
 @router.get("", response_model=List[GetJobOpeningsRequiredSkills])
-@cache(1, namespace="all_job_openings_skills")
+@cache(CACHE_EXPIRE, namespace="all_job_openings_skills")
 async def get_skills(job_openings_id: int) -> List[GetJobOpeningsRequiredSkills]:
     """
     Return all skills of job opening from database with the transmitted candidate id.
@@ -32,3 +35,26 @@ async def add_skills(job_openings_id: int, skills_data: List[AddRequiredSkills])
     :param skills_data: list with dicts of skills data.
     """
     await add_skills_db(skills=skills_data, orm_table_class=RequiredSkillsDB, foreign_key=job_openings_id)
+    await invalidate_cache(*job_opening_tags(
+        job_id=job_openings_id, skill_names=[skill.indexing_skill_name for skill in skills_data]
+    ))
+
+
+@router.patch("", response_model=RequiredSkillsChangesResult)
+async def change_skills(job_openings_id: int, changes: RequiredSkillsChanges) -> RequiredSkillsChangesResult:
+    """
+    Update and delete several skills of job opening at once (all changes or nothing).
+    :param job_openings_id: id of job opening in database.
+    :param changes: new data of skills (with their ids) and ids of skills to delete.
+    :return: RequiredSkillsChangesResult
+    """
+    invalid_id(id_number=job_openings_id)
+    updated, deleted, skill_names = await change_skills_db(
+        orm_table_class=RequiredSkillsDB, foreign_key=job_openings_id,
+        changes=[change.model_dump(exclude_none=True) for change in changes.update], deleted=changes.delete
+    )
+    if deleted:
+        await invalidate_cache(*await removed_requirements_tags(job_id=job_openings_id, skill_names=skill_names))
+    else:
+        await invalidate_cache(*job_opening_tags(job_id=job_openings_id, skill_names=skill_names))
+    return RequiredSkillsChangesResult(updated=updated, deleted=deleted)
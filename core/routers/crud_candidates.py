@@ -1,36 +1,68 @@
-from fastapi import APIRouter
-from fastapi_cache.decorator import cache
+from typing import List
 
-from core.db.request_db import add_model_db, delete_record_db, get_model_db, update_record_db
+from fastapi import APIRouter, Body
+
+from core.cache.conditional import cache
+from core.cache.invalidation import candidate_tags, invalidate_cache
+from core.config import CACHE_EXPIRE, BULK_BATCH_SIZE
+from core.db.request_db import add_model_db, add_models_db, delete_record_db, get_model_db, get_rows_db, \
+    update_record_db
 from core.db.database import CandidatesDB, CandidatesSkillsDB
 from core.schemas import AddCandidates, Candidates, PATCHCandidates, GetCandidates
 from core.custom_exceptions import invalid_id
+from core.serialization import RawJSONCoder, RawJSONResponse, json_response, response_fields
 
 
 router = APIRouter(prefix="/candidates", tags=["CRUD candidates"])
 
 
 @router.get("/{candidate_id}", response_model=GetCandidates)
-@cache(1, namespace="candidates")
-async def get_candidates(candidate_id: int) -> GetCandidates:
+@cache(CACHE_EXPIRE, namespace="candidates", coder=RawJSONCoder)
+async def get_candidates(candidate_id: int) -> RawJSONResponse:
     """
     Return candidate from database with the transmitted id.
     :param candidate_id: id of candidate being searched for.
-    :return: GetCandidates
+    :return: RawJSONResponse
     """
     invalid_id(id_number=candidate_id)
-    return await get_model_db(orm_table_class=CandidatesDB, record_id_db=candidate_id)
+    fields, skill_fields = response_fields(GetCandidates)
+    record = await get_rows_db(orm_table_class=CandidatesDB, foreign_orm_table_class=CandidatesSkillsDB, fields=fields,
+                               skill_fields=skill_fields, record_id_db=candidate_id)
+    return json_response(record)
 
 
-@router.post("", status_code=201)
-async def add_candidates(candidate_data: AddCandidates):
+@router.post("", status_code=201, response_model=GetCandidates)
+async def add_candidates(candidate_data: AddCandidates) -> GetCandidates:
     """
     Creating new candidate.
     :param candidate_data: data about candidate.
+    :return: GetCandidates
     """
-    await add_model_db(
+    record = await add_model_db(
         model=candidate_data, orm_table_class=CandidatesDB, foreign_orm_table_class=CandidatesSkillsDB
     )
+    await invalidate_cache(*candidate_tags(
+        skill_names=[skill.indexing_skill_name for skill in candidate_data.skills or []]
+    ))
+    return record
+
+
+@router.post(":batch", status_code=201, response_model=List[GetCandidates])
+async def add_candidates_batch(
+        candidates_data: List[AddCandidates] = Body(min_length=1, max_length=BULK_BATCH_SIZE)
+) -> List[GetCandidates]:
+    """
+    Creating new candidates by one request to database.
+    :param candidates_data: data about candidates.
+    :return: List[GetCandidates]
+    """
+    records = await add_models_db(
+        models=candidates_data, orm_table_class=CandidatesDB, foreign_orm_table_class=CandidatesSkillsDB
+    )
+    await invalidate_cache(*candidate_tags(
+        skill_names={skill.indexing_skill_name for candidate in candidates_data for skill in candidate.skills or []}
+    ))
+    return records
 
 
 @router.put("/{candidate_id}", status_code=204)
@@ -42,6 +74,7 @@ async def update_candidates(candidate_id: int, data: Candidates):
     """
     invalid_id(id_number=candidate_id)
     await update_record_db(record_id_db=candidate_id, values=data.dict(), orm_table_class=CandidatesDB)
+    await invalidate_cache(*candidate_tags(candidate_id=candidate_id))
 
 
 @router.patch("/{candidate_id}")
@@ -55,6 +88,7 @@ async def partial_update_candidates(candidate_id: int, data: PATCHCandidates) ->
     invalid_id(id_number=candidate_id)
     await update_record_db(record_id_db=candidate_id, values=data.dict(exclude_none=True),
                            orm_table_class=CandidatesDB)
+    await invalidate_cache(*candidate_tags(candidate_id=candidate_id))
     return await get_model_db(orm_table_class=CandidatesDB, record_id_db=candidate_id)
 
 
@@ -66,3 +100,4 @@ async def delete_candidates(candidate_id: int):
     """
     invalid_id(id_number=candidate_id)
     await delete_record_db(record_id_db=candidate_id, orm_table_class=CandidatesDB)
+    await invalidate_cache(*candidate_tags(candidate_id=candidate_id))
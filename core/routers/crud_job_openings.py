@@ -1,35 +1,67 @@
-from fastapi import APIRouter
-from fastapi_cache.decorator import cache
+from typing import List
 
-from core.db.request_db import add_model_db, delete_record_db, get_model_db, update_record_db
+from fastapi import APIRouter, Body
+
+from core.cache.conditional import cache
+from core.cache.invalidation import job_opening_tags, invalidate_cache
+from core.config import CACHE_EXPIRE, BULK_BATCH_SIZE
+from core.db.request_db import add_model_db, add_models_db, delete_record_db, get_model_db, get_rows_db, \
+    update_record_db
 from core.db.database import JobOpeningsDB, RequiredSkillsDB
 from core.schemas import GetJobOpenings, AddJobOpenings, JobOpenings, PATCHJobOpenings
 from core.custom_exceptions import invalid_id
+from core.serialization import RawJSONCoder, RawJSONResponse, json_response, response_fields
 
 
 router = APIRouter(prefix="/job-openings", tags=["CRUD job openings"])
 
 
 @router.get("/{job_openings_id}", response_model=GetJobOpenings)
-@cache(1, namespace="job_openings")
-async def get_job_openings(job_openings_id: int) -> GetJobOpenings:
+@cache(CACHE_EXPIRE, namespace="job_openings", coder=RawJSONCoder)
+async def get_job_openings(job_openings_id: int) -> RawJSONResponse:
     """
     Return job opening from database with the transmitted id.
     :param job_openings_id: id of job opening in database.
-    :return: GetJobOpenings
+    :return: RawJSONResponse
     """
     invalid_id(id_number=job_openings_id)
-    return await get_model_db(orm_table_class=JobOpeningsDB, record_id_db=job_openings_id)
+    fields, skill_fields = response_fields(GetJobOpenings)
+    record = await get_rows_db(orm_table_class=JobOpeningsDB, foreign_orm_table_class=RequiredSkillsDB, fields=fields,
+                               skill_fields=skill_fields, record_id_db=job_openings_id)
+    return json_response(record)
 
 
-@router.post("", status_code=201)
-async def add_job_openings(candidate_data: AddJobOpenings):
+@router.post("", status_code=201, response_model=GetJobOpenings)
+async def add_job_openings(candidate_data: AddJobOpenings) -> GetJobOpenings:
     """
     Creating new job opening.
     :param candidate_data: data about job opening.
+    :return: GetJobOpenings
+    """
+    record = await add_model_db(model=candidate_data, orm_table_class=JobOpeningsDB,
+                                foreign_orm_table_class=RequiredSkillsDB)
+    await invalidate_cache(*job_opening_tags(
+        skill_names=[skill.indexing_skill_name for skill in candidate_data.skills or []]
+    ))
+    return record
+
+
+@router.post(":batch", status_code=201, response_model=List[GetJobOpenings])
+async def add_job_openings_batch(
+        job_openings_data: List[AddJobOpenings] = Body(min_length=1, max_length=BULK_BATCH_SIZE)
+) -> List[GetJobOpenings]:
+    """
+    Creating new job openings by one request to database.
+    :param job_openings_data: data about job openings.
+    :return: List[GetJobOpenings]
     """
-    await add_model_db(model=candidate_data, orm_table_class=JobOpeningsDB,
-                       foreign_orm_table_class=RequiredSkillsDB)
+    records = await add_models_db(models=job_openings_data, orm_table_class=JobOpeningsDB,
+                                  foreign_orm_table_class=RequiredSkillsDB)
+    await invalidate_cache(*job_opening_tags(
+        skill_names={skill.indexing_skill_name for job_opening in job_openings_data
+                     for skill in job_opening.skills or []}
+    ))
+    return records
 
 
 @router.put("/{job_openings_id}", status_code=204)
@@ -41,6 +73,7 @@ async def update_job_openings(job_openings_id: int, data: JobOpenings):
     """
     invalid_id(id_number=job_openings_id)
     await update_record_db(record_id_db=job_openings_id, values=data.dict(), orm_table_class=JobOpeningsDB)
+    await invalidate_cache(*job_opening_tags(job_id=job_openings_id))
 
 
 @router.patch("/{job_openings_id}")
@@ -54,6 +87,7 @@ async def partial_update_job_openings(job_openings_id: int, data: PATCHJobOpenin
     invalid_id(id_number=job_openings_id)
     await update_record_db(record_id_db=job_openings_id, values=data.dict(exclude_none=True),
                            orm_table_class=JobOpeningsDB)
+    await invalidate_cache(*job_opening_tags(job_id=job_openings_id))
     return await get_model_db(orm_table_class=JobOpeningsDB, record_id_db=job_openings_id)
 
 
@@ -65,3 +99,4 @@ async def delete_job_openings(job_openings_id: int):
     """
     invalid_id(id_number=job_openings_id)
     await delete_record_db(record_id_db=job_openings_id, orm_table_class=JobOpeningsDB)
+    await invalidate_cache(*job_opening_tags(job_id=job_openings_id))
@@ -0,0 +1,21 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from fastapi_cache import FastAPICache
+
+from core.cache.two_tier import TwoTierBackend
+from core.metrics import metrics
+
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics() -> PlainTextResponse:
+    """
+    Return latency of requests by route, requests in flight, duration of SQL statements
+    and hits, misses and bytes of the cache by namespace in the Prometheus text format.
+    :return: PlainTextResponse
+    """
+    backend = FastAPICache.get_backend()
+    cache_stats = backend.stats() if isinstance(backend, TwoTierBackend) else {}
+    return PlainTextResponse(metrics.export(cache_stats), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,6 +1,8 @@
 from fastapi import APIRouter
-from fastapi_cache.decorator import cache
 
+from core.cache.conditional import cache
+from core.cache.invalidation import add_cache_tags, candidate_tags, invalidate_cache
+from core.config import CACHE_EXPIRE
 from core.db.request_db import delete_record_db, update_record_db, get_skills_db
 from core.db.database import CandidatesSkillsDB
 from core.schemas import GetCandidateSkills, PATCHCandidateSkills, AddCandidateSkills
@@ -11,7 +13,7 @@ router = APIRouter(prefix="/candidates/skills", tags=["RUD candidates skills"])
 
 
 @router.get("/{skill_id}", response_model=GetCandidateSkills)
-@cache(1, namespace="candidates_skills")
+@cache(CACHE_EXPIRE, namespace="candidates_skills")
 async def get_skills(skill_id: int) -> GetCandidateSkills:
     """
     Return skill of candidate from database with the transmitted skill id.
@@ -19,7 +21,9 @@ async def get_skills(skill_id: int) -> GetCandidateSkills:
     :return: GetCandidateSkills
     """
     invalid_id(id_number=skill_id)
-    return await get_skills_db(orm_table_class=CandidatesSkillsDB, skill_id_db=skill_id)
+    skill = await get_skills_db(orm_table_class=CandidatesSkillsDB, skill_id_db=skill_id)
+    add_cache_tags(f"candidate:{skill.foreign_key}")
+    return skill
 
 
 @router.put("/{skill_id}", status_code=204)
@@ -30,9 +34,10 @@ async def update_skills(skill_id: int, data: AddCandidateSkills):
     :param data: new data about skill.
     """
     invalid_id(id_number=skill_id)
-    await update_record_db(
+    for foreign_key, skill_name in await update_record_db(
         record_id_db=skill_id, values=data.dict(exclude_none=True), orm_table_class=CandidatesSkillsDB
-    )
+    ):
+        await invalidate_cache(*candidate_tags(candidate_id=foreign_key, skill_names=[skill_name]))
 
 
 @router.patch("/{skill_id}")
@@ -44,9 +49,10 @@ async def partial_update_skills(skill_id: int, data: PATCHCandidateSkills) -> Ge
     :return: GetCandidateSkills
     """
     invalid_id(id_number=skill_id)
-    await update_record_db(
+    for foreign_key, skill_name in await update_record_db(
         record_id_db=skill_id, values=data.dict(exclude_none=True), orm_table_class=CandidatesSkillsDB
-    )
+    ):
+        await invalidate_cache(*candidate_tags(candidate_id=foreign_key, skill_names=[skill_name]))
     return await get_skills_db(orm_table_class=CandidatesSkillsDB, skill_id_db=skill_id)
 
 
@@ -57,4 +63,6 @@ async def delete_skills(skill_id: int):
     :param skill_id: id of skill in table.
     """
     invalid_id(id_number=skill_id)
-    await delete_record_db(record_id_db=skill_id, orm_table_class=CandidatesSkillsDB)
\ No newline at end of file
+    candidate_id = await delete_record_db(record_id_db=skill_id, orm_table_class=CandidatesSkillsDB)
+    if candidate_id:
+        await invalidate_cache(*candidate_tags(candidate_id=candidate_id))
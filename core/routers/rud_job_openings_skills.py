@@ -1,6 +1,8 @@
 from fastapi import APIRouter
-from fastapi_cache.decorator import cache
 
+from core.cache.conditional import cache
+from core.cache.invalidation import add_cache_tags, job_opening_tags, invalidate_cache, removed_requirements_tags
+from core.config import CACHE_EXPIRE
 from core.db.request_db import update_record_db, get_skills_db, delete_required_skill_db
 from core.db.database import RequiredSkillsDB
 from core.schemas import GetRequiredSkills, PATCHRequiredSkills, AddRequiredSkills
@@ -11,7 +13,7 @@ router = APIRouter(prefix="/job-openings/skills", tags=["RUD job openings skills
 
 
 @router.get("/{skill_id}", response_model=GetRequiredSkills)
-@cache(1, namespace="job_openings_skills")
+@cache(CACHE_EXPIRE, namespace="job_openings_skills")
 async def get_skills(skill_id: int) -> GetRequiredSkills:
     """
     Return skill of job opening from database with the transmitted skill id.
@@ -19,7 +21,9 @@ async def get_skills(skill_id: int) -> GetRequiredSkills:
     :return: GetRequiredSkills
     """
     invalid_id(id_number=skill_id)
-    return await get_skills_db(orm_table_class=RequiredSkillsDB, skill_id_db=skill_id)
+    skill = await get_skills_db(orm_table_class=RequiredSkillsDB, skill_id_db=skill_id)
+    add_cache_tags(f"job:{skill.foreign_key}")
+    return skill
 
 
 @router.put("/{skill_id}", status_code=204)
@@ -30,8 +34,10 @@ async def update_skills(skill_id: int, data: AddRequiredSkills):
     :param data: new data about skill.
     """
     invalid_id(id_number=skill_id)
-    await update_record_db(record_id_db=skill_id, values=data.dict(exclude_none=True),
-                           orm_table_class=RequiredSkillsDB)
+    for foreign_key, skill_name in await update_record_db(
+        record_id_db=skill_id, values=data.dict(exclude_none=True), orm_table_class=RequiredSkillsDB
+    ):
+        await invalidate_cache(*job_opening_tags(job_id=foreign_key, skill_names=[skill_name]))
 
 
 @router.patch("/{skill_id}")
@@ -43,8 +49,10 @@ async def partial_update_skills(skill_id: int, data: PATCHRequiredSkills) -> Get
     :return: GetRequiredSkills
     """
     invalid_id(id_number=skill_id)
-    await update_record_db(record_id_db=skill_id, values=data.dict(exclude_none=True),
-                           orm_table_class=RequiredSkillsDB)
+    for foreign_key, skill_name in await update_record_db(
+        record_id_db=skill_id, values=data.dict(exclude_none=True), orm_table_class=RequiredSkillsDB
+    ):
+        await invalidate_cache(*job_opening_tags(job_id=foreign_key, skill_names=[skill_name]))
     return await get_skills_db(orm_table_class=RequiredSkillsDB, skill_id_db=skill_id)
 
 
@@ -55,4 +63,6 @@ async def delete_skills(skill_id: int):
     :param skill_id: id of skill in table.
     """
     invalid_id(id_number=skill_id)
-    await delete_required_skill_db(record_id_db=skill_id)
+    job_id = await delete_required_skill_db(record_id_db=skill_id)
+    if job_id:
+        await invalidate_cache(*await removed_requirements_tags(job_id=job_id))
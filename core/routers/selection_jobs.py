@@ -0,0 +1,91 @@
+from typing import Type
+
+from fastapi import APIRouter, Depends
+
+from core.db.database import CandidatesDB, JobOpeningsDB
+from core.db.selection_jobs import selection_jobs
+from core.schemas import GetCandidates, GetJobOpenings, Pagination, SelectionJob, SelectionJobQuery
+from core.custom_exceptions import invalid_id, non_existent_object, raise_exception
+
+router = APIRouter(prefix="", tags=["Selection jobs"])
+
+
+async def selection_job_page(orm_table_for_search: Type[CandidatesDB | JobOpeningsDB], record_id: int, job_id: str,
+                             pagination: Pagination) -> dict:
+    """
+    Job of the selection for the record with the page of found records.
+    :param orm_table_for_search: the table with the found records.
+    :param record_id: id of record for which the selection is made.
+    :param job_id: id of the job.
+    :param pagination: limit and page of the found records, 'after' isn't supported.
+    :return: dict
+    """
+    invalid_id(record_id)
+    if pagination.after is not None:
+        raise_exception(info="after isn't supported for selection jobs, use page")
+    job = await selection_jobs.load(job_id)
+    if job is None or job["kind"] != orm_table_for_search.__tablename__ or job["record_id"] != record_id:
+        non_existent_object(message="There is no selection job with this id (or its result has expired)")
+    return await selection_jobs.page(job, limit=pagination.limit, page=pagination.page)
+
+
+@router.post("/job-openings/{job_id}/selection/jobs", status_code=202, response_model=SelectionJob[GetCandidates])
+async def create_candidates_selection_job(job_id: int, query: SelectionJobQuery = Depends()) -> dict:
+    """
+    Start the selection of candidates for the job opening in the background.
+    If the same selection is already queued or running, its job is returned.
+    :param job_id: id of the job openings being searched for.
+    :param query: number of the best candidates to find and sorting.
+    :return: SelectionJob - id and status of the job.
+    """
+    invalid_id(job_id)
+    return await selection_jobs.submit(
+        orm_table_for_search=CandidatesDB, record_id=job_id, top=query.top, sorting=query.sorting_from.value
+    )
+
+
+@router.get("/job-openings/{job_id}/selection/jobs/{selection_job_id}", response_model=SelectionJob[GetCandidates])
+async def get_candidates_selection_job(job_id: int, selection_job_id: str, pagination: Pagination = Depends()
+                                       ) -> dict:
+    """
+    Return status of the selection job, when it is done - with the page of found candidates.
+    :param job_id: id of the job openings being searched for.
+    :param selection_job_id: id of the job from its creation.
+    :param pagination: limit and page of found candidates.
+    :return: SelectionJob
+    """
+    return await selection_job_page(
+        orm_table_for_search=CandidatesDB, record_id=job_id, job_id=selection_job_id, pagination=pagination
+    )
+
+
+@router.post("/candidates/{candidate_id}/selection/jobs", status_code=202,
+             response_model=SelectionJob[GetJobOpenings])
+async def create_job_openings_selection_job(candidate_id: int, query: SelectionJobQuery = Depends()) -> dict:
+    """
+    Start the selection of job openings for the candidate in the background.
+    If the same selection is already queued or running, its job is returned.
+    :param candidate_id: id of the candidates being searched for.
+    :param query: number of the best job openings to find and sorting.
+    :return: SelectionJob - id and status of the job.
+    """
+    invalid_id(candidate_id)
+    return await selection_jobs.submit(
+        orm_table_for_search=JobOpeningsDB, record_id=candidate_id, top=query.top, sorting=query.sorting_from.value
+    )
+
+
+@router.get("/candidates/{candidate_id}/selection/jobs/{selection_job_id}",
+            response_model=SelectionJob[GetJobOpenings])
+async def get_job_openings_selection_job(candidate_id: int, selection_job_id: str, pagination: Pagination = Depends()
+                                         ) -> dict:
+    """
+    Return status of the selection job, when it is done - with the page of found job openings.
+    :param candidate_id: id of the candidates being searched for.
+    :param selection_job_id: id of the job from its creation.
+    :param pagination: limit and page of found job openings.
+    :return: SelectionJob
+    """
+    return await selection_job_page(
+        orm_table_for_search=JobOpeningsDB, record_id=candidate_id, job_id=selection_job_id, pagination=pagination
+    )
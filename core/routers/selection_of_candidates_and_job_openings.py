@@ -1,49 +1,127 @@
 from typing import List
 
 from fastapi import APIRouter, Depends
-from fastapi_cache.decorator import cache
 
-from core.db.request_db import find_suitable_records
+from core.cache.conditional import cache
+from core.cache.invalidation import tag_selection
+from core.config import CACHE_EXPIRE
+from core.db.request_db import find_suitable_records, find_suitable_records_batch, find_partially_suitable_records
 from core.db.database import CandidatesDB, JobOpeningsDB
-from core.schemas import GetCandidates, GetJobOpenings, Pagination, Sorting
-from core.custom_exceptions import invalid_id
+from core.schemas import GetCandidates, GetJobOpenings, Pagination, Sorting, CursorPage, decode_cursor, cursor_page, \
+    fetch_limit, BatchSelection, CandidatesSelection, JobOpeningsSelection, SelectionMode, EnumSelectionMode, \
+    PartialCandidates, PartialJobOpenings
+from core.custom_exceptions import invalid_id, raise_exception
 
 router = APIRouter(prefix="", tags=["Selection of candidates and job openings"])
 
 
-@router.get("/job-openings/{job_id}/selection", response_model=List[GetCandidates])
-@cache(1, namespace="job_openings_selection")
-async def get_suitable_candidates(job_id: int, pagination: Pagination = Depends(),
-                                  sorting_param: Sorting = Depends()) -> List[GetCandidates]:
+@router.get("/job-openings/{job_id}/selection",
+            response_model=List[GetCandidates] | CursorPage[GetCandidates] | List[PartialCandidates])
+@cache(CACHE_EXPIRE, namespace="job_openings_selection")
+async def get_suitable_candidates(job_id: int, pagination: Pagination = Depends(), sorting_param: Sorting = Depends(),
+                                  selection_mode: SelectionMode = Depends()
+                                  ) -> List[GetCandidates] | CursorPage[GetCandidates] | List[PartialCandidates]:
     """
     Return all suitable candidates from database with pagination.
     :param job_id: id of the job openings being searched for.
-    :param pagination: class with information that used for pagination.
+    :param pagination: class with information that used for pagination, with 'after' the page and the cursor
+    for the next page are returned.
     :param sorting_param: parameter by which sorting will be performed, 'lower' - from less qualified,
     'upper' - from more qualified.
-    :return: List[GetCandidates]
+    :param selection_mode: 'partial' - candidates who meet at least one requirement, with coverage and missing skills.
+    :return: List[GetCandidates] | CursorPage[GetCandidates] | List[PartialCandidates]
     """
     invalid_id(job_id)
-    return await find_suitable_records(
-        record_id=job_id, orm_table_for_search=CandidatesDB, lim=pagination.limit, page=pagination.page,
-        sorting=sorting_param.sorting_from.value
+    if selection_mode.mode is EnumSelectionMode.partial:
+        if pagination.after is not None:
+            raise_exception(info="after isn't supported in partial mode, use page")
+        records = await find_partially_suitable_records(
+            record_id=job_id, orm_table_for_search=CandidatesDB, lim=pagination.limit, page=pagination.page,
+            sorting=sorting_param.sorting_from.value
+        )
+        await tag_selection(
+            record_id=job_id, orm_table_for_search=CandidatesDB, found_ids=[record.id for record, *_ in records]
+        )
+        return [{"candidate": record, "coverage": coverage, "missing_skills": missing}
+                for record, coverage, _, missing in records]
+    after = decode_cursor(pagination.after, size=2)
+    records = await find_suitable_records(
+        record_id=job_id, orm_table_for_search=CandidatesDB, lim=fetch_limit(pagination.limit, after),
+        page=pagination.page, sorting=sorting_param.sorting_from.value, after=after
     )
+    await tag_selection(
+        record_id=job_id, orm_table_for_search=CandidatesDB, found_ids=[record.id for record, _ in records]
+    )
+    if after is None:
+        return [record for record, _ in records]
+    page = cursor_page(items=records, limit=pagination.limit, last_values=lambda pair: (pair[1], pair[0].id))
+    return {**page, "items": [record for record, _ in page["items"]]}
 
 
-@router.get("/candidates/{candidate_id}/selection", response_model=List[GetJobOpenings])
-@cache(1, namespace="candidates_selection")
+@router.get("/candidates/{candidate_id}/selection",
+            response_model=List[GetJobOpenings] | CursorPage[GetJobOpenings] | List[PartialJobOpenings])
+@cache(CACHE_EXPIRE, namespace="candidates_selection")
 async def get_suitable_job_openings(candidate_id: int, pagination: Pagination = Depends(),
-                                    sorting_param: Sorting = Depends()) -> List[GetJobOpenings]:
+                                    sorting_param: Sorting = Depends(), selection_mode: SelectionMode = Depends()
+                                    ) -> List[GetJobOpenings] | CursorPage[GetJobOpenings] | List[PartialJobOpenings]:
     """
     Return all suitable job openings from database with pagination.
     :param candidate_id: id of the candidates being searched for.
-    :param pagination: class with information that used for pagination.
+    :param pagination: class with information that used for pagination, with 'after' the page and the cursor
+    for the next page are returned.
     :param sorting_param: parameter by which sorting will be performed, 'lower' - from less qualified,
     'upper' - from more qualified.
-    :return: List[GetJobOpenings]
+    :param selection_mode: 'partial' - job openings whose requirements are met at least partially, with coverage
+    and missing skills.
+    :return: List[GetJobOpenings] | CursorPage[GetJobOpenings] | List[PartialJobOpenings]
     """
     invalid_id(candidate_id)
-    return await find_suitable_records(
-        record_id=candidate_id, orm_table_for_search=JobOpeningsDB, lim=pagination.limit, page=pagination.page,
-        sorting=sorting_param.sorting_from.value
+    if selection_mode.mode is EnumSelectionMode.partial:
+        if pagination.after is not None:
+            raise_exception(info="after isn't supported in partial mode, use page")
+        records = await find_partially_suitable_records(
+            record_id=candidate_id, orm_table_for_search=JobOpeningsDB, lim=pagination.limit, page=pagination.page,
+            sorting=sorting_param.sorting_from.value
+        )
+        await tag_selection(
+            record_id=candidate_id, orm_table_for_search=JobOpeningsDB, found_ids=[record.id for record, *_ in records]
+        )
+        return [{"job_opening": record, "coverage": coverage, "missing_skills": missing}
+                for record, coverage, _, missing in records]
+    after = decode_cursor(pagination.after, size=2)
+    records = await find_suitable_records(
+        record_id=candidate_id, orm_table_for_search=JobOpeningsDB, lim=fetch_limit(pagination.limit, after),
+        page=pagination.page, sorting=sorting_param.sorting_from.value, after=after
+    )
+    await tag_selection(
+        record_id=candidate_id, orm_table_for_search=JobOpeningsDB, found_ids=[record.id for record, _ in records]
+    )
+    if after is None:
+        return [record for record, _ in records]
+    page = cursor_page(items=records, limit=pagination.limit, last_values=lambda pair: (pair[1], pair[0].id))
+    return {**page, "items": [record for record, _ in page["items"]]}
+
+
+@router.post("/selection:batch", response_model=List[CandidatesSelection] | List[JobOpeningsSelection])
+async def get_suitable_records_batch(selection: BatchSelection
+                                     ) -> List[CandidatesSelection] | List[JobOpeningsSelection]:
+    """
+    Return the top suitable candidates for every job opening from job_ids
+    or the top suitable job openings for every candidate from candidate_ids.
+    :param selection: ids of records, quantity of records for each of them and sorting.
+    :return: List[CandidatesSelection] | List[JobOpeningsSelection]
+    """
+    if selection.job_ids is not None:
+        found = await find_suitable_records_batch(
+            record_ids=selection.job_ids, orm_table_for_search=CandidatesDB,
+            sorting=selection.sorting_from.value, top=selection.top
+        )
+        return [{"job_id": record_id, "candidates": [record for record, _ in records]}
+                for record_id, records in found.items()]
+
+    found = await find_suitable_records_batch(
+        record_ids=selection.candidate_ids, orm_table_for_search=JobOpeningsDB,
+        sorting=selection.sorting_from.value, top=selection.top
     )
+    return [{"candidate_id": record_id, "job_openings": [record for record, _ in records]}
+            for record_id, records in found.items()]
@@ -0,0 +1,25 @@
+from typing import List
+
+from fastapi import APIRouter, Depends
+
+from core.db.skill_suggestions import skill_suggestions
+from core.schemas import SkillSuggestionsQuery, SkillSuggestion
+
+
+router = APIRouter(prefix="/skills", tags=["Skills"])
+
+
+@router.get("/suggest", response_model=List[SkillSuggestion])
+async def suggest_skills(query: SkillSuggestionsQuery = Depends()) -> List[dict]:
+    """
+    Return the most popular skill names starting with the prefix (from the memory of the process).
+    If there are fewer of them than the limit, they are followed by similar names from database (typos).
+    :param query: prefix and maximum number of names.
+    :return: List[SkillSuggestion]
+    """
+    suggestions = skill_suggestions.suggest(query.prefix, query.limit)
+    if len(suggestions) < query.limit:
+        suggestions += await skill_suggestions.suggest_fuzzy(
+            query.prefix, query.limit - len(suggestions), exclude=[suggestion["name"] for suggestion in suggestions]
+        )
+    return suggestions
@@ -0,0 +1,42 @@
+import secrets
+from typing import List
+
+from fastapi import APIRouter, Depends, Header, Query
+
+from core.config import ADMIN_TOKEN
+from core.db.slow_queries import slow_query_log
+from core.custom_exceptions import raise_exception
+
+
+def admin_access(x_admin_token: str | None = Header(default=None)):
+    """
+    Admin endpoints require ADMIN_TOKEN from the settings in the header X-Admin-Token,
+    without ADMIN_TOKEN they answer 404 as if they didn't exist.
+    """
+    if not ADMIN_TOKEN:
+        raise_exception(status=404, info="Not Found")
+    if not secrets.compare_digest(x_admin_token or "", ADMIN_TOKEN):
+        raise_exception(status=403, info="Admin token is invalid")
+
+
+router = APIRouter(prefix="/admin/slow-queries", tags=["Admin"], dependencies=[Depends(admin_access)])
+
+
+@router.get("")
+async def get_slow_queries(limit: int = Query(default=50, gt=0, le=1000)) -> List[dict]:
+    """
+    Return the latest slow statements with bound parameters (only their types unless SLOW_QUERY_LOG_PARAMETERS
+    is on), duration, route of the request and the captured plan (null while it is being captured
+    or if the statement was below the explain threshold).
+    :param limit: maximum number of statements.
+    :return: List[dict]
+    """
+    return slow_query_log.recent(limit)
+
+
+@router.delete("", status_code=204)
+async def clear_slow_queries():
+    """
+    Clear the log of slow statements.
+    """
+    slow_query_log.clear()
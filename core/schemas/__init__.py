@@ -1,7 +1,17 @@
-from .pagination import Pagination, Sorting
+from .pagination import Pagination, Sorting, CursorPage, decode_cursor, cursor_page, fetch_limit
 from .candidates import Candidates, PATCHCandidates, AddCandidates, GetCandidates
 from .candidate_skills import CandidateSkills, AddCandidateSkills, PATCHCandidateSkills, GetAllCandidateSkills, \
     GetCandidateSkills
 from .required_skills import RequiredSkills, AddRequiredSkills, PATCHRequiredSkills, GetJobOpeningsRequiredSkills, \
     GetRequiredSkills
 from .job_openings import JobOpenings, PATCHJobOpenings, AddJobOpenings, GetJobOpenings
+from .bulk import BulkReport, BulkRowError
+from .export import Export, EnumExportFormat
+from .selection import BatchSelection, CandidatesSelection, JobOpeningsSelection, SelectionMode, EnumSelectionMode, \
+    PartialCandidates, PartialJobOpenings
+from .skills_changes import CandidateSkillsChanges, RequiredSkillsChanges, CandidateSkillsChangesResult, \
+    RequiredSkillsChangesResult
+from .search import Search
+from .filters import CandidatesFilter, JobOpeningsFilter
+from .skill_suggestions import SkillSuggestionsQuery, SkillSuggestion
+from .selection_jobs import SelectionJob, SelectionJobQuery, EnumJobStatus
@@ -0,0 +1,13 @@
+from typing import Any, List
+
+from pydantic import BaseModel
+
+
+class BulkRowError(BaseModel):
+    line: int
+    detail: Any
+
+
+class BulkReport(BaseModel):
+    inserted: int = 0
+    errors: List[BulkRowError] = []
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, model_validator
-from .utils import count_score, partial_model
+from .utils import THIS_YEAR, count_score, partial_model
 
 
 class CandidateSkills(BaseModel):
@@ -23,11 +23,10 @@ class AddCandidateSkills(CandidateSkills):
 
     @model_validator(mode='after')
     def get_score(self):
-        this_year = 2024
         if not (self.level is None) and self.years_of_experience:
             self.score = count_score(level=self.level, year=self.years_of_experience)
             if self.last_used_year:
-                self.score = self.score - min(((this_year - self.last_used_year) ** 2) * 30, int(self.score / 3))
+                self.score = self.score - min(((THIS_YEAR - self.last_used_year) ** 2) * 30, int(self.score / 3))
         else:
             self.score = None
         return self
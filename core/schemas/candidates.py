@@ -1,9 +1,9 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 from datetime import datetime
 from typing import List
 
-from .utils import partial_model
+from .utils import partial_model, check_unique_skills
 from .candidate_skills import AddCandidateSkills, GetAllCandidateSkills
 
 
@@ -28,6 +28,11 @@ class PATCHCandidates(Candidates):
 class AddCandidates(Candidates):
     skills: List[AddCandidateSkills] | None = None
 
+    @model_validator(mode='after')
+    def unique_skills(self):
+        check_unique_skills(self.skills)
+        return self
+
 
 class GetCandidates(AddCandidates):
     time_create: datetime
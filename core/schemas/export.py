@@ -0,0 +1,11 @@
+from enum import Enum
+from pydantic import BaseModel
+
+
+class EnumExportFormat(Enum):
+    ndjson = 'ndjson'
+    csv = 'csv'
+
+
+class Export(BaseModel):
+    file_format: EnumExportFormat = EnumExportFormat.ndjson
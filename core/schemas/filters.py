@@ -0,0 +1,16 @@
+from pydantic import BaseModel, Field
+
+
+class CandidatesFilter(BaseModel):
+    city: str | None = Field(default=None, min_length=1, max_length=20)
+    status: int | None = Field(default=None, ge=0, le=4)
+    education_degree: int | None = Field(default=None, ge=0, le=8)
+    published: bool | None = None
+    desired_position: str | None = Field(default=None, min_length=1, max_length=30)
+
+
+class JobOpeningsFilter(BaseModel):
+    salary_from: int | None = Field(default=None, ge=0)
+    salary_to: int | None = Field(default=None, ge=0)
+    address: str | None = Field(default=None, min_length=1, max_length=100)
+
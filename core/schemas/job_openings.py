@@ -3,7 +3,7 @@ from pydantic import BaseModel, Field, model_validator
 from datetime import datetime
 from typing import List
 
-from .utils import partial_model
+from .utils import partial_model, check_unique_skills
 from .required_skills import AddRequiredSkills, GetJobOpeningsRequiredSkills
 
 
@@ -23,6 +23,11 @@ class AddJobOpenings(JobOpenings):
     skills: List[AddRequiredSkills] | None = None
     skills_quantity: int | None = None
 
+    @model_validator(mode='after')
+    def unique_skills(self):
+        check_unique_skills(self.skills)
+        return self
+
     @model_validator(mode='after')
     def skills_counting(self):
         if self.skills:
@@ -1,6 +1,14 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as DecodingError
 from enum import Enum
+from typing import Any, Callable, Generic, List, Tuple, TypeVar
+
 from pydantic import BaseModel, Field
 
+from core.custom_exceptions import raise_exception
+
+T = TypeVar('T')
+
 
 class EnumSorting(Enum):
     from_the_lower = 'lower'
@@ -14,3 +22,63 @@ class Sorting(BaseModel):
 class Pagination(BaseModel):
     limit: int = Field(gt=0, default=10)
     page: int = Field(ge=0, default=0)
+    after: str | None = Field(
+        default=None, description="cursor from next_cursor of the previous page, empty value - the first page"
+    )
+
+
+class CursorPage(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: str | None = None
+
+
+def encode_cursor(*values: int) -> str:
+    """
+    Pack values of the last record of the page into an opaque cursor.
+    :param values: id or (total_score, id) of the last record.
+    :return: str
+    """
+    return urlsafe_b64encode(":".join(str(value) for value in values).encode()).decode()
+
+
+def decode_cursor(cursor: str | None, size: int) -> Tuple[int, ...] | None:
+    """
+    Unpack cursor from the query parameter 'after'.
+    :param cursor: cursor from the request.
+    :param size: number of values in the cursor.
+    :return: None - cursor mode is off, empty tuple - the first page, otherwise values of the last record.
+    """
+    if cursor is None:
+        return None
+    if not cursor:
+        return ()
+    try:
+        values = tuple(int(value) for value in urlsafe_b64decode(cursor.encode()).decode().split(":"))
+    except (DecodingError, UnicodeDecodeError, ValueError):
+        values = ()
+    if len(values) != size:
+        raise_exception(info="after must be a cursor from next_cursor of the previous page")
+    return values
+
+
+def fetch_limit(limit: int, after: Tuple[int, ...] | None) -> int:
+    """
+    Number of records to read for the page: in cursor mode one more, it shows that the next page exists.
+    :param limit: maximum number of records in the page.
+    :param after: decoded cursor (None - cursor mode is off).
+    :return: int
+    """
+    return limit + 1 if after is not None else limit
+
+
+def cursor_page(items: list, limit: int, last_values: Callable[[Any], Tuple[int, ...]]) -> dict:
+    """
+    Page for cursor mode from records read with fetch_limit, next_cursor is empty on the last page
+    (an empty page is the last one too).
+    :param items: records of the page and the first record of the next page if it exists.
+    :param limit: maximum number of records in the page.
+    :param last_values: values of a record which are packed into next_cursor.
+    :return: dict
+    """
+    page = items[:limit]
+    return {"items": page, "next_cursor": encode_cursor(*last_values(page[-1])) if len(items) > limit else None}
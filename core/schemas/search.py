@@ -0,0 +1,8 @@
+from pydantic import BaseModel, Field
+
+
+class Search(BaseModel):
+    q: str = Field(
+        min_length=1, max_length=200,
+        description='words to search, "quoted phrase", OR between alternatives, -word to exclude it'
+    )
@@ -0,0 +1,56 @@
+from enum import Enum
+from typing import List
+
+from pydantic import BaseModel, Field, PositiveInt, model_validator
+
+from .pagination import EnumSorting
+from .candidates import GetCandidates
+from .job_openings import GetJobOpenings
+
+
+class EnumSelectionMode(Enum):
+    full = 'full'
+    partial = 'partial'
+
+
+class SelectionMode(BaseModel):
+    mode: EnumSelectionMode = Field(
+        default=EnumSelectionMode.full,
+        description="full - records which meet every requirement, partial - records which meet at least one "
+                    "requirement ordered by coverage"
+    )
+
+
+class BatchSelection(BaseModel):
+    job_ids: List[PositiveInt] | None = Field(default=None, min_length=1, max_length=1000)
+    candidate_ids: List[PositiveInt] | None = Field(default=None, min_length=1, max_length=1000)
+    top: int = Field(gt=0, le=100, default=20)
+    sorting_from: EnumSorting = EnumSorting.from_the_upper
+
+    @model_validator(mode='after')
+    def one_kind_of_ids(self):
+        if (self.job_ids is None) == (self.candidate_ids is None):
+            raise ValueError("either job_ids or candidate_ids must be passed")
+        return self
+
+
+class CandidatesSelection(BaseModel):
+    job_id: int
+    candidates: List[GetCandidates]
+
+
+class JobOpeningsSelection(BaseModel):
+    candidate_id: int
+    job_openings: List[GetJobOpenings]
+
+
+class PartialCandidates(BaseModel):
+    candidate: GetCandidates
+    coverage: float
+    missing_skills: List[str]
+
+
+class PartialJobOpenings(BaseModel):
+    job_opening: GetJobOpenings
+    coverage: float
+    missing_skills: List[str]
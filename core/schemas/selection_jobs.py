@@ -0,0 +1,35 @@
+from datetime import datetime
+from enum import Enum
+from typing import Generic, List, TypeVar
+
+from pydantic import BaseModel, Field
+
+from core.config import SELECTION_JOB_MAX_TOP
+from .pagination import EnumSorting
+
+T = TypeVar('T')
+
+
+class EnumJobStatus(Enum):
+    queued = 'queued'
+    running = 'running'
+    done = 'done'
+    failed = 'failed'
+
+
+class SelectionJobQuery(BaseModel):
+    top: int = Field(gt=0, le=SELECTION_JOB_MAX_TOP, default=1000, description="number of the best records to find")
+    sorting_from: EnumSorting = EnumSorting.from_the_lower
+
+
+class SelectionJob(BaseModel, Generic[T]):
+    job_id: str
+    status: EnumJobStatus
+    record_id: int
+    top: int
+    sorting_from: EnumSorting
+    created_at: datetime
+    finished_at: datetime | None = None
+    total: int | None = Field(default=None, description="number of found records, when the job is done")
+    error: str | None = None
+    items: List[T] | None = Field(default=None, description="the page of found records, when the job is done")
@@ -0,0 +1,11 @@
+from pydantic import BaseModel, Field
+
+
+class SkillSuggestionsQuery(BaseModel):
+    prefix: str = Field(min_length=1, max_length=30, description="beginning of the skill name, in any case")
+    limit: int = Field(gt=0, le=50, default=10)
+
+
+class SkillSuggestion(BaseModel):
+    name: str
+    popularity: int = Field(description="number of candidates' and job openings' skills with this name")
@@ -0,0 +1,47 @@
+from typing import Generic, List, TypeVar
+
+from pydantic import BaseModel, Field, PositiveInt, model_validator
+
+from .candidate_skills import PATCHCandidateSkills, GetAllCandidateSkills
+from .required_skills import PATCHRequiredSkills, GetJobOpeningsRequiredSkills
+
+
+T = TypeVar("T")
+
+
+class CandidateSkillsChange(PATCHCandidateSkills):
+    id: PositiveInt
+
+
+class RequiredSkillsChange(PATCHRequiredSkills):
+    id: PositiveInt
+
+
+class SkillsChanges(BaseModel):
+    delete: List[PositiveInt] = Field(default=[], max_length=1000)
+
+    @model_validator(mode='after')
+    def unique_ids(self):
+        ids = [change.id for change in self.update] + self.delete
+        if len(ids) != len(set(ids)):
+            raise ValueError("every skill can be updated or deleted only once")
+        if not ids:
+            raise ValueError("update or delete must contain at least one skill")
+        return self
+
+
+class CandidateSkillsChanges(SkillsChanges):
+    update: List[CandidateSkillsChange] = Field(default=[], max_length=1000)
+
+
+class RequiredSkillsChanges(SkillsChanges):
+    update: List[RequiredSkillsChange] = Field(default=[], max_length=1000)
+
+
+class SkillsChangesResult(BaseModel, Generic[T]):
+    updated: List[T]
+    deleted: List[int]
+
+
+CandidateSkillsChangesResult = SkillsChangesResult[GetAllCandidateSkills]
+RequiredSkillsChangesResult = SkillsChangesResult[GetJobOpeningsRequiredSkills]
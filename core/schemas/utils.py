@@ -2,7 +2,7 @@ from pydantic import BaseModel, create_model
 from pydantic.fields import FieldInfo
 
 from copy import deepcopy
-from typing import Optional, Type, Any, Tuple
+from typing import Optional, Type, Any, Tuple, List
 
 
 def partial_model(model: Type[BaseModel]):
@@ -22,5 +22,17 @@ def partial_model(model: Type[BaseModel]):
     )
 
 
+THIS_YEAR = 2024
+
+
 def count_score(level, year):
     return (level + 1) * 1000 + year * 400
+
+
+def check_unique_skills(skills: List[BaseModel] | None):
+    """
+    A record has every skill once (names are compared case-insensitively).
+    """
+    names = [skill.skill_name.lower() for skill in skills or []]
+    if len(names) != len(set(names)):
+        raise ValueError("every skill of the record must have a unique name")
@@ -0,0 +1,70 @@
+from functools import lru_cache
+from typing import Any, Tuple, Type, get_args
+
+from fastapi_cache.coder import Coder
+from pydantic import BaseModel, TypeAdapter
+from starlette.responses import Response
+
+from core.http_cache import strong_etag
+
+
+class RawJSONResponse(Response):
+    """
+    Response with the body which is already serialized to JSON (bytes), it isn't validated or encoded again.
+    Its strong ETag is the digest of the body, which is the cached payload of the endpoint.
+    """
+    media_type = "application/json"
+
+    def __init__(self, content: bytes, *args, **kwargs):
+        super().__init__(content, *args, **kwargs)
+        self.headers.setdefault("etag", strong_etag(self.body))
+
+
+class RawJSONCoder(Coder):
+    """
+    Coder of fastapi_cache for endpoints which return RawJSONResponse: the body is cached as is
+    and on a hit it is returned without decoding and validation.
+    """
+
+    @classmethod
+    def encode(cls, value: Any) -> bytes:
+        return value.body
+
+    @classmethod
+    def decode(cls, value: bytes) -> RawJSONResponse:
+        return RawJSONResponse(value)
+
+    @classmethod
+    def decode_as_type(cls, value: bytes, *, type_: Any) -> RawJSONResponse:
+        return cls.decode(value)
+
+
+@lru_cache(maxsize=None)
+def type_adapter(type_: Any) -> TypeAdapter:
+    """
+    TypeAdapter is built once for every type (building of the core schema is expensive).
+    """
+    return TypeAdapter(type_)
+
+
+@lru_cache(maxsize=None)
+def response_fields(schema: Type[BaseModel]) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """
+    Fields of the record and of its skills (List[...] | None) in the order of the schema.
+    Rows which have only these columns are serialized to the same document as the schema.
+    :param schema: GetCandidates or GetJobOpenings.
+    :return: (record fields, skill fields)
+    """
+    skill_schema = get_args(get_args(schema.model_fields["skills"].annotation)[0])[0]
+    return tuple(schema.model_fields), tuple(skill_schema.model_fields)
+
+
+def json_response(value: Any) -> RawJSONResponse:
+    """
+    Serialize rows from database by the Rust encoder of pydantic-core, without construction of models
+    and validation: rows are written through validated schemas and are read with the columns of the response schema.
+    :param value: rows (get_rows_db) or page of rows.
+    :return: RawJSONResponse
+    """
+    return RawJSONResponse(type_adapter(Any).dump_json(value))
+
@@ -0,0 +1,3 @@
+#!/bin/sh
+# connections of streaming replication for the read replica (the db-replica service)
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
@@ -0,0 +1,49 @@
+import asyncio
+
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from core.db.database import CandidatesDB, CandidatesSkillsDB
+from core.routers import bulk_import
+from core.schemas import BulkReport
+
+
+def fake_database(monkeypatch, error):
+    """
+    bulk_add_models_db which rejects every batch with a row "bad", calls are recorded by batch sizes.
+    """
+    calls = []
+
+    async def bulk_add_models_db(models, orm_table_class, foreign_orm_table_class):
+        calls.append(len(models))
+        if "bad" in models:
+            raise error
+        return list(range(len(models)))
+
+    monkeypatch.setattr(bulk_import, "bulk_add_models_db", bulk_add_models_db)
+    return calls
+
+
+def add(rows):
+    report = BulkReport()
+    added = asyncio.run(bulk_import.add_batch(
+        rows, [line for line in range(1, len(rows) + 1)], CandidatesDB, CandidatesSkillsDB, report
+    ))
+    return added, report
+
+
+def test_only_failing_rows_are_reported(monkeypatch):
+    calls = fake_database(monkeypatch, IntegrityError("INSERT", {}, Exception("duplicate key")))
+    rows = ["ok", "ok", "bad", "ok", "ok", "ok", "bad", "ok"]
+    added, report = add(rows)
+    assert added == ["ok"] * 6
+    assert report.inserted == 6
+    assert [error.line for error in report.errors] == [3, 7]
+    assert len(calls) < 2 * len(rows)
+
+
+def test_batch_isnt_split_by_errors_of_connection(monkeypatch):
+    calls = fake_database(monkeypatch, OperationalError("INSERT", {}, Exception("connection is closed")))
+    added, report = add(["ok", "bad", "ok"])
+    assert added == [] and report.inserted == 0
+    assert [error.line for error in report.errors] == [1, 2, 3]
+    assert calls == [3]
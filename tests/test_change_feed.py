@@ -0,0 +1,112 @@
+import asyncio
+from typing import List
+
+from core.cache.change_feed import ChangeFeed, Replicated
+
+
+class Broker:
+    """
+    Redis channels in memory: publish and pubsub() as used by ChangeFeed.
+    """
+
+    def __init__(self):
+        self.subscribers: List[asyncio.Queue] = []
+
+    async def publish(self, channel: str, message: str):
+        for queue in self.subscribers:
+            queue.put_nowait({"type": "message", "channel": channel, "data": message})
+
+    def pubsub(self):
+        return PubSub(self)
+
+
+class PubSub:
+    def __init__(self, broker: Broker):
+        self.broker = broker
+        self.queue = asyncio.Queue()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.broker.subscribers.remove(self.queue)
+
+    async def subscribe(self, channel: str):
+        self.broker.subscribers.append(self.queue)
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+
+class Counter(Replicated):
+    replica_name = "counter"
+
+    def __init__(self, loaded: int = 0, build_delay: float = 0):
+        self.loaded = loaded
+        self.build_delay = build_delay
+        self.value = 0
+
+    async def build(self):
+        await asyncio.sleep(self.build_delay)
+        self.value, self.ready = self.loaded, True
+
+    def add(self, amount: int):
+        if self.tracked:
+            self.change("add", amount)
+
+    def apply_add(self, amount: int):
+        self.value += amount
+
+
+def test_changes_reach_other_workers():
+    async def check():
+        broker = Broker()
+        first, second = Counter(), Counter()
+        feeds = [ChangeFeed(broker), ChangeFeed(broker)]
+        feeds[0].register(first)
+        feeds[1].register(second)
+        for feed in feeds:
+            await feed.start()
+
+        first.add(2)
+        second.add(3)
+        await asyncio.sleep(0.01)
+        assert first.value == second.value == 5
+
+        for feed in feeds:
+            await feed.stop()
+
+    asyncio.run(check())
+
+
+def test_changes_during_rebuild_are_applied_after_it():
+    async def check():
+        broker = Broker()
+        writer, late = Counter(), Counter(loaded=10, build_delay=0.05)
+        writer_feed, late_feed = ChangeFeed(broker), ChangeFeed(broker)
+        writer_feed.register(writer)
+        late_feed.register(late)
+        await writer_feed.start()
+
+        starting = asyncio.create_task(late_feed.start())
+        await asyncio.sleep(0.01)
+        # the late worker is subscribed and still loading its copy
+        assert not late.ready
+        writer.add(1)
+        await starting
+        assert late.ready and late.value == 11
+
+        for feed in (writer_feed, late_feed):
+            await feed.stop()
+
+    asyncio.run(check())
+
+
+def test_structure_without_feed_applies_changes_only_when_built():
+    counter = Counter()
+    counter.add(1)
+    assert counter.value == 0
+    counter.ready = True
+    counter.add(1)
+    assert counter.value == 1
@@ -0,0 +1,59 @@
+import asyncio
+
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from starlette.requests import Request
+from starlette.responses import Response
+
+from core.cache.conditional import REQUEST_PARAMETER, RESPONSE_PARAMETER, cache
+from core.serialization import RawJSONCoder, RawJSONResponse
+
+calls = []
+
+
+@cache(60, namespace="items")
+async def get_item(item_id: int) -> dict:
+    calls.append(item_id)
+    return {"id": item_id}
+
+
+@cache(60, namespace="raw_items", coder=RawJSONCoder)
+async def get_raw_item(item_id: int) -> RawJSONResponse:
+    calls.append(item_id)
+    return RawJSONResponse(b'{"id": %d}' % item_id)
+
+
+def request(if_none_match: str | None = None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/items", "query_string": b"", "headers": headers})
+
+
+async def call(endpoint, if_none_match: str | None = None):
+    response = Response()
+    result = await endpoint(item_id=1, **{REQUEST_PARAMETER: request(if_none_match),
+                                          RESPONSE_PARAMETER: response})
+    return result, response
+
+
+def test_matching_if_none_match_skips_the_endpoint():
+    async def check():
+        FastAPICache.reset()
+        FastAPICache.init(InMemoryBackend(), prefix="test")
+        for endpoint in (get_item, get_raw_item):
+            calls.clear()
+            result, response = await call(endpoint)
+            etag = result.headers["etag"] if isinstance(result, Response) else response.headers["etag"]
+            assert not etag.startswith("W/")
+
+            # a hit has the same strong tag
+            result, response = await call(endpoint, if_none_match='"other"')
+            assert (result.headers["etag"] if isinstance(result, Response) else response.headers["etag"]) == etag
+
+            # the tag of the compressed body matches too
+            for if_none_match in (etag, f'{etag[:-1]}-gzip"'):
+                result, _ = await call(endpoint, if_none_match=if_none_match)
+                assert result.status_code == 304
+                assert result.headers["etag"] == etag
+            assert calls == [1]
+
+    asyncio.run(check())
@@ -0,0 +1,180 @@
+import asyncio
+from contextlib import asynccontextmanager
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import insert, select, text
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from core.config import DB_HOST
+from core.db.database import engine, Base, CandidatesDB, JobOpeningsDB, CandidatesSkillsDB, RequiredSkillsDB, \
+    SkillsDB
+from core.db.matches import refresh_matches
+from core.db.request_db import suitable_records_sql_statement, suitable_records_table_statement, page_parameters, \
+    change_skills_statement, record_columns
+from core.matching.vectorized import SkillMatrix, SkillMatrixIndex
+
+SKILLS = {1: "python", 2: "sql", 3: "docker"}
+# (id, foreign_key, skill_id, level, years_of_experience, score), scores are chosen to make ties of total scores
+CANDIDATE_SKILLS = [
+    (1, 1, 1, 1, 2, 1000), (2, 1, 2, 1, 3, 500),
+    (3, 2, 1, 2, 3, 700), (4, 2, 2, 0, 1, 800),
+    (5, 3, 1, 0, 1, 300),
+    (6, 4, 2, 2, 4, 900),
+    (7, 5, 1, 1, 2, 1000), (8, 5, 2, 0, 1, 500), (9, 5, 3, 2, 6, 200),
+    (10, 6, 3, 2, 5, 1500),
+]
+REQUIRED_SKILLS = [
+    (1, 1, 1, 1, 2, 600), (2, 1, 2, 0, 1, 400),
+    (3, 2, 1, 0, 1, 900),
+    (4, 3, 3, 2, 5, 1000),
+    (5, 4, 2, 1, 3, 500), (6, 4, 1, 0, 1, 500),
+]
+CANDIDATE_IDS = range(1, 7)
+# the job opening 5 has no requirements
+JOB_IDS = range(1, 6)
+SORTINGS = ("lower", "upper")
+
+
+@asynccontextmanager
+async def fixture_connection():
+    """
+    Connection to the database of the application with the fixture tables in a new schema, everything is rolled
+    back at the end. The test is skipped if the database isn't available.
+    """
+    if DB_HOST is None:
+        pytest.skip("DB_HOST isn't configured")
+    test_engine = create_async_engine(engine.url, poolclass=NullPool)
+    try:
+        conn = await test_engine.connect()
+    except (OSError, DBAPIError) as error:
+        await test_engine.dispose()
+        pytest.skip(f"the database isn't available: {error}")
+    try:
+        await conn.begin()
+        schema = f"parity_{uuid4().hex[:8]}"
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await conn.execute(text(f"CREATE SCHEMA {schema}"))
+        await conn.execute(text(f"SET LOCAL search_path TO {schema}, public"))
+        await conn.run_sync(lambda sync_conn: Base.metadata.create_all(sync_conn, checkfirst=False))
+
+        await conn.execute(insert(SkillsDB), [{"id": key, "name": name} for key, name in SKILLS.items()])
+        await conn.execute(insert(CandidatesDB), [
+            {"id": i, "first_name": "Name", "second_name": "Surname", "age": 30, "status": 1, "city": "Minsk",
+             "desired_position": "Developer", "education_degree": 1, "published": True} for i in CANDIDATE_IDS
+        ])
+        quantity = {job_id: sum(row[1] == job_id for row in REQUIRED_SKILLS) for job_id in JOB_IDS}
+        await conn.execute(insert(JobOpeningsDB), [
+            {"id": i, "title": "Developer", "address": "Minsk", "salary": 1000, "skills_quantity": quantity[i]}
+            for i in JOB_IDS
+        ])
+        for orm_table_class, rows in ((CandidatesSkillsDB, CANDIDATE_SKILLS), (RequiredSkillsDB, REQUIRED_SKILLS)):
+            await conn.execute(insert(orm_table_class), [skill_values(orm_table_class, row) for row in rows])
+        await refresh_matches(conn)
+        yield conn
+    finally:
+        await conn.rollback()
+        await conn.close()
+        await test_engine.dispose()
+
+
+def skill_values(orm_table_class, row: tuple) -> dict:
+    skill_id, owner_id, key, level, years, score = row
+    values = {"id": skill_id, "foreign_key": owner_id, "skill_id": key, "skill_name": SKILLS[key], "level": level,
+              "years_of_experience": years, "score": score}
+    if orm_table_class is CandidatesSkillsDB:
+        values["last_used_year"] = 2024
+    return values
+
+
+async def select_sql(ses: AsyncSession, statement, record_id: int, lim: int, page: int, after=None):
+    response = await ses.execute(statement, {"record_id": record_id, **page_parameters(lim, page, after)})
+    return [(record.id, score) for record, score in response.all()]
+
+
+async def compare_engines(conn, index: SkillMatrixIndex, orm_table_for_search, record_ids):
+    async with AsyncSession(bind=conn) as ses:
+        for record_id in record_ids:
+            for sorting in SORTINGS:
+                expected = await select_sql(ses, suitable_records_sql_statement(orm_table_for_search, sorting, False),
+                                            record_id, lim=100, page=0)
+                table = await select_sql(ses, suitable_records_table_statement(orm_table_for_search, sorting, False),
+                                         record_id, lim=100, page=0)
+                matrix = index.select(record_id=record_id, orm_table_for_search=orm_table_for_search,
+                                      sorting=sorting, lim=100, page=0)
+                assert table == expected, (record_id, sorting)
+                assert matrix == expected, (record_id, sorting)
+
+                # pages of 2 records, ties are split by id the same way
+                for page in range(3):
+                    assert index.select(record_id=record_id, orm_table_for_search=orm_table_for_search,
+                                        sorting=sorting, lim=2, page=page) == expected[2 * page:2 * page + 2]
+                after = expected[1][::-1] if len(expected) > 2 else None
+                if after:
+                    cursor_page = await select_sql(
+                        ses, suitable_records_sql_statement(orm_table_for_search, sorting, True), record_id,
+                        lim=100, page=0, after=after
+                    )
+                    assert cursor_page == expected[2:]
+                    assert index.select(record_id=record_id, orm_table_for_search=orm_table_for_search,
+                                        sorting=sorting, lim=100, page=0, after=after) == expected[2:]
+
+
+def test_numpy_engine_matches_sql_engine():
+    async def check():
+        async with fixture_connection() as conn:
+            index = SkillMatrixIndex()
+            await index.load(conn)
+            await compare_engines(conn, index, CandidatesDB, JOB_IDS)
+            await compare_engines(conn, index, JobOpeningsDB, CANDIDATE_IDS)
+
+    asyncio.run(check())
+
+
+def test_repeated_skill_of_record_is_rejected():
+    async def check():
+        async with fixture_connection() as conn:
+            for orm_table_class, row in ((CandidatesSkillsDB, (11, 1, 1, 2, 5, 2000)),
+                                         (RequiredSkillsDB, (11, 1, 1, 0, 1, 100))):
+                with pytest.raises(IntegrityError):
+                    async with conn.begin_nested():
+                        await conn.execute(insert(orm_table_class).values(skill_values(orm_table_class, row)))
+
+            # the engines still agree after the rejected writes
+            index = SkillMatrixIndex()
+            await index.load(conn)
+            await compare_engines(conn, index, CandidatesDB, JOB_IDS)
+
+    asyncio.run(check())
+
+
+def test_skills_of_record_are_swapped_by_one_update():
+    async def check():
+        async with fixture_connection() as conn:
+            # python -> sql and sql -> python of the candidate 1, the state after the statement has no repeated skills
+            changes = [{"id": 1, "skill_id": 2, "skill_name": SKILLS[2]},
+                       {"id": 2, "skill_id": 1, "skill_name": SKILLS[1]}]
+            columns = [i for i in record_columns(CandidatesSkillsDB) if i != 'score']
+            parameters = {"owner": 1, "change_id": [change["id"] for change in changes]}
+            parameters.update({f"change_{i}": [change.get(i) for change in changes] for i in columns})
+            await conn.execute(change_skills_statement(CandidatesSkillsDB), parameters)
+
+            response = await conn.execute(select(CandidatesSkillsDB.id, CandidatesSkillsDB.skill_id)
+                                          .where(CandidatesSkillsDB.foreign_key == 1).order_by(CandidatesSkillsDB.id))
+            assert response.all() == [(1, 2), (2, 1)]
+
+    asyncio.run(check())
+
+
+def test_matrix_keeps_cell_of_replacing_skill():
+    matrix = SkillMatrix({})
+    matrix.load([CANDIDATE_SKILLS[0]])
+    # the same skill of the same owner under another id replaces the previous row
+    matrix.add(11, 1, 1, 2, 5, 2000)
+    matrix.remove(1)
+    assert matrix.owner_rows(1).tolist() == [matrix.vocabulary[1]]
+    assert matrix.level[matrix.cells[11]] == 2
+    matrix.remove(11)
+    assert matrix.owner_rows(1).tolist() == []
@@ -0,0 +1,26 @@
+from core.schemas.pagination import cursor_page, decode_cursor, fetch_limit
+
+
+def test_full_last_page_has_no_next_cursor():
+    records = [{"id": 1}, {"id": 2}]
+    # exactly limit records are read with fetch_limit: there is no next page
+    assert fetch_limit(2, ()) == 3
+    page = cursor_page(items=records, limit=2, last_values=lambda record: (record["id"],))
+    assert page == {"items": records, "next_cursor": None}
+
+
+def test_next_cursor_points_to_last_record_of_page():
+    records = [{"id": 1}, {"id": 2}, {"id": 3}]
+    page = cursor_page(items=records, limit=2, last_values=lambda record: (record["id"],))
+    assert page["items"] == records[:2]
+    assert decode_cursor(page["next_cursor"], size=1) == (2,)
+
+
+def test_empty_cursor_page():
+    assert cursor_page(items=[], limit=2, last_values=lambda record: (record["id"],)) == {
+        "items": [], "next_cursor": None
+    }
+
+
+def test_offset_mode_reads_limit():
+    assert fetch_limit(2, None) == 2
@@ -0,0 +1,64 @@
+import asyncio
+
+from fastapi_cache import FastAPICache
+
+from core.cache.invalidation import TaggedRedisBackend
+from core.db.replicas import request_writes
+
+
+class Pipeline:
+    """
+    Redis pipeline which answers the commands of TaggedRedisBackend.get_with_ttl.
+    """
+
+    def __init__(self, results: list):
+        self.results = results
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    def __getattr__(self, command):
+        return lambda *args: self
+
+    async def execute(self):
+        return self.results
+
+
+class Redis:
+    def __init__(self, value: bytes | None, recent_write: int):
+        self.value = value
+        self.recent_write = recent_write
+
+    def pipeline(self, transaction: bool = True):
+        return Pipeline([-2 if self.value is None else 100, self.value, b"7", self.recent_write])
+
+
+def read_state(value: bytes | None, recent_write: int) -> dict:
+    async def read():
+        backend = TaggedRedisBackend(Redis(value, recent_write))
+        FastAPICache.reset()
+        FastAPICache.init(backend, prefix="test")
+        state = {"pinned": False, "wrote": False}
+        token = request_writes.set(state)
+        try:
+            await backend.get_with_ttl("test:key")
+        finally:
+            request_writes.reset(token)
+        return state
+
+    return asyncio.run(read())
+
+
+def test_miss_after_recent_invalidation_reads_primary():
+    assert read_state(None, recent_write=1) == {"pinned": True, "wrote": False}
+
+
+def test_miss_without_recent_invalidation_reads_replica():
+    assert read_state(None, recent_write=0)["pinned"] is False
+
+
+def test_hit_is_not_pinned():
+    assert read_state(b"cached", recent_write=1)["pinned"] is False
@@ -0,0 +1,62 @@
+import asyncio
+
+from core.db.database import CandidatesDB
+from core.db.selection_jobs import MemoryJobStore, SelectionJobs
+
+LEASE = 0.05
+
+
+async def submit(jobs: SelectionJobs) -> dict:
+    return await jobs.submit(orm_table_for_search=CandidatesDB, record_id=1, top=10, sorting="upper")
+
+
+def test_identical_submission_returns_pending_job():
+    async def check():
+        # without workers the jobs stay queued
+        jobs = SelectionJobs(MemoryJobStore(), workers=0, lease=LEASE)
+        jobs.start()
+        first = await submit(jobs)
+        assert (await submit(jobs))["job_id"] == first["job_id"]
+        await jobs.stop()
+
+    asyncio.run(check())
+
+
+def test_jobs_of_stopped_process_dont_block_submissions():
+    async def check():
+        store = MemoryJobStore()
+        crashed = SelectionJobs(store, workers=0, lease=LEASE)
+        crashed.start()
+        lost = await submit(crashed)
+        # the process is killed: its queue is lost and its lease isn't renewed
+        for task in crashed._tasks:
+            task.cancel()
+        await asyncio.sleep(LEASE * 2)
+
+        restarted = SelectionJobs(store, workers=0, lease=LEASE)
+        restarted.start()
+        job = await submit(restarted)
+        assert job["job_id"] != lost["job_id"] and job["status"] == "queued"
+        assert (await restarted.load(lost["job_id"]))["status"] == "failed"
+        assert (await submit(restarted))["job_id"] == job["job_id"]
+        await restarted.stop()
+
+    asyncio.run(check())
+
+
+def test_pending_jobs_of_running_process_are_kept():
+    async def check():
+        store = MemoryJobStore()
+        first, second = SelectionJobs(store, workers=0, lease=LEASE), SelectionJobs(store, workers=0, lease=LEASE)
+        first.start()
+        second.start()
+        job = await submit(first)
+        await asyncio.sleep(LEASE * 2)
+        assert (await submit(second))["job_id"] == job["job_id"]
+        assert (await second.load(job["job_id"]))["status"] == "queued"
+        await first.stop()
+        # a stopped process releases its lease at once
+        assert (await second.load(job["job_id"]))["status"] == "failed"
+        await second.stop()
+
+    asyncio.run(check())
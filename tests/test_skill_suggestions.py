@@ -0,0 +1,33 @@
+from core.db import skill_suggestions as suggestions_module
+from core.db.skill_suggestions import SkillSuggestions
+
+
+def built(skills) -> SkillSuggestions:
+    suggestions = SkillSuggestions()
+    suggestions.ready = True
+    suggestions.apply_add([[name.lower(), name] for name in skills])
+    return suggestions
+
+
+def test_removed_skills_lose_popularity():
+    suggestions = built(["Python", "Python", "Perl"])
+    suggestions.remove(["python", "python"])
+    assert suggestions.suggest("p", 10) == [{"name": "Perl", "popularity": 1}]
+    assert suggestions.suggest("pyt", 10) == []
+    assert suggestions.names == ["perl"]
+
+
+def test_full_short_prefix_list_is_ranked_again(monkeypatch):
+    monkeypatch.setattr(suggestions_module, "MAX_SUGGESTIONS", 2)
+    suggestions = built(["Go", "Go", "Git", "Git", "Gradle"])
+    assert [i["name"] for i in suggestions.suggest("g", 10)] == ["Git", "Go"]
+    suggestions.remove(["go", "go"])
+    assert suggestions.suggest("g", 10) == [{"name": "Git", "popularity": 2}, {"name": "Gradle", "popularity": 1}]
+
+
+def test_renamed_skill_moves_to_new_name():
+    suggestions = built(["Java", "Java"])
+    suggestions.remove(["java"])
+    suggestions.add([("javascript", "JavaScript")])
+    assert suggestions.suggest("ja", 10) == [{"name": "Java", "popularity": 1},
+                                             {"name": "JavaScript", "popularity": 1}]
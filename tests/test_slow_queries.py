@@ -0,0 +1,25 @@
+import pytest
+from fastapi import HTTPException
+
+from core.db.slow_queries import printable_parameters
+from core.routers import slow_queries
+
+
+def test_admin_endpoints_are_closed_without_token(monkeypatch):
+    monkeypatch.setattr(slow_queries, "ADMIN_TOKEN", None)
+    with pytest.raises(HTTPException) as error:
+        slow_queries.admin_access(x_admin_token=None)
+    assert error.value.status_code == 404
+
+
+def test_admin_endpoints_require_configured_token(monkeypatch):
+    monkeypatch.setattr(slow_queries, "ADMIN_TOKEN", "secret")
+    with pytest.raises(HTTPException) as error:
+        slow_queries.admin_access(x_admin_token="wrong")
+    assert error.value.status_code == 403
+    slow_queries.admin_access(x_admin_token="secret")
+
+
+def test_parameters_are_redacted_by_default():
+    assert printable_parameters({"name": "Ivan", "age": 30, "city": None}) == ["<str>", "<int>", None]
+    assert printable_parameters(("Ivan", 30), redact=False) == ["'Ivan'", 30]